@@ -26,6 +26,11 @@
         'portal',
     ],
 
+    # Prévisions vectorisées du marché (tools/market_forecast.py)
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
+
     
     
     # FICHIERS DE DONNÉES ET DE VUES À CHARGER
@@ -41,6 +46,7 @@
         # 2. SÉQUENCES (Avant les vues qui les utilisent)
   
         'data/sequences.xml',
+        'data/penalty_rules.xml',
 
         # ========================
         # 3. VUES PRINCIPALES (Par ordre logique)
@@ -62,7 +68,10 @@
         'views/dashboard_views.xml',
         'views/dashboard_menus.xml',
         'views/financial_views.xml',
+        'views/rent_invoicing_views.xml',
+        'views/batch_run_views.xml',
         'views/payment_views.xml',
+        'views/mobile_money_import_views.xml',
         'views/overdue_status_views.xml',
         'views/bank_reconciliation_views.xml',
         'views/payment_history_views.xml',
@@ -1,26 +1,205 @@
 from odoo import http
 from odoo.http import request
+from odoo.addons.http_routing.models.ir_http import slug
+from odoo.addons.portal.controllers.portal import pager as portal_pager
+from urllib.parse import urlencode
+from werkzeug.exceptions import BadRequest
+
+from ..models.property import CATALOGUE_MAX_BEDROOMS
+from ..tools.fragment_cache import catalogue_cache
+from ..tools.search_text import normalize_search_text
+from ..tools.geo import zoom_to_precision
+from ..tools.thumbnails import MIMETYPES, THUMBNAIL_SIZES
+
+# Paramètre d'URL -> facette du catalogue
+CATALOGUE_PARAMS = {
+    'q': 'search',
+    'type': 'property_type_id',
+    'quarter': 'quarter',
+    'price': 'price_band',
+    'bedrooms': 'bedrooms',
+    'furnished': 'furnished',
+}
+
+FACET_LABELS = {
+    'property_type_id': 'Type de bien',
+    'quarter': 'Quartier',
+    'price_band': 'Prix',
+    'bedrooms': 'Chambres',
+    'furnished': 'Ameublement',
+}
+
+CATALOGUE_PAGE_SIZE = 24
+# Résultats d'une recherche texte retenus (classés par pertinence) pour le catalogue
+CATALOGUE_SEARCH_LIMIT = 1000
+
+# Cache navigateur des photos (s): un an pour les URL versionnées, une minute sinon
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_FALLBACK_MAX_AGE = 60
+
 
 class SoyaEstateController(http.Controller):
 
-    @http.route('/properties', type='http', auth='public', website=True)
-    def properties_list(self, **kwargs):
+    # === CATALOGUE PUBLIC ===
+    def _get_catalogue_filters(self, kwargs):
+        """Filtres valides de la requête: (filtres par champ, paramètres d'URL normalisés)"""
+        Property = request.env['soya.property']
+        filters = {}
+        value = (kwargs.get('q') or '').strip()[:100]
+        if normalize_search_text(value):
+            filters['search'] = value
+        value = kwargs.get('type', '')
+        if value.isdigit():
+            filters['property_type_id'] = int(value)
+        for param in ('quarter', 'price'):
+            field_name = CATALOGUE_PARAMS[param]
+            if kwargs.get(param) in Property._fields[field_name].get_values(request.env):
+                filters[field_name] = kwargs[param]
+        value = kwargs.get('bedrooms', '')
+        if value.isdigit() and int(value) > 0:
+            filters['bedrooms'] = min(int(value), CATALOGUE_MAX_BEDROOMS)
+        if kwargs.get('furnished') in ('0', '1'):
+            filters['furnished'] = kwargs['furnished'] == '1'
+
+        fields_to_params = {field_name: param for param, field_name in CATALOGUE_PARAMS.items()}
+        params = {
+            fields_to_params[field_name]: str(int(value)) if isinstance(value, bool) else str(value)
+            for field_name, value in filters.items()
+        }
+        return filters, params
+
+    def _catalogue_url(self, params):
+        return '/properties' + (f"?{urlencode(sorted(params.items()))}" if params else '')
+
+    def _prepare_catalogue_values(self, filters, params, page):
+        # Catalogue public identique pour tous les visiteurs: lecture en sudo, limitée aux biens disponibles
+        Property = request.env['soya.property'].sudo()
+        search = filters.get('search', '')
+        if search:
+            # Recherche plein texte exécutée une fois, réutilisée par le comptage, la page et les facettes
+            ranked = Property._search_ranked(search, Property._get_catalogue_domain({}), limit=CATALOGUE_SEARCH_LIMIT)
+            filters = dict(filters, search=ranked.ids)
+        total = Property.search_count(Property._get_catalogue_domain(filters))
+        pager = portal_pager(
+            url='/properties',
+            total=total,
+            page=page,
+            step=CATALOGUE_PAGE_SIZE,
+            url_args=params,
+        )
+        properties = Property._search_catalogue(filters, offset=pager['offset'], limit=CATALOGUE_PAGE_SIZE)
+
+        facets = []
+        for field_name, options in Property._get_catalogue_facets(filters).items():
+            param = next(param for param, name in CATALOGUE_PARAMS.items() if name == field_name)
+            facet_options = []
+            for value, label, count in options:
+                url_value = str(int(value)) if isinstance(value, bool) else str(value)
+                selected = params.get(param) == url_value
+                option_params = dict(params)
+                if selected:
+                    option_params.pop(param)
+                else:
+                    option_params[param] = url_value
+                facet_options.append({
+                    'label': label,
+                    'count': count,
+                    'selected': selected,
+                    'url': self._catalogue_url(option_params),
+                })
+            facets.append({'label': FACET_LABELS[field_name], 'options': facet_options})
+
+        return {
+            'properties': properties,
+            'total': total,
+            'pager': pager,
+            'facets': facets,
+            'search': search,
+            'search_params': {param: value for param, value in params.items() if param != 'q'},
+            'reset_url': self._catalogue_url({}) if params else False,
+            'slug': slug,
+        }
+
+    @http.route(['/properties', '/properties/page/<int:page>'], type='http', auth='public', website=True)
+    def properties_list(self, page=1, **kwargs):
         """
-        Contrôleur pour afficher la liste publique des biens immobiliers.
+        Catalogue public paginé et filtrable des biens disponibles.
+
+        Le fragment rendu (facettes, résultats, pagination) est mis en cache
+        par jeu de filtres et page ; il est invalidé à chaque modification d'un bien.
         """
-        # Récupérer les biens qui sont dans l'état 'Nouveau' (disponibles)
-        properties = request.env['soya.property'].search([
-            ('state', '=', 'new')
-        ])
-        
-        # Préparer les valeurs à envoyer au template
-        values = {
-            'properties': properties,
+        filters, params = self._get_catalogue_filters(kwargs)
+        key = (
+            request.env.cr.dbname,
+            request.website.id,
+            request.lang.code,
+            tuple(sorted(params.items())),
+            page,
+        )
+        catalogue = catalogue_cache.get(key)
+        if catalogue is None:
+            catalogue = request.env['ir.qweb']._render(
+                'soya_estate.properties_catalogue_fragment',
+                self._prepare_catalogue_values(filters, params, page),
+            )
+            catalogue_cache.set(key, catalogue)
+
+        return request.render('soya_estate.properties_list_template', {
+            'catalogue': catalogue,
             'page_title': 'Nos Biens Immobiliers'
-        }
-        
-        # Rendre le template QWeb et lui passer les valeurs
-        return request.render('soya_estate.properties_list_template', values)
+        })
+
+    @http.route('/properties/map/clusters', type='http', auth='public', website=True)
+    def properties_map_clusters(self, bbox='', zoom='12', **kwargs):
+        """
+        Regroupements de la carte: nombre de biens disponibles par tuile dans le rectangle affiché.
+
+        ``bbox`` vaut « sud,ouest,nord,est » ; les filtres du catalogue s'appliquent.
+        """
+        try:
+            south, west, north, east = (float(value) for value in bbox.split(','))
+            precision = zoom_to_precision(zoom)
+        except ValueError:
+            raise BadRequest("Paramètres bbox (sud,ouest,nord,est) et zoom attendus")
+        if south > north or west > east:
+            raise BadRequest("Rectangle invalide")
+        filters, _params = self._get_catalogue_filters(kwargs)
+        Property = request.env['soya.property'].sudo()
+        clusters = Property._get_map_clusters(
+            south, west, north, east, precision, domain=Property._get_catalogue_domain(filters),
+        )
+        return request.make_json_response(clusters, headers=[('Cache-Control', 'public, max-age=60')])
+
+    @http.route('/properties/<int:property_id>/image', type='http', auth='public')
+    def property_image(self, property_id, size='medium', unique=None, **kwargs):
+        """
+        Photo d'un bien, à la taille demandée (small, medium, large).
+
+        Même règle d'accès que la page de détail: tout bien existant, quel que
+        soit son état (vendu, loué, sous offre...).
+        La miniature pré-générée est servie en WebP si le navigateur l'accepte,
+        avec un ETag fort ; les URL versionnées (``unique``) sont cachées un an.
+        Tant que les miniatures ne sont pas prêtes, l'original est servi avec un cache court.
+        """
+        property_rec = request.env['soya.property'].sudo().browse(property_id).exists()
+        if not property_rec:
+            raise request.not_found()
+        if size not in THUMBNAIL_SIZES:
+            size = 'medium'
+        accept_webp = 'image/webp' in request.httprequest.headers.get('Accept', '')
+        variant = request.env['soya.property.thumbnail'].sudo()._get_variant(property_rec.id, size, accept_webp)
+        if not variant:
+            stream = request.env['ir.binary']._get_image_stream_from(property_rec, 'image')
+            response = stream.get_response(max_age=IMAGE_FALLBACK_MAX_AGE)
+        else:
+            stream = request.env['ir.binary']._get_stream_from(variant, 'data', mimetype=MIMETYPES[variant.image_format])
+            response = stream.get_response(
+                immutable=bool(unique),
+                max_age=IMAGE_MAX_AGE if unique else IMAGE_FALLBACK_MAX_AGE,
+            )
+        # Le format servi dépend de l'en-tête Accept, y compris une fois les miniatures générées
+        response.headers.add('Vary', 'Accept')
+        return response
 
     @http.route('/properties/<model("soya.property"):property>', type='http', auth='public', website=True)
     def property_details(self, property, **kwargs):
@@ -1,22 +1,30 @@
+from . import ir_sequence
 from . import property_type
 from . import property
+from . import property_thumbnail
 from . import property_offer
 from . import prospect
 from . import visit
 from . import sales_activity
+from . import reporting_view
 from . import visit_statistics
 from . import contract
 from . import sale_contract
 from . import rental_contract
 from . import amendment
 from . import document
+from . import batch_run
+from . import penalty_rule
 from . import financial_invoice
 from . import payment
+from . import mobile_money_import
 from . import rent_scheduler
+from . import rent_invoicing_run
 from . import overdue_status
 from . import bank_reconciliation
 from . import payment_history
 from . import performance_kpi
 from . import property_profitability
+from . import market_snapshot
 from . import market_analytics
 from . import portal_ticket
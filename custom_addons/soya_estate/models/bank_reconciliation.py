@@ -1,4 +1,12 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, Command
+from odoo.exceptions import UserError
+from datetime import timedelta
+import logging
+
+from ..tools.bank_statement import iter_statement_lines, open_binary_field, StatementFormatError
+from ..tools.statement_matching import PaymentCandidate, match_statement
+
+_logger = logging.getLogger(__name__)
 
 class SoyaBankReconciliation(models.Model):
     _name = 'soya.bank.reconciliation'
@@ -11,7 +19,7 @@ class SoyaBankReconciliation(models.Model):
         required=True,
         copy=False,
         readonly=True,
-        default=lambda self: self.env['ir.sequence'].next_by_code('soya.bank.reconciliation') or 'RECON/000001',
+        default='Nouveau Rapprochement',
         tracking=True
     )
 
@@ -70,21 +78,64 @@ class SoyaBankReconciliation(models.Model):
 
     notes = fields.Text(string='Notes')
 
+    # === RELEVÉ BANCAIRE ===
+    statement_file = fields.Binary(string='Relevé Bancaire', attachment=True, help='Fichier CSV, OFX ou CAMT.053')
+    statement_filename = fields.Char(string='Nom du Fichier')
+
+    statement_line_ids = fields.One2many(
+        'soya.bank.statement.line',
+        'reconciliation_id',
+        string='Lignes du Relevé'
+    )
+
+    statement_line_count = fields.Integer(string='Lignes', compute='_compute_statement_stats')
+    matched_line_count = fields.Integer(string='Lignes Rapprochées', compute='_compute_statement_stats')
+
+    # Lignes de relevé insérées par lot lors de l'import
+    STATEMENT_BATCH_SIZE = 1000
+    # Lignes illisibles citées dans le message de fin d'import
+    STATEMENT_ERROR_LIMIT = 20
+    # Écart maximal (jours) entre la date du relevé et celle du paiement
+    MATCH_DATE_WINDOW = 3
+
     @api.depends('payment_ids.amount')
     def _compute_book_balance(self):
         for rec in self:
             rec.book_balance = sum(rec.payment_ids.mapped('amount'))
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env['ir.sequence']._assign_batch_names(
+            vals_list, 'soya.bank.reconciliation', ('Nouveau Rapprochement',), 'RECON/000001'
+        )
+        return super().create(vals_list)
+
+    def _compute_statement_stats(self):
+        counts = {
+            (reconciliation.id, matched): count
+            for reconciliation, matched, count in self.env['soya.bank.statement.line']._read_group(
+                [('reconciliation_id', 'in', self.ids)],
+                ['reconciliation_id', 'is_matched'], ['__count'],
+            )
+        }
+        for rec in self:
+            rec.matched_line_count = counts.get((rec.id, True), 0)
+            rec.statement_line_count = rec.matched_line_count + counts.get((rec.id, False), 0)
+
     @api.depends('bank_balance', 'book_balance')
     def _compute_difference(self):
         for rec in self:
             rec.difference = rec.bank_balance - rec.book_balance
 
     def action_reconcile(self):
+        # Inclure les paiements affectés manuellement aux lignes du relevé
+        for rec in self:
+            manual_payments = rec.statement_line_ids.payment_id - rec.payment_ids
+            if manual_payments:
+                rec.payment_ids = [Command.link(payment.id) for payment in manual_payments]
         self.state = 'reconciled'
-        for payment in self.payment_ids:
-            if payment.state == 'confirmed':
-                payment.action_reconcile()
+        self.payment_ids.filtered(lambda p: p.state == 'confirmed').write({'state': 'reconciled'})
+        self.env['soya.payment']._refresh_payment_reports()
 
     def action_validate(self):
         if self.difference != 0:
@@ -93,3 +144,124 @@ class SoyaBankReconciliation(models.Model):
 
     def action_cancel(self):
         self.state = 'cancelled'
+
+    # === IMPORT ET RAPPROCHEMENT AUTOMATIQUE ===
+    def action_import_statement(self):
+        """Importe le relevé en flux, par lots de lignes, puis lance le rapprochement"""
+        self.ensure_one()
+        if not self.with_context(bin_size=True).statement_file:
+            raise UserError("Veuillez joindre un relevé bancaire.")
+        StatementLine = self.env['soya.bank.statement.line']
+        self.statement_line_ids.unlink()
+        batch, errors = [], []
+        imported = 0
+        try:
+            with open_binary_field(self, 'statement_file') as stream:
+                for line in iter_statement_lines(stream, self.statement_filename or ''):
+                    if line.error:
+                        errors.append(line.error)
+                        continue
+                    batch.append({
+                        'reconciliation_id': self.id,
+                        'date': line.date,
+                        'amount': line.amount,
+                        'reference': line.reference,
+                        'label': line.label,
+                    })
+                    if len(batch) >= self.STATEMENT_BATCH_SIZE:
+                        StatementLine.create(batch)
+                        imported += len(batch)
+                        batch = []
+        except StatementFormatError as e:
+            raise UserError(f"Relevé illisible: {e}")
+        if batch:
+            StatementLine.create(batch)
+            imported += len(batch)
+        if errors and not imported:
+            raise UserError("Aucune ligne lisible dans le relevé:\n" + "\n".join(errors[:self.STATEMENT_ERROR_LIMIT]))
+        if errors:
+            listed = "; ".join(errors[:self.STATEMENT_ERROR_LIMIT])
+            more = f" (+{len(errors) - self.STATEMENT_ERROR_LIMIT})" if len(errors) > self.STATEMENT_ERROR_LIMIT else ""
+            self.message_post(body=f"{len(errors)} ligne(s) illisible(s) ignorée(s): {listed}{more}")
+        _logger.info(f"{self.name}: {imported} ligne(s) de relevé importée(s), {len(errors)} ignorée(s)")
+        return self.action_match_statement()
+
+    def _get_payment_candidates(self, date_from, date_to):
+        """Paiements confirmés non encore rapprochés autour des dates du relevé"""
+        payments = self.env['soya.payment'].search_read([
+            ('state', '=', 'confirmed'),
+            ('payment_date', '>=', date_from - timedelta(days=self.MATCH_DATE_WINDOW)),
+            ('payment_date', '<=', date_to + timedelta(days=self.MATCH_DATE_WINDOW)),
+        ], ['amount', 'reference_number', 'name', 'payment_date'])
+        return [
+            PaymentCandidate(payment['id'], payment['amount'], payment['reference_number'] or payment['name'],
+                             payment['payment_date'])
+            for payment in payments
+        ]
+
+    def action_match_statement(self):
+        """Rapproche automatiquement les lignes non rapprochées (référence exacte puis approchée)"""
+        self.ensure_one()
+        lines = self.statement_line_ids.filtered(lambda l: not l.payment_id and l.amount > 0)
+        if not lines:
+            return True
+        dates = lines.mapped('date')
+        candidates = self._get_payment_candidates(min(dates), max(dates))
+        # Les paiements déjà liés à ce rapprochement ne sont pas reproposés
+        linked = set(self.statement_line_ids.payment_id.ids)
+        candidates = [candidate for candidate in candidates if candidate.id not in linked]
+        matches = match_statement(lines, candidates, self.MATCH_DATE_WINDOW)
+        if matches:
+            line_ids, payment_ids, match_types = [], [], []
+            for index, (payment_id, match_type) in matches.items():
+                line_ids.append(lines[index].id)
+                payment_ids.append(payment_id)
+                match_types.append(match_type)
+            self.env['soya.bank.statement.line'].flush_model()
+            self.env.cr.execute("""
+                UPDATE soya_bank_statement_line line
+                SET payment_id = matched.payment_id, match_type = matched.match_type, is_matched = TRUE
+                FROM unnest(%s::int[], %s::int[], %s::varchar[]) AS matched(line_id, payment_id, match_type)
+                WHERE line.id = matched.line_id
+            """, [line_ids, payment_ids, match_types])
+            self.env['soya.bank.statement.line'].invalidate_model(['payment_id', 'match_type', 'is_matched'])
+            self.payment_ids = [Command.link(payment_id) for payment_id in payment_ids]
+        self.message_post(body=f"Rapprochement automatique: {len(matches)}/{len(lines)} ligne(s) rapprochée(s)")
+        return True
+
+
+class SoyaBankStatementLine(models.Model):
+    _name = 'soya.bank.statement.line'
+    _description = 'Ligne de Relevé Bancaire'
+    _order = 'date, id'
+
+    reconciliation_id = fields.Many2one(
+        'soya.bank.reconciliation',
+        string='Rapprochement',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    currency_id = fields.Many2one(related='reconciliation_id.currency_id')
+
+    date = fields.Date(string='Date', required=True)
+    amount = fields.Monetary(string='Montant', required=True)
+    reference = fields.Char(string='Référence Bancaire')
+    label = fields.Char(string='Libellé')
+
+    payment_id = fields.Many2one('soya.payment', string='Paiement', index=True)
+    match_type = fields.Selection([
+        ('exact', 'Exact'),
+        ('fuzzy', 'Approché'),
+        ('manual', 'Manuel'),
+    ], string='Rapprochement')
+    is_matched = fields.Boolean(string='Rapprochée', compute='_compute_is_matched', store=True)
+
+    @api.depends('payment_id')
+    def _compute_is_matched(self):
+        for line in self:
+            line.is_matched = bool(line.payment_id)
+
+    @api.onchange('payment_id')
+    def _onchange_payment_id(self):
+        self.match_type = 'manual' if self.payment_id else False
@@ -0,0 +1,79 @@
+from odoo import models, fields, api
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaBatchRun(models.Model):
+    _name = 'soya.batch.run'
+    _description = 'Exécution de Traitement de Masse'
+    _inherit = ['mail.thread']
+    _order = 'started_at desc, id desc'
+
+    name = fields.Char(string="Traitement", required=True, readonly=True)
+    job = fields.Char(string="Code du Traitement", required=True, readonly=True, index=True)
+
+    state = fields.Selection([
+        ('running', 'En Cours'),
+        ('done', 'Terminé'),
+        ('failed', 'En Erreur'),
+    ], string="État", default='running', readonly=True)
+
+    started_at = fields.Datetime(string="Démarré le", readonly=True, default=fields.Datetime.now)
+    finished_at = fields.Datetime(string="Terminé le", readonly=True)
+    duration = fields.Float(string="Durée (s)", readonly=True, digits=(12, 2))
+    record_count = fields.Integer(string="Enregistrements Traités", readonly=True)
+    chunk_count = fields.Integer(string="Lots", readonly=True)
+    throughput = fields.Float(string="Débit (enr./s)", compute='_compute_throughput', digits=(12, 1))
+    error = fields.Text(string="Erreur", readonly=True)
+
+    @api.depends('record_count', 'duration')
+    def _compute_throughput(self):
+        for run in self:
+            run.throughput = (run.record_count / run.duration) if run.duration else 0.0
+
+    # === SUIVI D'EXÉCUTION ===
+    @api.model
+    def _is_testing(self):
+        return getattr(threading.current_thread(), 'testing', False)
+
+    def _commit(self):
+        """Valide la transaction courante (hors tests) pour ne pas garder de longue transaction"""
+        if not self._is_testing():
+            self.env.cr.commit()
+
+    @api.model
+    def _start(self, job, name):
+        run = self.sudo().create({'job': job, 'name': name})
+        run._commit()
+        return run
+
+    def _elapsed(self):
+        return (fields.Datetime.now() - self.started_at).total_seconds() if self.started_at else 0.0
+
+    def _progress(self, record_count, chunk_count):
+        self.write({'record_count': record_count, 'chunk_count': chunk_count, 'duration': self._elapsed()})
+
+    def _finish(self, record_count, chunk_count, summary=None):
+        """Clôture l'exécution et publie un unique message de synthèse"""
+        self.write({
+            'state': 'done',
+            'record_count': record_count,
+            'chunk_count': chunk_count,
+            'duration': self._elapsed(),
+            'finished_at': fields.Datetime.now(),
+        })
+        body = summary or f"{record_count} enregistrement(s) traité(s) en {chunk_count} lot(s)"
+        self.message_post(body=f"{body} — {self.duration:.1f}s ({self.throughput:.0f}/s)")
+        _logger.info(f"{self.name}: {body} en {self.duration:.1f}s")
+
+    def _fail(self, error):
+        self.write({
+            'state': 'failed',
+            'error': str(error),
+            'duration': self._elapsed(),
+            'finished_at': fields.Datetime.now(),
+        })
+        self.message_post(body=f"Échec après {self.record_count} enregistrement(s): {error}")
+        _logger.error(f"{self.name}: échec après {self.record_count} enregistrement(s): {error}")
@@ -12,7 +12,7 @@ class SoyaBaseContract(models.Model):
     name = fields.Char(
         string='Référence Contrat',
         required=True,
-        default=lambda self: self._generate_contract_code(),
+        default='Nouveau Contrat',
         tracking=True
     )
 
@@ -126,9 +126,20 @@ class SoyaBaseContract(models.Model):
             )
     
     # === MÉTHODES COMMUNES ===
+    # Séquence de numérotation, redéfinie par les contrats de vente
+    _contract_sequence_code = 'soya.base.contract'
+
     def _generate_contract_code(self):
         """Générer un code unique pour le contrat"""
-        return self.env['ir.sequence'].next_by_code('soya.base.contract.sequence') or 'Nouveau Contrat'
+        return self.env['ir.sequence']._next_batch_by_code(self._contract_sequence_code, 1)[0] or 'Nouveau Contrat'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Numérotation des contrats du lot en une seule réservation"""
+        self.env['ir.sequence']._assign_batch_names(
+            vals_list, self._contract_sequence_code, ('Nouveau Contrat',), 'Nouveau Contrat'
+        )
+        return super().create(vals_list)
     
     def action_activate_contract(self):
         """Activer le contrat - À surcharger dans les modèles enfants"""
@@ -15,7 +15,7 @@ class SoyaFinancialInvoice(models.Model):
     name = fields.Char(
         string='Référence Facture',
         required=True,
-        default=lambda self: self._generate_invoice_number(),
+        default='Nouvelle Facture',
         tracking=True
     )
 
@@ -26,8 +26,16 @@ class SoyaFinancialInvoice(models.Model):
         ('charge', 'Facture de Charges'),
         ('commission', 'Facture de Commission'),
         ('penalty', 'Pénalité de Retard'),
+        ('expense', 'Facture de Dépense'),
         ('other', 'Autre Facture')
     ], string='Type de Facture', required=True, default='rent', tracking=True)
+
+    category = fields.Selection([
+        ('maintenance', 'Entretien'),
+        ('taxes', 'Taxes et Impôts'),
+        ('insurance', 'Assurance'),
+        ('other', 'Autres Charges')
+    ], string='Catégorie de Dépense', help="Ventilation des dépenses dans l'analyse de rentabilité", tracking=True)
     
     # === RELATIONS ===
     contract_id = fields.Many2one(
@@ -92,6 +100,7 @@ class SoyaFinancialInvoice(models.Model):
         string='Date d\'Échéance',
         compute='_compute_due_date',
         store=True,
+        index=True,
         tracking=True
     )
     
@@ -119,15 +128,19 @@ class SoyaFinancialInvoice(models.Model):
     payment_date = fields.Date(string='Date de Paiement', tracking=True)
     
     # === INFORMATIONS DE SUIVI ===
+    # Dépendent de la date du jour: stockés et actualisés chaque nuit par
+    # _cron_refresh_overdue_flags afin de filtrer et trier en SQL
     is_overdue = fields.Boolean(
         string='En Retard',
         compute='_compute_is_overdue',
-        store=True
+        store=True,
+        index=True
     )
     
     overdue_days = fields.Integer(
         string='Jours de Retard',
-        compute='_compute_overdue_days'
+        compute='_compute_overdue_days',
+        store=True
     )
 
     payment_ids = fields.One2many(
@@ -136,6 +149,39 @@ class SoyaFinancialInvoice(models.Model):
         string='Paiements Associés'
         
     )
+
+    # Encaissements confirmés ou réconciliés, maintenus à chaque paiement
+    amount_paid = fields.Monetary(
+        string='Montant Payé',
+        compute='_compute_amount_paid',
+        store=True
+    )
+
+    amount_residual = fields.Monetary(
+        string='Montant Restant Dû',
+        compute='_compute_amount_paid',
+        store=True
+    )
+
+    penalty_origin_id = fields.Many2one(
+        'soya.financial.invoice',
+        string='Facture Pénalisée',
+        index=True,
+        readonly=True,
+        ondelete='set null',
+        help="Facture en retard à l'origine de cette pénalité"
+    )
+
+    # Une seule quittance par contrat et période, même entre processus de facturation concurrents
+    # (contrainte d'exclusion: index unique partiel limité aux loyers)
+    # Marqueur du rattachement (unique) des anciennes pénalités à leur facture d'origine
+    PENALTY_BACKFILL_PARAM = 'soya_estate.penalty_origin_backfilled'
+
+    _sql_constraints = [
+        ('rent_period_unique',
+         "EXCLUDE (contract_id WITH =, period_start WITH =, period_end WITH =) WHERE (invoice_type = 'rent')",
+         "Une quittance de loyer existe déjà pour ce contrat et cette période."),
+    ]
     
     # === CHAMPS CALCULÉS ===
     @api.depends('amount', 'invoice_type')
@@ -155,6 +201,29 @@ class SoyaFinancialInvoice(models.Model):
         for invoice in self:
             invoice.total_amount = invoice.amount + invoice.tax_amount
     
+    @api.depends('total_amount', 'payment_ids.amount', 'payment_ids.state')
+    def _compute_amount_paid(self):
+        """Somme des paiements validés, en une requête groupée pour tout le lot"""
+        paid_by_invoice = {}
+        if self.ids:
+            paid_by_invoice = {
+                invoice.id: amount
+                for invoice, amount in self.env['soya.payment']._read_group(
+                    [('invoice_id', 'in', self.ids), ('state', 'in', ['confirmed', 'reconciled'])],
+                    ['invoice_id'], ['amount:sum'],
+                )
+            }
+        for invoice in self:
+            if invoice.id:
+                amount_paid = paid_by_invoice.get(invoice.id, 0.0)
+            else:
+                amount_paid = sum(
+                    payment.amount for payment in invoice.payment_ids
+                    if payment.state in ('confirmed', 'reconciled')
+                )
+            invoice.amount_paid = amount_paid
+            invoice.amount_residual = invoice.total_amount - amount_paid
+
     @api.depends('invoice_date')
     def _compute_due_date(self):
         """Calcul de la date d'échéance (5 jours après facturation pour loyers)"""
@@ -171,17 +240,17 @@ class SoyaFinancialInvoice(models.Model):
         today = fields.Date.today()
         for invoice in self:
             invoice.is_overdue = (
-                invoice.state == 'sent' and 
+                invoice.state in ('sent', 'overdue') and 
                 invoice.due_date and 
                 invoice.due_date < today
             )
     
-    @api.depends('due_date')
+    @api.depends('due_date', 'state')
     def _compute_overdue_days(self):
         """Calcule le nombre de jours de retard"""
         today = fields.Date.today()
         for invoice in self:
-            if invoice.due_date and invoice.due_date < today and invoice.state == 'sent':
+            if invoice.due_date and invoice.due_date < today and invoice.state in ('sent', 'overdue'):
                 invoice.overdue_days = (today - invoice.due_date).days
             else:
                 invoice.overdue_days = 0
@@ -205,7 +274,7 @@ class SoyaFinancialInvoice(models.Model):
     # === MÉTHODES D'ACTION ===
     def _generate_invoice_number(self):
         """Génération automatique du numéro de facture"""
-        return self.env['ir.sequence'].next_by_code('soya.financial.invoice') or 'FAC-NEW'
+        return self.env['ir.sequence']._next_batch_by_code('soya.financial.invoice', 1)[0] or 'FAC-NEW'
     
     def action_validate_invoice(self):
         """Valider et envoyer la facture"""
@@ -229,40 +298,200 @@ class SoyaFinancialInvoice(models.Model):
     
     def action_generate_penalty(self):
         """Générer automatiquement une pénalité de retard"""
-        for invoice in self:
-            if invoice.invoice_type == 'rent' and invoice.is_overdue:
-                penalty_amount = invoice.amount * 0.10  # 10% de pénalité
-                
-                penalty_vals = {
-                    'invoice_type': 'penalty',
-                    'contract_id': invoice.contract_id.id,
-                    'partner_id': invoice.partner_id.id,
-                    'amount': penalty_amount,
-                    'period_start': invoice.period_start,
-                    'period_end': invoice.period_end,
-                    'invoice_date': fields.Date.today(),
-                    'state': 'sent',
-                    'name': f"PENAL-{invoice.name}"
-                }
-                
-                self.env['soya.financial.invoice'].create(penalty_vals)
+        penalties = self._generate_penalties()
+        if not penalties:
+            return False
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Pénalités',
+            'res_model': 'soya.financial.invoice',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', penalties.ids)],
+        }
+
+    def init(self):
+        # Rattachement des pénalités antérieures au lien penalty_origin_id: une seule fois par base
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not ICP.get_param(self.PENALTY_BACKFILL_PARAM):
+            self._backfill_penalty_origins()
+            ICP.set_param(self.PENALTY_BACKFILL_PARAM, 'True')
+
+    @api.model
+    def _backfill_penalty_origins(self):
+        """Renseigne penalty_origin_id des pénalités qui n'en ont pas, d'après leur référence PENAL-<facture>"""
+        self.flush_model(['invoice_type', 'name', 'penalty_origin_id'])
+        self.env.cr.execute("""
+            UPDATE soya_financial_invoice penalty
+            SET penalty_origin_id = origin.id
+            FROM soya_financial_invoice origin
+            WHERE penalty.invoice_type = 'penalty'
+              AND penalty.penalty_origin_id IS NULL
+              AND penalty.name = 'PENAL-' || origin.name
+              AND origin.invoice_type != 'penalty'
+        """)
+        self.invalidate_model(['penalty_origin_id'])
+        return self.env.cr.rowcount
+
+    # === PÉNALITÉS DE RETARD ===
+    def _get_penalized_invoice_ids(self):
+        """Factures déjà pénalisées parmi ``self`` (une seule requête)"""
+        if not self:
+            return set()
+        self.flush_model(['invoice_type', 'state', 'penalty_origin_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT penalty_origin_id
+            FROM soya_financial_invoice
+            WHERE penalty_origin_id = ANY(%s)
+              AND invoice_type = 'penalty'
+              AND state != 'cancelled'
+        """, [self.ids])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _prepare_penalty_vals(self, rate, invoice_date):
+        self.ensure_one()
+        return {
+            'invoice_type': 'penalty',
+            'contract_id': self.contract_id.id,
+            'partner_id': self.partner_id.id,
+            'amount': self.amount * rate / 100,
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'invoice_date': invoice_date,
+            'state': 'sent',
+            'name': f"PENAL-{self.name}",
+            'penalty_origin_id': self.id,
+        }
+
+    def _generate_penalties(self):
+        """Crée en une fois les pénalités des quittances en retard de ``self``.
+
+        Le taux est celui du palier de ``soya.penalty.rule`` atteint par le
+        nombre de jours de retard ; les factures déjà pénalisées sont ignorées.
+        Le retard est calculé ici depuis ``due_date``: ``is_overdue`` et
+        ``overdue_days`` stockés ne sont actualisés que par le cron nocturne.
+        """
+        today = fields.Date.today()
+        invoices = self.filtered(
+            lambda i: i.invoice_type == 'rent' and i.state in ('sent', 'overdue') and i.due_date and i.due_date < today
+        )
+        already_penalized = invoices._get_penalized_invoice_ids()
+        rules = self.env['soya.penalty.rule'].search([])
+        vals_list = []
+        for invoice in invoices:
+            if invoice.id in already_penalized:
+                continue
+            rate = rules._get_rate_for((today - invoice.due_date).days)
+            if rate:
+                vals_list.append(invoice._prepare_penalty_vals(rate, today))
+        return self.with_context(tracking_disable=True, mail_create_nolog=True).create(vals_list)
+
+    @api.model
+    def _cron_generate_penalties(self):
+        """Génération des pénalités de toutes les quittances en retard"""
+        run = self.env['soya.batch.run']._start('penalty_run', "Génération des pénalités de retard")
+        try:
+            invoices = self.search([
+                ('invoice_type', '=', 'rent'),
+                ('state', 'in', ['sent', 'overdue']),
+                ('due_date', '<', fields.Date.today()),
+            ])
+            penalties = invoices._generate_penalties()
+        except Exception as e:
+            self.env.cr.rollback()
+            run._fail(e)
+            run._commit()
+            raise
+        run._finish(len(penalties), 1, f"{len(penalties)} pénalité(s) créée(s) sur {len(invoices)} quittance(s) en retard")
+        return len(penalties)
     
     # === MÉTHODES CRON ===
+    @api.model
+    def _cron_refresh_overdue_flags(self):
+        """Actualise is_overdue et overdue_days au changement de date.
+
+        Seules les factures ouvertes échues (index sur due_date) ou encore
+        marquées en retard sont examinées, et seules celles dont les valeurs
+        changent sont mises à jour, en une requête.
+        """
+        self.flush_model(['state', 'due_date', 'is_overdue', 'overdue_days'])
+        self.env.cr.execute("""
+            UPDATE soya_financial_invoice fi
+            SET is_overdue = flags.is_overdue,
+                overdue_days = flags.overdue_days
+            FROM (
+                SELECT id,
+                       (state IN ('sent', 'overdue') AND due_date < %(today)s) AS is_overdue,
+                       CASE WHEN state IN ('sent', 'overdue') AND due_date < %(today)s
+                            THEN %(today)s - due_date ELSE 0 END AS overdue_days
+                FROM soya_financial_invoice
+                WHERE (due_date < %(today)s AND state IN ('sent', 'overdue'))
+                   OR is_overdue
+            ) flags
+            WHERE fi.id = flags.id
+              AND (fi.is_overdue IS DISTINCT FROM flags.is_overdue
+                   OR fi.overdue_days IS DISTINCT FROM flags.overdue_days)
+        """, {'today': fields.Date.today()})
+        updated = self.env.cr.rowcount
+        self.invalidate_model(['is_overdue', 'overdue_days'])
+        _logger.info(f"Retards actualisés sur {updated} facture(s)")
+        return updated
+
+    # Nombre de factures basculées par transaction lors du balayage des retards
+    OVERDUE_CHUNK_SIZE = 5000
+
     @api.model
     def _cron_check_overdue_invoices(self):
-        """Cron job pour vérifier les factures en retard"""
+        """Cron job pour vérifier les factures en retard.
+
+        Les factures échues sont basculées par lots d'une seule écriture,
+        sans suivi de modification, chaque lot étant validé en base ; les
+        statistiques et un message de synthèse sont portés par l'exécution.
+        """
         today = fields.Date.today()
-        overdue_invoices = self.search([
-            ('state', '=', 'sent'),
-            ('due_date', '<', today)
-        ])
-        
-        for invoice in overdue_invoices:
-            invoice.state = 'overdue'
-            _logger.info(f"Facture {invoice.name} marquée comme en retard")
-        
-        return len(overdue_invoices)
+        run = self.env['soya.batch.run']._start('overdue_sweep', "Balayage des factures en retard")
+        invoices_model = self.with_context(tracking_disable=True, mail_notrack=True)
+        domain = [('state', '=', 'sent'), ('due_date', '<', today)]
+        total = chunks = 0
+        try:
+            while True:
+                invoices = invoices_model.search(domain, limit=self.OVERDUE_CHUNK_SIZE, order='id')
+                if not invoices:
+                    break
+                invoices.write({'state': 'overdue'})
+                total += len(invoices)
+                chunks += 1
+                run._progress(total, chunks)
+                run._commit()
+                self.env.invalidate_all()
+        except Exception as e:
+            self.env.cr.rollback()
+            run._fail(e)
+            run._commit()
+            raise
+        run._finish(total, chunks, f"{total} facture(s) marquée(s) comme en retard")
+        return total
     
+    # === INVALIDATION DE LA RENTABILITÉ ===
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env['ir.sequence']._assign_batch_names(vals_list, 'soya.financial.invoice', ('Nouvelle Facture',), 'FAC-NEW')
+        records = super().create(vals_list)
+        self.env['soya.property.profitability']._invalidate_properties(records.sudo().mapped('property_id'))
+        return records
+
+    def write(self, vals):
+        profitability = self.env['soya.property.profitability']
+        properties = profitability._get_impacted_properties(self, vals)
+        res = super().write(vals)
+        profitability._invalidate_properties(properties | profitability._get_impacted_properties(self, vals))
+        return res
+
+    def unlink(self):
+        properties = self.sudo().mapped('property_id')
+        res = super().unlink()
+        self.env['soya.property.profitability']._invalidate_properties(properties)
+        return res
+
     def action_print_invoice(self):
         """Imprimer la facture/quittance"""
         company = self.company_id or self.env.company
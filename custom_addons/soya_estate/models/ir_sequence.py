@@ -0,0 +1,89 @@
+from odoo import models, fields, api
+
+
+class IrSequence(models.Model):
+    _inherit = 'ir.sequence'
+
+    # === ALLOCATION PAR LOT ===
+    @api.model
+    def _next_batch_by_code(self, sequence_code, count, sequence_date=None):
+        """Réserve ``count`` numéros de la séquence ``sequence_code`` en un aller-retour.
+
+        Équivalent groupé de ``next_by_code``: mêmes règles de société et de
+        plages de dates. Les séquences « standard » tirent les numéros d'un
+        seul ``nextval`` sur ``generate_series`` ; les séquences « sans trou »
+        avancent ``number_next`` d'un seul UPDATE (verrou jusqu'au commit).
+
+        :return: liste de ``count`` références, ou de ``False`` si la séquence n'existe pas
+        """
+        if count <= 0:
+            return []
+        self.check_access_rights('read')
+        company_id = self.env.company.id
+        sequence = self.search(
+            [('code', '=', sequence_code), ('company_id', 'in', [company_id, False])],
+            order='company_id', limit=1,
+        )
+        if not sequence:
+            return [False] * count
+        return sequence.sudo()._next_batch(count, sequence_date)
+
+    def _next_batch(self, count, sequence_date=None):
+        self.ensure_one()
+        if not self.use_date_range:
+            numbers = self._reserve_numbers(self, f"ir_sequence_{self.id:03d}", count)
+            return [self.get_next_char(number) for number in numbers]
+
+        dt = sequence_date or self._context.get('ir_sequence_date', fields.Date.today())
+        date_range = self.env['ir.sequence.date_range'].search(
+            [('sequence_id', '=', self.id), ('date_from', '<=', dt), ('date_to', '>=', dt)], limit=1,
+        )
+        if not date_range:
+            date_range = self._create_date_range_seq(dt)
+        numbers = self._reserve_numbers(date_range, f"ir_sequence_{self.id:03d}_{date_range.id:03d}", count)
+        sequence = self.with_context(
+            ir_sequence_date=dt,
+            ir_sequence_date_range=date_range.date_from,
+        )
+        return [sequence.get_next_char(number) for number in numbers]
+
+    def _reserve_numbers(self, record, pg_sequence, count):
+        """Numéros réservés sur ``record`` (séquence ou plage de dates)"""
+        if self.implementation == 'standard':
+            self.env.cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [pg_sequence, count])
+            return [row[0] for row in self.env.cr.fetchall()]
+        record.flush_recordset(['number_next'])
+        self.env.cr.execute(f"""
+            UPDATE {record._table}
+            SET number_next = number_next + %(step)s * %(count)s
+            WHERE id = %(id)s
+            RETURNING number_next - %(step)s * %(count)s
+        """, {'id': record.id, 'step': self.number_increment, 'count': count})
+        first = self.env.cr.fetchone()[0]
+        record.invalidate_recordset(['number_next'])
+        return [first + index * self.number_increment for index in range(count)]
+
+    def _switch_to_no_gap(self):
+        """Passe les séquences « standard » de ``self`` en « sans trou » sans réémettre de numéro.
+
+        Le compteur d'une séquence standard vit dans sa séquence PostgreSQL,
+        supprimée au changement d'implémentation: le prochain numéro réel
+        (``number_next_actual``) est reporté dans ``number_next`` par la même écriture.
+        """
+        for sequence in self.filtered(lambda s: s.implementation == 'standard'):
+            for date_range in sequence.date_range_ids:
+                date_range.number_next = date_range.number_next_actual
+            sequence.write({'implementation': 'no_gap', 'number_next': sequence.number_next_actual})
+        return True
+
+    @api.model
+    def _assign_batch_names(self, vals_list, sequence_code, placeholders, fallback, field_name='name'):
+        """Renseigne ``field_name`` des vals sans référence, en une seule réservation.
+
+        :param placeholders: valeurs considérées comme « pas encore numéroté »
+        :param fallback: référence utilisée si la séquence n'existe pas
+        """
+        pending = [vals for vals in vals_list if not vals.get(field_name) or vals[field_name] in placeholders]
+        for vals, name in zip(pending, self._next_batch_by_code(sequence_code, len(pending))):
+            vals[field_name] = name or fallback
+        return vals_list
@@ -1,7 +1,12 @@
 from odoo import models, fields, api
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
-from statistics import mean, stdev
+from collections import defaultdict
+from math import isnan, sqrt
+
+import numpy as np
+
+from ..tools.market_forecast import forecast_prices, monthly_series
 
 
 class SoyaMarketAnalytics(models.Model):
@@ -160,84 +165,170 @@ class SoyaMarketAnalytics(models.Model):
     def _validate_date(self, date_field):
         return date_field and isinstance(date_field, date)
     
-    @api.depends('property_type_id', 'location', 'analysis_date', 'historical_period_months')
-    def _compute_market_data(self):
+    def _get_location_quarter(self):
+        """Quartier correspondant au champ Localisation (clé ou libellé), sinon False"""
+        self.ensure_one()
+        location = (self.location or '').strip().lower()
+        if not location:
+            return False
+        for key, label in self.env['soya.property']._fields['quarter'].selection:
+            if location in (key, label.lower()):
+                return key
+        return False
+
+    def _group_by_market_window(self, months=None):
+        """Regroupe les analyses par (type de bien, quartier, date d'analyse, profondeur en mois).
+
+        Les analyses partageant la même fenêtre sont calculées par une seule
+        ligne de paramètres dans les requêtes agrégées.
+        """
+        windows = defaultdict(list)
         for analytics in self:
             if not self._validate_date(analytics.analysis_date):
-                analytics.avg_property_price = 0
-                analytics.price_trend = 0
-                analytics.price_volatility = 0
                 continue
-            
-            period_start = analytics.analysis_date - relativedelta(months=analytics.historical_period_months)
-            
-            domain = [
-                ('create_date', '>=', datetime.combine(period_start, datetime.min.time())),
-                ('create_date', '<=', datetime.combine(analytics.analysis_date, datetime.max.time())),
-            ]
-            
-            if analytics.property_type_id:
-                domain.append(('property_type_id', '=', analytics.property_type_id.id))
-            
-            properties = self.env['soya.property'].search(domain)
-            
-            if properties:
-                prices = [p.expected_price for p in properties if p.expected_price]
-                analytics.avg_property_price = mean(prices) if prices else 0
-                analytics.price_volatility = stdev(prices) if len(prices) > 1 else 0
-                
-                current_prices = [p.expected_price for p in properties.filtered(
-                    lambda x: x.create_date.date() >= analytics.analysis_date - relativedelta(months=1)
-                ) if p.expected_price]
-                old_prices = [p.expected_price for p in properties.filtered(
-                    lambda x: x.create_date.date() < analytics.analysis_date - relativedelta(months=1)
-                ) if p.expected_price]
-                
-                if current_prices and old_prices:
-                    analytics.price_trend = ((mean(current_prices) - mean(old_prices)) / mean(old_prices) * 100)
-                else:
-                    analytics.price_trend = 0
+            key = (
+                analytics.property_type_id.id or None,
+                analytics._get_location_quarter() or None,
+                analytics.analysis_date,
+                months if months is not None else analytics.historical_period_months,
+            )
+            windows[key].append(analytics)
+        return windows
+
+    def _market_window_params(self, windows):
+        """Colonnes (listes parallèles) passées à unnest() pour les requêtes agrégées"""
+        type_ids, quarters, date_froms, date_tos, recent_froms = [], [], [], [], []
+        for type_id, quarter, analysis_date, months in windows:
+            type_ids.append(type_id)
+            quarters.append(quarter)
+            date_froms.append(analysis_date - relativedelta(months=months))
+            date_tos.append(analysis_date)
+            recent_froms.append(analysis_date - relativedelta(months=1))
+        return list(range(len(windows))), type_ids, quarters, date_froms, date_tos, recent_froms
+
+    def _read_price_statistics(self, windows):
+        """Effectifs, sommes et sommes des carrés des prix par fenêtre (totaux et mois récent)"""
+        self.env['soya.market.snapshot'].flush_model()
+        self.env.cr.execute("""
+            SELECT p.window_idx,
+                   SUM(s.priced_count),
+                   SUM(s.price_sum),
+                   SUM(s.price_sq_sum),
+                   COALESCE(SUM(s.priced_count) FILTER (WHERE s.snapshot_date >= p.recent_from), 0),
+                   COALESCE(SUM(s.price_sum) FILTER (WHERE s.snapshot_date >= p.recent_from), 0)
+            FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::date[], %s::date[], %s::date[])
+                 AS p(window_idx, type_id, quarter, date_from, date_to, recent_from)
+            JOIN soya_market_snapshot s
+              ON s.snapshot_date BETWEEN p.date_from AND p.date_to
+             AND (p.type_id IS NULL OR s.property_type_id = p.type_id)
+             AND (p.quarter IS NULL OR s.quarter = p.quarter)
+            GROUP BY p.window_idx
+        """, self._market_window_params(windows))
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    def _read_activity_statistics(self, windows):
+        """Annonces publiées, offres et jours sur le marché cumulés par fenêtre"""
+        self.env['soya.market.snapshot'].flush_model()
+        self.env.cr.execute("""
+            SELECT p.window_idx,
+                   SUM(s.listing_count),
+                   SUM(s.offer_count),
+                   SUM(s.days_on_market_sum)
+            FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::date[], %s::date[])
+                 AS p(window_idx, type_id, quarter, date_from, date_to)
+            JOIN soya_market_snapshot s
+              ON s.snapshot_date BETWEEN p.date_from AND p.date_to
+             AND (p.type_id IS NULL OR s.property_type_id = p.type_id)
+             AND (p.quarter IS NULL OR s.quarter = p.quarter)
+            GROUP BY p.window_idx
+        """, self._market_window_params(windows)[:5])
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    def _read_monthly_price_series(self, windows):
+        """Prix moyens mensuels par fenêtre: matrice (fenêtres × mois) alignée sur le mois d'analyse"""
+        width = max(max(months for *_, months in windows), 0) + 1
+        counts = np.zeros((len(windows), width))
+        sums = np.zeros((len(windows), width))
+        self.env['soya.market.snapshot'].flush_model()
+        self.env.cr.execute("""
+            SELECT p.window_idx,
+                   ((EXTRACT(YEAR FROM p.date_to) - EXTRACT(YEAR FROM s.snapshot_date)) * 12
+                    + EXTRACT(MONTH FROM p.date_to) - EXTRACT(MONTH FROM s.snapshot_date))::int,
+                   SUM(s.priced_count),
+                   SUM(s.price_sum)
+            FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::date[], %s::date[])
+                 AS p(window_idx, type_id, quarter, date_from, date_to)
+            JOIN soya_market_snapshot s
+              ON s.snapshot_date BETWEEN p.date_from AND p.date_to
+             AND (p.type_id IS NULL OR s.property_type_id = p.type_id)
+             AND (p.quarter IS NULL OR s.quarter = p.quarter)
+            GROUP BY 1, 2
+        """, self._market_window_params(windows)[:5])
+        for idx, months_back, count, total in self.env.cr.fetchall():
+            counts[idx, width - 1 - months_back] = count
+            sums[idx, width - 1 - months_back] = total
+        return monthly_series(counts, sums)
+
+    @api.model
+    def _recompute_from_day(self, day):
+        """Planifie le recalcul des analyses dont la fenêtre couvre des jours nouvellement agrégés"""
+        analyses = self.search([('analysis_date', '>=', day)])
+        for fname in ('avg_property_price', 'listings_count', 'predicted_price_3m'):
+            self.env.add_to_compute(self._fields[fname], analyses)
+        analyses.flush_recordset()
+
+    @api.depends('property_type_id', 'location', 'analysis_date', 'historical_period_months')
+    def _compute_market_data(self):
+        self.avg_property_price = 0
+        self.price_trend = 0
+        self.price_volatility = 0
+
+        windows = self._group_by_market_window()
+        if not windows:
+            return
+        stats = self._read_price_statistics(windows)
+
+        for idx, records in enumerate(windows.values()):
+            if idx not in stats:
+                continue
+            count, total, sq_total, recent_count, recent_total = stats[idx]
+            if not count:
+                continue
+            avg_price = total / count
+            variance = (sq_total - total * total / count) / (count - 1) if count > 1 else 0
+            old_count = count - recent_count
+            if recent_count and old_count:
+                old_avg = (total - recent_total) / old_count
+                price_trend = (recent_total / recent_count - old_avg) / old_avg * 100 if old_avg else 0
             else:
-                analytics.avg_property_price = 0
-                analytics.price_trend = 0
-                analytics.price_volatility = 0
-    
+                price_trend = 0
+            for analytics in records:
+                analytics.avg_property_price = avg_price
+                analytics.price_volatility = sqrt(max(variance, 0))
+                analytics.price_trend = price_trend
+
     @api.depends('property_type_id', 'location', 'analysis_date')
     def _compute_market_activity(self):
-        for analytics in self:
-            if not self._validate_date(analytics.analysis_date):
-                analytics.listings_count = 0
-                analytics.absorption_rate = 0
-                analytics.avg_days_on_market = 0
-                analytics.sale_velocity = 0
+        self.listings_count = 0
+        self.absorption_rate = 0
+        self.avg_days_on_market = 0
+        self.sale_velocity = 0
+
+        windows = self._group_by_market_window(months=3)
+        if not windows:
+            return
+        stats = self._read_activity_statistics(windows)
+
+        for idx, records in enumerate(windows.values()):
+            if idx not in stats:
                 continue
-            
-            period_start = analytics.analysis_date - relativedelta(months=3)
-            
-            domain = [
-                ('create_date', '>=', datetime.combine(period_start, datetime.min.time())),
-                ('create_date', '<=', datetime.combine(analytics.analysis_date, datetime.max.time())),
-                ('state', '=', 'new'),
-            ]
-            
-            if analytics.property_type_id:
-                domain.append(('property_type_id', '=', analytics.property_type_id.id))
-            
-            properties = self.env['soya.property'].search(domain)
-            analytics.listings_count = len(properties)
-            
-            offers_domain = domain.copy()
-            offers_domain.pop()
-            offers = self.env['soya.property.offer'].search(offers_domain)
-            analytics.absorption_rate = (len(offers) / max(1, len(properties)) * 100) if properties else 0
-            
-            if offers:
-                days_list = [(o.create_date - o.property_id.create_date).days for o in offers if o.property_id]
-                analytics.avg_days_on_market = mean(days_list) if days_list else 0
-                analytics.sale_velocity = mean(days_list) if days_list else 0
-            else:
-                analytics.avg_days_on_market = 0
-                analytics.sale_velocity = 0
+            listings_count, offers_count, days_sum = stats[idx]
+            avg_days = days_sum / offers_count if offers_count else 0
+            for analytics in records:
+                analytics.listings_count = listings_count
+                analytics.absorption_rate = (offers_count / listings_count * 100) if listings_count else 0
+                analytics.avg_days_on_market = avg_days
+                analytics.sale_velocity = avg_days
     
     @api.depends()
     def _compute_supply_demand(self):
@@ -261,23 +352,35 @@ class SoyaMarketAnalytics(models.Model):
             analytics.supply_level = 'high' if available_count > 10 else 'moderate'
             analytics.market_balance = interested_prospects / max(1, available_count)
     
-    @api.depends('avg_property_price', 'price_trend', 'price_volatility')
+    @api.depends('property_type_id', 'location', 'analysis_date', 'historical_period_months',
+                 'avg_property_price', 'price_volatility')
     def _compute_predictions(self):
-        for analytics in self:
-            if not analytics.avg_property_price:
-                analytics.predicted_price_3m = 0
-                analytics.predicted_price_6m = 0
-                analytics.predicted_price_12m = 0
-                analytics.price_prediction_confidence = 0
-                continue
-            
-            monthly_trend = analytics.price_trend / 12 if analytics.price_trend else 0
-            
-            analytics.predicted_price_3m = analytics.avg_property_price * (1 + (monthly_trend * 3) / 100)
-            analytics.predicted_price_6m = analytics.avg_property_price * (1 + (monthly_trend * 6) / 100)
-            analytics.predicted_price_12m = analytics.avg_property_price * (1 + (monthly_trend * 12) / 100)
-            
-            analytics.price_prediction_confidence = min(95, 100 - (analytics.price_volatility / analytics.avg_property_price * 100 if analytics.avg_property_price else 0))
+        self.predicted_price_3m = 0
+        self.predicted_price_6m = 0
+        self.predicted_price_12m = 0
+        self.price_prediction_confidence = 0
+
+        windows = self._group_by_market_window()
+        if not windows:
+            return
+        forecast = forecast_prices(self._read_monthly_price_series(windows), horizons=(3, 6, 12))
+
+        for idx, records in enumerate(windows.values()):
+            predicted_3m, predicted_6m, predicted_12m = (max(0.0, float(p)) for p in forecast.predictions[idx])
+            confidence = float(forecast.confidence[idx])
+            for analytics in records:
+                if not analytics.avg_property_price:
+                    continue
+                analytics.predicted_price_3m = predicted_3m
+                analytics.predicted_price_6m = predicted_6m
+                analytics.predicted_price_12m = predicted_12m
+                if isnan(confidence):
+                    # Moins de trois mois renseignés: confiance déduite de la volatilité
+                    analytics.price_prediction_confidence = max(0.0, min(
+                        95, 100 - analytics.price_volatility / analytics.avg_property_price * 100
+                    ))
+                else:
+                    analytics.price_prediction_confidence = confidence
     
     @api.depends('market_balance', 'price_trend', 'absorption_rate', 'risk_level')
     def _compute_recommendation(self):
@@ -0,0 +1,146 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaMarketSnapshot(models.Model):
+    _name = 'soya.market.snapshot'
+    _description = 'Instantané Journalier du Marché'
+    _order = 'snapshot_date desc, property_type_id, quarter'
+    _rec_name = 'snapshot_date'
+
+    LAST_DAY_PARAM = 'soya_estate.market_snapshot_last_day'
+    # Nombre maximum de jours agrégés par requête lors du rattrapage
+    BATCH_DAYS = 31
+
+    snapshot_date = fields.Date(string="Jour", required=True, readonly=True, index=True)
+
+    property_type_id = fields.Many2one(
+        'soya.property.type',
+        string='Type de Bien',
+        readonly=True,
+        index=True,
+        ondelete='cascade'
+    )
+
+    quarter = fields.Selection(
+        selection=lambda self: self.env['soya.property']._fields['quarter'].selection,
+        string="Quartier",
+        readonly=True
+    )
+
+    listing_count = fields.Integer(string="Annonces Publiées", readonly=True)
+    priced_count = fields.Integer(string="Annonces avec Prix", readonly=True)
+    price_sum = fields.Float(string="Somme des Prix", readonly=True)
+    price_sq_sum = fields.Float(string="Somme des Carrés des Prix", readonly=True)
+    offer_count = fields.Integer(string="Offres Reçues", readonly=True)
+    days_on_market_sum = fields.Float(
+        string="Somme Jours sur Marché",
+        readonly=True,
+        help="Somme, pour les offres du jour, des jours écoulés depuis la publication du bien"
+    )
+
+    _sql_constraints = [
+        ('snapshot_unique', 'unique(snapshot_date, property_type_id, quarter)',
+         "Un seul instantané par jour, type de bien et quartier."),
+    ]
+
+    # === ALIMENTATION INCRÉMENTALE ===
+    def _get_last_processed_day(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(self.LAST_DAY_PARAM)
+        if value:
+            return fields.Date.from_string(value)
+        self.env.cr.execute("SELECT MIN(create_date)::date FROM soya_property")
+        first_day = self.env.cr.fetchone()[0]
+        return first_day - timedelta(days=1) if first_day else None
+
+    def _set_last_processed_day(self, day):
+        self.env['ir.config_parameter'].sudo().set_param(self.LAST_DAY_PARAM, fields.Date.to_string(day))
+
+    def _aggregate_days(self, date_from, date_to):
+        """(Ré)agrège les jours [date_from, date_to] à partir des biens et des offres"""
+        self.env['soya.property'].flush_model(['create_date', 'expected_price', 'property_type_id', 'quarter'])
+        self.env['soya.property.offer'].flush_model(['create_date', 'property_id'])
+        params = {
+            'date_from': date_from,
+            'date_to': date_to + timedelta(days=1),
+            'uid': self.env.uid,
+        }
+        self.env.cr.execute("""
+            DELETE FROM soya_market_snapshot
+            WHERE snapshot_date >= %(date_from)s AND snapshot_date < %(date_to)s
+        """, params)
+        self.env.cr.execute("""
+            INSERT INTO soya_market_snapshot (
+                snapshot_date, property_type_id, quarter,
+                listing_count, priced_count, price_sum, price_sq_sum,
+                offer_count, days_on_market_sum,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT day, type_id, quarter,
+                   SUM(listing_count), SUM(priced_count), SUM(price_sum), SUM(price_sq_sum),
+                   SUM(offer_count), SUM(days_on_market_sum),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM (
+                SELECT sp.create_date::date AS day,
+                       sp.property_type_id AS type_id,
+                       sp.quarter,
+                       COUNT(*) AS listing_count,
+                       COUNT(*) FILTER (WHERE sp.expected_price <> 0) AS priced_count,
+                       COALESCE(SUM(sp.expected_price), 0) AS price_sum,
+                       COALESCE(SUM(sp.expected_price * sp.expected_price), 0) AS price_sq_sum,
+                       0 AS offer_count,
+                       0 AS days_on_market_sum
+                FROM soya_property sp
+                WHERE sp.create_date >= %(date_from)s AND sp.create_date < %(date_to)s
+                GROUP BY 1, 2, 3
+
+                UNION ALL
+
+                SELECT spo.create_date::date,
+                       sp.property_type_id,
+                       sp.quarter,
+                       0, 0, 0, 0,
+                       COUNT(*),
+                       COALESCE(SUM(DATE_PART('day', spo.create_date - sp.create_date)), 0)
+                FROM soya_property_offer spo
+                JOIN soya_property sp ON sp.id = spo.property_id
+                WHERE spo.create_date >= %(date_from)s AND spo.create_date < %(date_to)s
+                GROUP BY 1, 2, 3
+            ) facts
+            GROUP BY day, type_id, quarter
+        """, params)
+        self.invalidate_model()
+        return self.env.cr.rowcount
+
+    @api.model
+    def _cron_update_snapshots(self):
+        """Agrège les jours complets non encore traités (jusqu'à la veille)"""
+        yesterday = fields.Date.today() - timedelta(days=1)
+        last_day = self._get_last_processed_day()
+        if last_day is None:
+            self._set_last_processed_day(yesterday)
+            return 0
+
+        first_day = last_day + timedelta(days=1)
+        rows = 0
+        while last_day < yesterday:
+            date_from = last_day + timedelta(days=1)
+            date_to = min(yesterday, date_from + timedelta(days=self.BATCH_DAYS - 1))
+            rows += self._aggregate_days(date_from, date_to)
+            self._set_last_processed_day(date_to)
+            last_day = date_to
+
+        if first_day <= yesterday:
+            _logger.info(f"Instantanés marché: {rows} ligne(s) pour {first_day} → {yesterday}")
+            self.env['soya.market.analytics']._recompute_from_day(first_day)
+        return rows
+
+    @api.model
+    def action_rebuild_snapshots(self):
+        """Reconstruire entièrement la table de faits"""
+        self.env['ir.config_parameter'].sudo().set_param(self.LAST_DAY_PARAM, False)
+        self.env.cr.execute("DELETE FROM soya_market_snapshot")
+        return self._cron_update_snapshots()
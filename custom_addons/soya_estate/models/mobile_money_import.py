@@ -0,0 +1,227 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from collections import defaultdict
+import logging
+
+from ..tools.bank_statement import open_binary_field, StatementFormatError
+from ..tools.mobile_money import iter_mobile_money_rows, iter_chunks, normalize_phone, reference_tokens
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaMobileMoneyImport(models.Model):
+    _name = 'soya.mobile.money.import'
+    _description = 'Import de Transactions Mobile Money'
+    _inherit = ['mail.thread']
+    _order = 'import_date desc, id desc'
+
+    # Nombre de lignes lues et créées par paquet
+    CHUNK_SIZE = 2000
+
+    name = fields.Char(string='Référence', required=True, default='Nouvel import', tracking=True)
+    import_date = fields.Datetime(string="Date d'Import", readonly=True)
+    operator = fields.Selection([
+        ('orange', 'Orange Money'),
+        ('moov', 'Moov Money'),
+        ('wave', 'Wave'),
+        ('other', 'Autre'),
+    ], string='Opérateur', default='orange', required=True)
+
+    import_file = fields.Binary(string='Export Opérateur', attachment=True, help='Fichier CSV exporté par l\'opérateur')
+    import_filename = fields.Char(string='Nom du Fichier')
+
+    state = fields.Selection([
+        ('draft', 'Brouillon'),
+        ('done', 'Importé'),
+    ], string='État', default='draft', tracking=True)
+
+    payment_ids = fields.One2many('soya.payment', 'mobile_money_import_id', string='Paiements Créés')
+    unmatched_line_ids = fields.One2many(
+        'soya.mobile.money.import.line',
+        'import_id',
+        string='Lignes Non Rapprochées'
+    )
+
+    row_count = fields.Integer(string='Lignes Lues', readonly=True)
+    payment_count = fields.Integer(string='Paiements Créés', readonly=True)
+    duplicate_count = fields.Integer(string='Doublons Ignorés', readonly=True)
+    unmatched_count = fields.Integer(string='Lignes Non Rapprochées', readonly=True)
+
+    # === INDEX DES FACTURES OUVERTES ===
+    def _build_invoice_index(self):
+        """Index mémoire des factures ouvertes: par référence et par téléphone du client.
+
+        Les factures d'un même numéro sont classées de la plus ancienne à la
+        plus récente échéance ; le reste dû est suivi pour répartir les paiements.
+        """
+        invoices = self.env['soya.financial.invoice'].search_read(
+            [('state', 'in', ['sent', 'overdue']), ('amount_residual', '>', 0)],
+            ['name', 'partner_id', 'amount_residual', 'due_date'],
+            order='due_date, id',
+        )
+        partner_ids = {invoice['partner_id'][0] for invoice in invoices if invoice['partner_id']}
+        phones_by_partner = defaultdict(set)
+        for partner in self.env['res.partner'].search_read([('id', 'in', list(partner_ids))], ['phone', 'mobile']):
+            for number in (partner['phone'], partner['mobile']):
+                if normalize_phone(number):
+                    phones_by_partner[partner['id']].add(normalize_phone(number))
+
+        by_reference = {}
+        by_phone = defaultdict(list)
+        residuals = {}
+        for invoice in invoices:
+            residuals[invoice['id']] = invoice['amount_residual']
+            by_reference[invoice['name'].upper()] = invoice['id']
+            if invoice['partner_id']:
+                for phone in phones_by_partner[invoice['partner_id'][0]]:
+                    by_phone[phone].append(invoice['id'])
+        return by_reference, by_phone, residuals
+
+    @staticmethod
+    def _resolve_invoice(row, by_reference, by_phone, residuals):
+        """Facture réglée par la ligne: référence citée dans le motif, sinon plus ancienne dette du payeur.
+
+        Seules les factures restant dues sont retenues: un paiement sans facture
+        ouverte reste en ligne non rapprochée plutôt que d'être imputé en trop-perçu.
+        """
+        for token in reference_tokens(row.reference):
+            invoice_id = by_reference.get(token)
+            if invoice_id and residuals[invoice_id] > 0:
+                return invoice_id
+        for invoice_id in by_phone.get(row.phone, ()):
+            if residuals[invoice_id] > 0:
+                return invoice_id
+        return None
+
+    # === IMPORT ===
+    def _get_existing_transactions(self, transaction_ids):
+        """Transactions déjà enregistrées (import idempotent), en une requête par paquet"""
+        existing = self.env['soya.payment'].search_read([
+            ('payment_method', '=', 'mobile_money'),
+            ('reference_number', 'in', transaction_ids),
+        ], ['reference_number'])
+        return {payment['reference_number'] for payment in existing}
+
+    def action_import(self):
+        """Importe l'export par paquets de ``CHUNK_SIZE`` lignes, validés un à un.
+
+        Chaque paquet est validé en base: le verrou de la séquence sans trou
+        des paiements n'est pas conservé jusqu'à la fin du fichier. L'import
+        étant idempotent, un fichier interrompu peut être réimporté: les
+        transactions déjà enregistrées sont comptées comme doublons.
+        """
+        self.ensure_one()
+        if not self.with_context(bin_size=True).import_file:
+            raise UserError("Veuillez joindre l'export de l'opérateur.")
+        by_reference, by_phone, residuals = self._build_invoice_index()
+        Payment = self.env['soya.payment'].with_context(tracking_disable=True, mail_create_nolog=True)
+        Line = self.env['soya.mobile.money.import.line']
+
+        run = self.env['soya.batch.run']._start('mobile_money_import', f"Import Mobile Money {self.name}")
+        row_count = payment_count = duplicate_count = unmatched_count = chunks = 0
+        try:
+            with open_binary_field(self, 'import_file') as stream:
+                for chunk in iter_chunks(iter_mobile_money_rows(stream), self.CHUNK_SIZE):
+                    row_count += len(chunk)
+                    existing = self._get_existing_transactions(
+                        [row.transaction_id for row in chunk if row.transaction_id]
+                    )
+                    payments_vals, unmatched_vals = [], []
+                    for row in chunk:
+                        if row.transaction_id in existing:
+                            duplicate_count += 1
+                            continue
+                        reason = row.error
+                        if not reason and not row.transaction_id:
+                            reason = 'Identifiant de transaction manquant'
+                        if not reason and row.amount <= 0:
+                            reason = 'Montant nul ou négatif'
+                        invoice_id = None if reason else self._resolve_invoice(row, by_reference, by_phone, residuals)
+                        if not reason and not invoice_id:
+                            reason = 'Aucune facture ouverte pour ce payeur'
+                        if reason:
+                            unmatched_vals.append(self._prepare_unmatched_vals(row, reason))
+                            continue
+                        residuals[invoice_id] -= row.amount
+                        existing.add(row.transaction_id)
+                        payments_vals.append({
+                            'invoice_id': invoice_id,
+                            'amount': row.amount,
+                            'payment_date': row.date,
+                            'payment_method': 'mobile_money',
+                            'reference_number': row.transaction_id,
+                            'notes': ' - '.join(filter(None, [row.payer_name, row.phone, row.reference])),
+                            'state': 'confirmed',
+                            'mobile_money_import_id': self.id,
+                        })
+                    Payment.create(payments_vals)
+                    Line.create(unmatched_vals)
+                    payment_count += len(payments_vals)
+                    unmatched_count += len(unmatched_vals)
+                    chunks += 1
+                    run._progress(row_count, chunks)
+                    run._commit()
+            if not row_count:
+                raise StatementFormatError("aucune transaction dans l'export")
+        except StatementFormatError as e:
+            # Levée à la lecture, avant le traitement du paquet: les paquets précédents restent validés
+            run._fail(e)
+            run._commit()
+            raise UserError(f"Export illisible: {e}")
+        except Exception as e:
+            self.env.cr.rollback()
+            run._fail(e)
+            run._commit()
+            raise
+
+        self.write({
+            'state': 'done',
+            'import_date': fields.Datetime.now(),
+            'row_count': row_count,
+            'payment_count': payment_count,
+            'duplicate_count': duplicate_count,
+            'unmatched_count': unmatched_count,
+        })
+        self.env['soya.payment']._refresh_payment_reports()
+        summary = (
+            f"{row_count} ligne(s) lue(s): {payment_count} paiement(s) créé(s), "
+            f"{duplicate_count} doublon(s) ignoré(s), {unmatched_count} ligne(s) non rapprochée(s)"
+        )
+        self.message_post(body=summary)
+        run._finish(row_count, chunks, summary)
+        return True
+
+    def _prepare_unmatched_vals(self, row, reason):
+        return {
+            'import_id': self.id,
+            'row_number': row.row_number,
+            'transaction_id': row.transaction_id,
+            'transaction_date': row.date,
+            'amount': row.amount,
+            'phone': row.phone,
+            'payer_name': row.payer_name,
+            'reference': row.reference,
+            'reason': reason,
+        }
+
+
+class SoyaMobileMoneyImportLine(models.Model):
+    _name = 'soya.mobile.money.import.line'
+    _description = 'Ligne Mobile Money Non Rapprochée'
+    _order = 'import_id, row_number'
+
+    import_id = fields.Many2one(
+        'soya.mobile.money.import',
+        string='Import',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    row_number = fields.Integer(string='Ligne')
+    transaction_id = fields.Char(string='Transaction')
+    transaction_date = fields.Date(string='Date')
+    amount = fields.Float(string='Montant')
+    phone = fields.Char(string='Téléphone')
+    payer_name = fields.Char(string='Payeur')
+    reference = fields.Char(string='Motif')
+    reason = fields.Char(string='Motif du Rejet')
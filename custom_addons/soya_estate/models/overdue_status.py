@@ -6,6 +6,7 @@ class SoyaOverdueStatus(models.Model):
     _name = 'soya.overdue.status'
     _description = 'État des Impayés'
     _order = 'days_overdue desc'
+    _inherit = 'soya.reporting.view.mixin'
     _auto = False
     _table = 'soya_overdue_status'
 
@@ -31,38 +32,30 @@ class SoyaOverdueStatus(models.Model):
         ('overdue', 'En Retard'),
     ], string='État Facture', readonly=True)
 
-    def init(self):
-        self.env.cr.execute('DROP VIEW IF EXISTS soya_overdue_status CASCADE')
-        self.env.cr.execute('''
-            CREATE OR REPLACE VIEW soya_overdue_status AS (
-                SELECT
-                    row_number() OVER () as id,
-                    fi.id as invoice_id,
-                    fi.partner_id,
-                    fi.property_id,
-                    fi.name as invoice_number,
-                    fi.total_amount,
-                    COALESCE(SUM(sp.amount), 0) as paid_amount,
-                    fi.total_amount - COALESCE(SUM(sp.amount), 0) as remaining_amount,
-                    fi.currency_id,
-                    fi.due_date,
-                    CASE
-                        WHEN fi.due_date IS NULL THEN 0
-                        WHEN fi.due_date < CURRENT_DATE THEN (CURRENT_DATE - fi.due_date)
-                        ELSE 0
-                    END as days_overdue,
-                    CASE
-                        WHEN fi.state = 'draft' THEN 'draft'
-                        WHEN fi.state = 'cancelled' THEN 'draft'
-                        WHEN COALESCE(SUM(sp.amount), 0) = 0 THEN 
-                            CASE WHEN fi.due_date < CURRENT_DATE THEN 'overdue' ELSE 'pending' END
-                        WHEN COALESCE(SUM(sp.amount), 0) < fi.total_amount THEN 'partial'
-                        ELSE 'paid'
-                    END as invoice_state
-                FROM soya_financial_invoice fi
-                LEFT JOIN soya_payment sp ON fi.id = sp.invoice_id AND sp.state IN ('confirmed', 'reconciled')
-                WHERE fi.state NOT IN ('draft', 'cancelled')
-                GROUP BY fi.id, fi.partner_id, fi.property_id, fi.name, 
-                         fi.total_amount, fi.currency_id, fi.due_date, fi.state
-            )
-        ''')
\ No newline at end of file
+    def _reporting_query(self):
+        return '''
+            SELECT
+                fi.id as id,
+                fi.id as invoice_id,
+                fi.partner_id,
+                fi.property_id,
+                fi.name as invoice_number,
+                fi.total_amount,
+                fi.amount_paid as paid_amount,
+                fi.amount_residual as remaining_amount,
+                fi.currency_id,
+                fi.due_date,
+                CASE
+                    WHEN fi.due_date IS NULL THEN 0
+                    WHEN fi.due_date < CURRENT_DATE THEN (CURRENT_DATE - fi.due_date)
+                    ELSE 0
+                END as days_overdue,
+                CASE
+                    WHEN COALESCE(fi.amount_paid, 0) = 0 THEN 
+                        CASE WHEN fi.due_date < CURRENT_DATE THEN 'overdue' ELSE 'pending' END
+                    WHEN fi.amount_paid < fi.total_amount THEN 'partial'
+                    ELSE 'paid'
+                END as invoice_state
+            FROM soya_financial_invoice fi
+            WHERE fi.state NOT IN ('draft', 'cancelled')
+        '''
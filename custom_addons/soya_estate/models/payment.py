@@ -1,4 +1,4 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from datetime import timedelta
 
 class SoyaPayment(models.Model):
@@ -12,8 +12,7 @@ class SoyaPayment(models.Model):
         required=True,
         copy=False,
         readonly=True,
-        default=lambda self: self._generate_payment_number()
-     
+        default='Nouveau Paiement'
     )
 
     invoice_id = fields.Many2one(
@@ -55,6 +54,7 @@ class SoyaPayment(models.Model):
     payment_date = fields.Date(
         string='Date de Paiement',
         required=True,
+        index=True,
         default=fields.Date.context_today
     )
 
@@ -68,11 +68,20 @@ class SoyaPayment(models.Model):
 
     reference_number = fields.Char(
         string='Numéro de Référence',
-        help='Numéro de chèque, de transfert, etc.'
+        help='Numéro de chèque, de transfert, etc.',
+        index=True
     )
 
     notes = fields.Text(string='Notes')
 
+    mobile_money_import_id = fields.Many2one(
+        'soya.mobile.money.import',
+        string='Import Mobile Money',
+        readonly=True,
+        index=True,
+        ondelete='set null'
+    )
+
     state = fields.Selection([
         ('draft', 'Brouillon'),
         ('confirmed', 'Confirmé'),
@@ -82,7 +91,7 @@ class SoyaPayment(models.Model):
 
     remaining_amount = fields.Monetary(
         string='Montant Restant',
-        compute='_compute_remaining_amount',
+        related='invoice_id.amount_residual',
         store=True,
         readonly=True
     )
@@ -94,17 +103,30 @@ class SoyaPayment(models.Model):
         ondelete='cascade'
     )
 
-    @api.depends('invoice_id.total_amount', 'invoice_id.payment_ids.amount')
-    def _compute_remaining_amount(self):
-        for payment in self:
-            if payment.invoice_id:
-                total_paid = sum(payment.invoice_id.payment_ids.mapped('amount'))
-                payment.remaining_amount = payment.invoice_id.total_amount - total_paid
-            else:
-                payment.remaining_amount = 0
+    def init(self):
+        # Historique paginé par client (soya.payment.history)
+        tools.create_index(
+            self.env.cr, 'soya_payment_partner_id_payment_date_index',
+            self._table, ['partner_id', 'payment_date'],
+        )
 
     def _generate_payment_number(self):
-        return self.env['ir.sequence'].next_by_code('soya.payment') or 'PAY/000001'
+        return self.env['ir.sequence']._next_batch_by_code('soya.payment', 1)[0] or 'PAY/000001'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Numérotation attribuée à la création, en une réservation pour tout le lot"""
+        self.env['ir.sequence']._assign_batch_names(vals_list, 'soya.payment', ('Nouveau Paiement',), 'PAY/000001')
+        return super().create(vals_list)
+
+    @api.model
+    def _refresh_payment_reports(self):
+        """Rafraîchir les vues de reporting des paiements (après un import en masse)"""
+        self.flush_model()
+        self.env['soya.financial.invoice'].flush_model()
+        self.env['soya.reporting.view.mixin']._refresh_reporting_views(
+            ['soya.overdue.status', 'soya.payment.history']
+        )
 
     def action_confirm(self):
         self.state = 'confirmed'
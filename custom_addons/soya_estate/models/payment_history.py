@@ -3,7 +3,8 @@ from odoo import models, fields, api
 class SoyaPaymentHistory(models.Model):
     _name = 'soya.payment.history'
     _description = 'Historique des Transactions'
-    _order = 'transaction_date desc'
+    _order = 'transaction_date desc, id desc'
+    _inherit = 'soya.reporting.view.mixin'
     _auto = False
 
     payment_id = fields.Many2one('soya.payment', string='Paiement', readonly=True)
@@ -35,25 +36,27 @@ class SoyaPaymentHistory(models.Model):
     
     user_id = fields.Many2one('res.users', string='Utilisateur', readonly=True)
 
-    def init(self):
-        self.env.cr.execute('''
-            CREATE OR REPLACE VIEW soya_payment_history AS (
-                SELECT
-                    row_number() OVER () as id,
-                    sp.id as payment_id,
-                    sp.payment_date as transaction_date,
-                    EXTRACT(HOUR FROM sp.create_date)::text || ':' || 
-                    LPAD(EXTRACT(MINUTE FROM sp.create_date)::text, 2, '0') as transaction_time,
-                    sp.invoice_id,
-                    sp.partner_id,
-                    sp.property_id,
-                    sp.amount,
-                    sp.currency_id,
-                    sp.payment_method,
-                    sp.reference_number,
-                    sp.state as status,
-                    sp.write_uid as user_id
-                FROM soya_payment sp
-                ORDER BY sp.payment_date DESC
-            )
-        ''')
+    # Vue simple: une ligne par paiement, sans tri ni agrégat, afin que les
+    # filtres et le tri (transaction_date, partner_id) atteignent les index
+    # de soya_payment. En mode matérialisé, les mêmes index sont recréés.
+    _reporting_indexes = ['transaction_date', 'partner_id, transaction_date']
+
+    def _reporting_query(self):
+        return '''
+            SELECT
+                sp.id as id,
+                sp.id as payment_id,
+                sp.payment_date as transaction_date,
+                EXTRACT(HOUR FROM sp.create_date)::text || ':' || 
+                LPAD(EXTRACT(MINUTE FROM sp.create_date)::text, 2, '0') as transaction_time,
+                sp.invoice_id,
+                sp.partner_id,
+                sp.property_id,
+                sp.amount,
+                sp.currency_id,
+                sp.payment_method,
+                sp.reference_number,
+                sp.state as status,
+                sp.write_uid as user_id
+            FROM soya_payment sp
+        '''
@@ -0,0 +1,38 @@
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+
+class SoyaPenaltyRule(models.Model):
+    _name = 'soya.penalty.rule'
+    _description = 'Barème des Pénalités de Retard'
+    _order = 'min_days desc'
+
+    name = fields.Char(string="Libellé", required=True)
+    min_days = fields.Integer(
+        string="À partir de (jours)",
+        required=True,
+        default=1,
+        help="Nombre minimum de jours de retard pour appliquer ce palier"
+    )
+    rate = fields.Float(string="Taux (%)", required=True, digits=(5, 2), help="Pourcentage du montant HT de la facture")
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        # Un palier archivé ne bloque pas la création de son remplaçant
+        ('min_days_unique', 'EXCLUDE (min_days WITH =) WHERE (active)', "Un seul palier actif par nombre de jours de retard."),
+    ]
+
+    @api.constrains('min_days', 'rate')
+    def _check_values(self):
+        for rule in self:
+            if rule.min_days < 1:
+                raise ValidationError("Un palier s'applique à partir d'au moins un jour de retard.")
+            if rule.rate <= 0:
+                raise ValidationError("Le taux de pénalité doit être positif.")
+
+    def _get_rate_for(self, overdue_days):
+        """Taux du palier le plus élevé atteint parmi ``self`` (tous les paliers actifs si vide), 0 si aucun"""
+        for rule in (self or self.search([])).sorted('min_days', reverse=True):
+            if overdue_days >= rule.min_days:
+                return rule.rate
+        return 0.0
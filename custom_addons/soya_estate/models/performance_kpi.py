@@ -1,6 +1,8 @@
 from odoo import models, fields, api
+from odoo.tools import SQL
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
+from collections import defaultdict
 
 
 class SoyaPerformanceKPI(models.Model):
@@ -24,58 +26,69 @@ class SoyaPerformanceKPI(models.Model):
     total_offers = fields.Integer(
         string="Total Offres",
         compute='_compute_sales_kpis',
+        store=True,
         help="Nombre total d'offres créées"
     )
     
     offers_accepted = fields.Integer(
         string="Offres Acceptées",
-        compute='_compute_sales_kpis'
+        compute='_compute_sales_kpis',
+        store=True
     )
     
     acceptance_rate = fields.Float(
         string="Taux d'Acceptation (%)",
-        compute='_compute_sales_kpis'
+        compute='_compute_sales_kpis',
+        store=True
     )
     
     total_revenue = fields.Float(
         string="Revenu Total",
         compute='_compute_revenue_kpis',
+        store=True,
         help="Total des commissions et revenus"
     )
     
     avg_transaction_value = fields.Float(
         string="Valeur Transaction Moyenne",
-        compute='_compute_revenue_kpis'
+        compute='_compute_revenue_kpis',
+        store=True
     )
     
     total_prospects = fields.Integer(
         string="Total Prospects",
-        compute='_compute_prospect_kpis'
+        compute='_compute_prospect_kpis',
+        store=True
     )
     
     qualified_prospects = fields.Integer(
         string="Prospects Qualifiés",
-        compute='_compute_prospect_kpis'
+        compute='_compute_prospect_kpis',
+        store=True
     )
     
     conversion_rate = fields.Float(
         string="Taux Conversion (%)",
-        compute='_compute_prospect_kpis'
+        compute='_compute_prospect_kpis',
+        store=True
     )
     
     total_visits = fields.Integer(
         string="Total Visites",
-        compute='_compute_visit_kpis'
+        compute='_compute_visit_kpis',
+        store=True
     )
     
     completed_visits = fields.Integer(
         string="Visites Complétées",
-        compute='_compute_visit_kpis'
+        compute='_compute_visit_kpis',
+        store=True
     )
     
     avg_visit_quality = fields.Float(
         string="Qualité Visite Moyenne",
-        compute='_compute_visit_kpis'
+        compute='_compute_visit_kpis',
+        store=True
     )
     
     properties_available = fields.Integer(
@@ -100,108 +113,205 @@ class SoyaPerformanceKPI(models.Model):
             agent_label = f" - {kpi.agent_id.name}" if kpi.agent_id else " - Global"
             kpi.name = f"KPI {period_label}{agent_label}"
     
+    # Modèles sources: (champ date de la période, champs déclencheurs, filtré par agent)
+    _KPI_SOURCES = {
+        'soya.property.offer': ('create_date', {'state', 'salesperson_id'}, True),
+        'soya.prospect': ('create_date', {'state', 'salesperson_id'}, True),
+        'soya.visit': ('visit_date', {'state', 'salesperson_id', 'visit_date', 'quality_score'}, True),
+        'soya.sale.contract': ('create_date', {'state', 'sale_price'}, False),
+    }
+
     def _validate_dates(self, kpi):
         return (kpi.period_start and kpi.period_end and 
                 isinstance(kpi.period_start, date) and 
                 isinstance(kpi.period_end, date))
     
+    def _group_by_kpi_window(self):
+        """Regroupe les KPIs valides par (agent, début, fin): une ligne de paramètres par fenêtre"""
+        windows = defaultdict(list)
+        for kpi in self:
+            if self._validate_dates(kpi):
+                windows[(kpi.agent_id.id or None, kpi.period_start, kpi.period_end)].append(kpi)
+        return windows
+
+    def _kpi_source_restriction(self, model_name, alias):
+        """Restreint ``alias`` aux enregistrements sources lisibles (règles d'accès de l'environnement)"""
+        Source = self.env[model_name]
+        query = Source._where_calc([])
+        Source._apply_ir_rules(query, 'read')
+        if not query.where_clause:
+            return SQL("TRUE")
+        return SQL("%s IN %s", SQL.identifier(alias, 'id'), query.subselect())
+
+    def _read_kpi_aggregates(self, windows, query, restriction):
+        """Exécute une requête agrégée groupée par fenêtre.
+
+        La requête reçoit la relation ``p(window_idx, agent_id, date_from, date_to)``
+        via ``{params}`` puis la restriction des sources via ``{restriction}``
+        (dans cet ordre), et doit grouper par ``p.window_idx``.
+        """
+        agent_ids, date_froms, date_tos = [], [], []
+        for agent_id, period_start, period_end in windows:
+            agent_ids.append(agent_id)
+            date_froms.append(datetime.combine(period_start, datetime.min.time()))
+            date_tos.append(datetime.combine(period_end, datetime.max.time()))
+        params_sql = """unnest(%s::int[], %s::int[], %s::timestamp[], %s::timestamp[])
+                 AS p(window_idx, agent_id, date_from, date_to)"""
+        self.env.cr.execute(SQL(
+            query.format(params=params_sql, restriction='%s'),
+            list(range(len(windows))), agent_ids, date_froms, date_tos, restriction,
+        ))
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_kpis_for_sources(self, sources):
+        """KPIs dont la période (et l'agent) couvre les enregistrements sources"""
+        date_fname, _triggers, by_agent = self._KPI_SOURCES[sources._name]
+        sources = sources.sudo()
+        dates = [value for value in sources.mapped(date_fname) if value]
+        if not dates:
+            return self.sudo().browse()
+        domain = [
+            ('period_start', '<=', max(dates).date()),
+            ('period_end', '>=', min(dates).date()),
+        ]
+        if by_agent:
+            domain += ['|', ('agent_id', '=', False), ('agent_id', 'in', sources.mapped('salesperson_id').ids)]
+        return self.sudo().search(domain)
+
+    @api.model
+    def _invalidate_for_sources(self, sources):
+        """Marque à recalculer les KPIs couvrant les enregistrements sources.
+
+        Pour une suppression, récupérer les KPIs avec ``_get_kpis_for_sources``
+        avant ``unlink`` et ne les marquer qu'après: ``unlink`` vide les
+        recalculs en attente tant que les lignes existent encore.
+        """
+        self._get_kpis_for_sources(sources).modified(['period_start'])
+
+    @api.model
+    def _invalidate_for_write(self, sources, vals):
+        """À appeler avant et après l'écriture: l'agent ou la date peuvent avoir changé"""
+        if self._KPI_SOURCES[sources._name][1].intersection(vals):
+            self._invalidate_for_sources(sources)
+
     @api.depends('period_start', 'period_end', 'agent_id')
     def _compute_sales_kpis(self):
-        for kpi in self:
-            if not self._validate_dates(kpi):
-                kpi.total_offers = 0
-                kpi.offers_accepted = 0
-                kpi.acceptance_rate = 0
-                continue
-            
-            domain = [
-                ('create_date', '>=', datetime.combine(kpi.period_start, datetime.min.time())),
-                ('create_date', '<=', datetime.combine(kpi.period_end, datetime.max.time())),
-                ('state', '!=', 'cancelled'),
-            ]
-            
-            if kpi.agent_id:
-                domain.append(('salesperson_id', '=', kpi.agent_id.id))
-            
-            offers = self.env['soya.property.offer'].search(domain)
-            kpi.total_offers = len(offers)
-            kpi.offers_accepted = len(offers.filtered(lambda o: o.state == 'accepted'))
-            kpi.acceptance_rate = (kpi.offers_accepted / kpi.total_offers * 100) if kpi.total_offers > 0 else 0
+        self.total_offers = 0
+        self.offers_accepted = 0
+        self.acceptance_rate = 0
+        windows = self._group_by_kpi_window()
+        if not windows:
+            return
+        self.env['soya.property.offer'].flush_model(['create_date', 'state', 'salesperson_id'])
+        stats = self._read_kpi_aggregates(windows, """
+            SELECT p.window_idx,
+                   COUNT(spo.id),
+                   COUNT(spo.id) FILTER (WHERE spo.state = 'accepted')
+            FROM {params}
+            JOIN soya_property_offer spo
+              ON spo.create_date BETWEEN p.date_from AND p.date_to
+             AND spo.state != 'cancelled'
+             AND (p.agent_id IS NULL OR spo.salesperson_id = p.agent_id)
+             AND {restriction}
+            GROUP BY p.window_idx
+        """, self._kpi_source_restriction('soya.property.offer', 'spo'))
+        for idx, kpis in enumerate(windows.values()):
+            total_offers, offers_accepted = stats.get(idx, (0, 0))
+            for kpi in kpis:
+                kpi.total_offers = total_offers
+                kpi.offers_accepted = offers_accepted
+                kpi.acceptance_rate = (offers_accepted / total_offers * 100) if total_offers > 0 else 0
     
     @api.depends('period_start', 'period_end', 'agent_id')
     def _compute_revenue_kpis(self):
-        for kpi in self:
-            if not self._validate_dates(kpi):
-                kpi.total_revenue = 0
-                kpi.avg_transaction_value = 0
-                continue
-            
-            domain = [
-                ('create_date', '>=', datetime.combine(kpi.period_start, datetime.min.time())),
-                ('create_date', '<=', datetime.combine(kpi.period_end, datetime.max.time())),
-                ('state', 'in', ['active', 'done']),
-            ]
-            
-            contracts = self.env['soya.sale.contract'].search(domain)
-            
-            total_revenue = sum(contract.sale_price for contract in contracts)
-            kpi.total_revenue = total_revenue
-            kpi.avg_transaction_value = (total_revenue / len(contracts)) if len(contracts) > 0 else 0
+        self.total_revenue = 0
+        self.avg_transaction_value = 0
+        windows = self._group_by_kpi_window()
+        if not windows:
+            return
+        self.env['soya.sale.contract'].flush_model(['create_date', 'state', 'sale_price'])
+        stats = self._read_kpi_aggregates(windows, """
+            SELECT p.window_idx,
+                   COALESCE(SUM(ssc.sale_price), 0)::float,
+                   COUNT(ssc.id)
+            FROM {params}
+            JOIN soya_sale_contract ssc
+              ON ssc.create_date BETWEEN p.date_from AND p.date_to
+             AND ssc.state IN ('active', 'done')
+             AND {restriction}
+            GROUP BY p.window_idx
+        """, self._kpi_source_restriction('soya.sale.contract', 'ssc'))
+        for idx, kpis in enumerate(windows.values()):
+            total_revenue, contract_count = stats.get(idx, (0, 0))
+            for kpi in kpis:
+                kpi.total_revenue = total_revenue
+                kpi.avg_transaction_value = (total_revenue / contract_count) if contract_count > 0 else 0
     
     @api.depends('period_start', 'period_end', 'agent_id')
     def _compute_prospect_kpis(self):
-        for kpi in self:
-            if not self._validate_dates(kpi):
-                kpi.total_prospects = 0
-                kpi.qualified_prospects = 0
-                kpi.conversion_rate = 0
-                continue
-            
-            domain = [
-                ('create_date', '>=', datetime.combine(kpi.period_start, datetime.min.time())),
-                ('create_date', '<=', datetime.combine(kpi.period_end, datetime.max.time())),
-            ]
-            
-            if kpi.agent_id:
-                domain.append(('salesperson_id', '=', kpi.agent_id.id))
-            
-            prospects = self.env['soya.prospect'].search(domain)
-            kpi.total_prospects = len(prospects)
-            kpi.qualified_prospects = len(prospects.filtered(lambda p: p.state in ['qualified', 'converted']))        
-            kpi.conversion_rate = (kpi.qualified_prospects / kpi.total_prospects * 100) if kpi.total_prospects > 0 else 0
+        self.total_prospects = 0
+        self.qualified_prospects = 0
+        self.conversion_rate = 0
+        windows = self._group_by_kpi_window()
+        if not windows:
+            return
+        self.env['soya.prospect'].flush_model(['create_date', 'state', 'salesperson_id'])
+        stats = self._read_kpi_aggregates(windows, """
+            SELECT p.window_idx,
+                   COUNT(sp.id),
+                   COUNT(sp.id) FILTER (WHERE sp.state IN ('qualified', 'converted'))
+            FROM {params}
+            JOIN soya_prospect sp
+              ON sp.create_date BETWEEN p.date_from AND p.date_to
+             AND (p.agent_id IS NULL OR sp.salesperson_id = p.agent_id)
+             AND {restriction}
+            GROUP BY p.window_idx
+        """, self._kpi_source_restriction('soya.prospect', 'sp'))
+        for idx, kpis in enumerate(windows.values()):
+            total_prospects, qualified_prospects = stats.get(idx, (0, 0))
+            for kpi in kpis:
+                kpi.total_prospects = total_prospects
+                kpi.qualified_prospects = qualified_prospects
+                kpi.conversion_rate = (qualified_prospects / total_prospects * 100) if total_prospects > 0 else 0
     
     @api.depends('period_start', 'period_end', 'agent_id')
     def _compute_visit_kpis(self):
-        for kpi in self:
-            if not self._validate_dates(kpi):
-                kpi.total_visits = 0
-                kpi.completed_visits = 0
-                kpi.avg_visit_quality = 0
-                continue
-            
-            domain = [
-                ('visit_date', '>=', datetime.combine(kpi.period_start, datetime.min.time())),
-                ('visit_date', '<=', datetime.combine(kpi.period_end, datetime.max.time())),
-                ('state', '!=', 'cancelled'),
-            ]
-            
-            if kpi.agent_id:
-                domain.append(('salesperson_id', '=', kpi.agent_id.id))
-            
-            visits = self.env['soya.visit'].search(domain)
-            kpi.total_visits = len(visits)
-            kpi.completed_visits = len(visits.filtered(lambda v: v.state == 'completed'))
-            
-            quality_scores = [v.quality_score for v in visits if v.quality_score]
-            kpi.avg_visit_quality = (sum(quality_scores) / len(quality_scores)) if quality_scores else 0
+        self.total_visits = 0
+        self.completed_visits = 0
+        self.avg_visit_quality = 0
+        windows = self._group_by_kpi_window()
+        if not windows:
+            return
+        self.env['soya.visit'].flush_model(['visit_date', 'state', 'salesperson_id', 'quality_score'])
+        stats = self._read_kpi_aggregates(windows, """
+            SELECT p.window_idx,
+                   COUNT(sv.id),
+                   COUNT(sv.id) FILTER (WHERE sv.state = 'completed'),
+                   COALESCE(AVG(sv.quality_score) FILTER (WHERE sv.quality_score <> 0), 0)::float
+            FROM {params}
+            JOIN soya_visit sv
+              ON sv.visit_date BETWEEN p.date_from AND p.date_to
+             AND sv.state != 'cancelled'
+             AND (p.agent_id IS NULL OR sv.salesperson_id = p.agent_id)
+             AND {restriction}
+            GROUP BY p.window_idx
+        """, self._kpi_source_restriction('soya.visit', 'sv'))
+        for idx, kpis in enumerate(windows.values()):
+            total_visits, completed_visits, avg_quality = stats.get(idx, (0, 0, 0))
+            for kpi in kpis:
+                kpi.total_visits = total_visits
+                kpi.completed_visits = completed_visits
+                kpi.avg_visit_quality = avg_quality
     
     @api.depends('period_start', 'period_end', 'agent_id')
     def _compute_portfolio_kpis(self):
+        """Indicateurs du portefeuille visible par l'utilisateur: une seule requête groupée pour tout le recordset"""
+        counts = dict(self.env['soya.property']._read_group([], ['state'], ['__count']))
+        total_properties = sum(counts.values())
+        properties_available = counts.get('new', 0)
+        properties_rented = counts.get('rented', 0)
         for kpi in self:
-            properties = self.env['soya.property'].search([])
-            
-            kpi.properties_available = len(properties.filtered(lambda p: p.state == 'new'))
-            kpi.properties_rented = len(properties.filtered(lambda p: p.state == 'rented'))
-            
-            total_properties = len(properties)
-            kpi.portfolio_occupancy_rate = (kpi.properties_rented / total_properties * 100) if total_properties > 0 else 0
+            kpi.properties_available = properties_available
+            kpi.properties_rented = properties_rented
+            kpi.portfolio_occupancy_rate = (properties_rented / total_properties * 100) if total_properties > 0 else 0
@@ -61,11 +61,10 @@ class SoyaPortalTicket(models.Model):
     write_date = fields.Datetime(string="Modifié le", readonly=True)
     resolution_date = fields.Datetime(string="Date Résolution")
 
-    @api.model
-    def create(self, vals):
-        if not vals.get('name'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('soya.portal.ticket') or 'TICKET'
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env['ir.sequence']._assign_batch_names(vals_list, 'soya.portal.ticket', (), 'TICKET')
+        return super().create(vals_list)
 
     def action_mark_in_progress(self):
         self.write({'state': 'in_progress'})
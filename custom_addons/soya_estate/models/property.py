@@ -1,6 +1,31 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists
 from datetime import date, timedelta
+import base64
+import hashlib
+
+from ..tools.fragment_cache import catalogue_cache
+from ..tools.search_text import normalize_search_text, prefix_tsquery
+from ..tools.geo import EARTH_RADIUS_KM, bounding_box, geohash_encode, parse_coordinates
+
+# Tranches de prix du catalogue public (FCFA): (clé, libellé, minimum inclus, maximum exclu)
+PRICE_BANDS = [
+    ('lt_25m', 'Moins de 25 M', 0, 25000000),
+    ('25m_50m', '25 à 50 M', 25000000, 50000000),
+    ('50m_100m', '50 à 100 M', 50000000, 100000000),
+    ('gt_100m', 'Plus de 100 M', 100000000, None),
+]
+
+# Facettes du catalogue public, dans l'ordre d'affichage
+CATALOGUE_FACETS = ['property_type_id', 'quarter', 'price_band', 'bedrooms', 'furnished']
+
+# Au-delà, les biens sont regroupés sous « N+ chambres »
+CATALOGUE_MAX_BEDROOMS = 5
+
+# Rayon (km) du bouton « Biens à proximité »
+NEARBY_RADIUS_KM = 2.0
 
 class SoyaProperty(models.Model):
     _name = 'soya.property'
@@ -11,6 +36,17 @@ class SoyaProperty(models.Model):
     # === CHAMPS PRINCIPAUX ===
     name = fields.Char(string="Titre du Bien", required=True, tracking=True)
     image = fields.Image(string="Image", copy=False)
+    image_checksum = fields.Char(string="Empreinte de l'image", copy=False, readonly=True)
+    thumbnail_state = fields.Selection([
+        ('pending', 'À générer'),
+        ('done', 'Générées'),
+        ('failed', 'En erreur'),
+    ], string="Miniatures", copy=False, readonly=True, index=True)
+    thumbnail_ids = fields.One2many(
+        'soya.property.thumbnail',
+        'property_id',
+        string="Miniatures"
+    )
     expected_price = fields.Float(string="Prix Attendu", required=True, tracking=True)
     selling_price = fields.Float(string="Prix de Vente", readonly=True, copy=False, tracking=True)
     
@@ -71,6 +107,24 @@ class SoyaProperty(models.Model):
         default=lambda self: self.env.ref('base.ml')
     )
     gps_coordinates = fields.Char(string="Coordonnées GPS")
+    latitude = fields.Float(
+        string="Latitude",
+        digits=(10, 7),
+        compute='_compute_geolocation',
+        store=True
+    )
+    longitude = fields.Float(
+        string="Longitude",
+        digits=(10, 7),
+        compute='_compute_geolocation',
+        store=True
+    )
+    geohash = fields.Char(
+        string="Geohash",
+        compute='_compute_geolocation',
+        store=True,
+        help="Vide si les coordonnées GPS sont absentes ou illisibles"
+    )
     
     # === CARACTÉRISTIQUES PHYSIQUES ===
     living_area = fields.Float(string="Surface habitable (m²)", tracking=True)
@@ -137,7 +191,75 @@ class SoyaProperty(models.Model):
         compute='_compute_best_offer'
     )
     
+    description = fields.Text(string="Description")
+    
+    # === RECHERCHE ===
+    search_document = fields.Text(
+        string="Texte indexé",
+        compute='_compute_search_document',
+        store=True,
+        index='trigram',
+        unaccent=False,
+        help="Titre, adresse, titre foncier et description normalisés (minuscules, sans accents)"
+    )
+    search_text = fields.Char(
+        string="Recherche",
+        compute='_compute_search_text',
+        search='_search_search_text'
+    )
+    
+    # === CATALOGUE PUBLIC ===
+    price_band = fields.Selection(
+        [(key, label) for key, label, _minimum, _maximum in PRICE_BANDS],
+        string="Tranche de prix",
+        compute='_compute_price_band',
+        store=True,
+        index=True
+    )
+    
     # === CHAMPS CALCULÉS ===
+    @api.depends('gps_coordinates')
+    def _compute_geolocation(self):
+        for record in self:
+            coordinates = parse_coordinates(record.gps_coordinates)
+            if coordinates:
+                record.latitude, record.longitude = coordinates
+                record.geohash = geohash_encode(*coordinates)
+            else:
+                record.latitude = record.longitude = 0.0
+                record.geohash = False
+    
+    @api.depends('name', 'street', 'quarter', 'city', 'land_title_number', 'description')
+    def _compute_search_document(self):
+        quarters = dict(self._fields['quarter'].selection)
+        for record in self:
+            record.search_document = normalize_search_text(
+                record.name, record.street, quarters.get(record.quarter), record.city,
+                record.land_title_number, record.description,
+            )
+    
+    def _compute_search_text(self):
+        self.search_text = False
+    
+    def _search_search_text(self, operator, value):
+        if operator in ('ilike', '=') and isinstance(value, str):
+            # Sous-requête évaluée par PostgreSQL: aucune liste d'identifiants chargée
+            text_search = self._get_text_search_sql(value, self._table)
+            if not text_search:
+                return [('id', '=', False)]
+            query = self._where_calc([], active_test=False)
+            query.add_where(text_search[0])
+            return [('id', 'in', query)]
+        return [('search_document', operator, normalize_search_text(value) if isinstance(value, str) else value)]
+    
+    @api.depends('expected_price')
+    def _compute_price_band(self):
+        for record in self:
+            record.price_band = next(
+                key for key, _label, _minimum, maximum in PRICE_BANDS
+                if maximum is None or record.expected_price < maximum
+            )
+    
     @api.depends('living_area', 'land_area')
     def _compute_total_area(self):
         for record in self:
@@ -215,12 +337,279 @@ class SoyaProperty(models.Model):
     # === MÉTHODES TECHNIQUES ===
     def _generate_property_code(self):
         """Générer un code unique pour le bien"""
-        return self.env['ir.sequence'].next_by_code('soya.property.sequence') or 'Nouveau Bien'
+        return self.env['ir.sequence']._next_batch_by_code('soya.property.sequence', 1)[0] or 'Nouveau Bien'
     
-    # === SURCHARGE DES MÉTHODES STANDARD ===
+    def init(self):
+        # Vecteur plein texte tenu à jour par PostgreSQL à partir du texte indexé
+        if not column_exists(self.env.cr, self._table, 'search_vector'):
+            self.env.cr.execute(f"""
+                ALTER TABLE {self._table} ADD COLUMN search_vector tsvector
+                GENERATED ALWAYS AS (to_tsvector('simple', coalesce(search_document, ''))) STORED
+            """)
+        tools.create_index(
+            self.env.cr, 'soya_property_search_vector_index',
+            self._table, ['search_vector'], method='gin',
+        )
+        # Photos antérieures au pipeline de miniatures: empreinte reprise de la pièce jointe (SHA-1)
+        self.env.cr.execute(f"""
+            UPDATE {self._table} p
+            SET image_checksum = a.checksum, thumbnail_state = 'pending'
+            FROM ir_attachment a
+            WHERE a.res_model = %s AND a.res_field = 'image' AND a.res_id = p.id
+              AND p.thumbnail_state IS NULL
+        """, [self._name])
+        # Filtres par rectangle (carte, recherche par rayon) sur les seuls biens géolocalisés
+        tools.create_index(
+            self.env.cr, 'soya_property_latitude_longitude_index',
+            self._table, ['latitude', 'longitude'], where='geohash IS NOT NULL',
+        )
+    
+    # === RECHERCHE CLASSÉE ===
+    @api.model
+    def _get_text_search_sql(self, text, alias):
+        """Critère et score de pertinence de ``text`` sur la table aliasée ``alias``.
+
+        Plein texte sur ``search_vector`` (le dernier terme est un préfixe) ;
+        si pg_trgm est installé, les fautes de frappe sont tolérées par
+        similarité de mots sur ``search_document`` (index GIN trigramme).
+
+        :return: (critère, score) en SQL, ou None si ``text`` ne contient aucun terme
+        """
+        tsquery = prefix_tsquery(text)
+        if not tsquery:
+            return None
+        self.flush_model(['search_document'])
+        vector = SQL.identifier(alias, 'search_vector')
+        document = SQL.identifier(alias, 'search_document')
+        query = SQL("to_tsquery('simple', %s)", tsquery)
+        if self.env.registry.has_trigram:
+            terms = normalize_search_text(text)
+            match = SQL("(%s @@ %s OR %s <%% %s)", vector, query, terms, document)
+            rank = SQL("ts_rank(%s, %s) + word_similarity(%s, %s)", vector, query, terms, document)
+        else:
+            match = SQL("%s @@ %s", vector, query)
+            rank = SQL("ts_rank(%s, %s)", vector, query)
+        return match, rank
+
     @api.model
-    def create(self, vals):
+    def _search_ranked(self, text, domain=None, offset=0, limit=None):
+        """Biens correspondant à ``text``, du plus pertinent au moins pertinent.
+
+        Les règles d'accès et ``domain`` s'appliquent comme pour ``search``.
+        """
+        query = self._search(domain or [])
+        text_search = self._get_text_search_sql(text, query.table)
+        if not text_search:
+            return self.browse()
+        match, rank = text_search
+        query.add_where(match)
+        query.order = SQL("%s DESC, %s", rank, SQL.identifier(query.table, 'id'))
+        query.limit = limit
+        query.offset = offset
+        self.env.cr.execute(query.select())
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+    
+    # === RECHERCHE GÉOGRAPHIQUE ===
+    @api.model
+    def _get_bbox_domain(self, south, west, north, east):
+        return [
+            ('geohash', '!=', False),
+            ('latitude', '>=', south),
+            ('latitude', '<=', north),
+            ('longitude', '>=', west),
+            ('longitude', '<=', east),
+        ]
+
+    @api.model
+    def _search_in_bbox(self, south, west, north, east, domain=None, limit=None):
+        """Biens géolocalisés dans le rectangle (sud, ouest, nord, est)"""
+        return self.search(self._get_bbox_domain(south, west, north, east) + (domain or []), limit=limit)
+
+    @api.model
+    def _search_within_radius(self, latitude, longitude, radius_km, domain=None, limit=None):
+        """Biens à moins de ``radius_km`` du point, du plus proche au plus éloigné.
+
+        Le rectangle englobant filtre par l'index (latitude, longitude), la
+        distance exacte (haversine) n'est calculée que sur ces candidats.
+
+        :return: liste de (bien, distance en km)
+        """
+        candidates = self._search(self._get_bbox_domain(*bounding_box(latitude, longitude, radius_km)) + (domain or []))
+        self.env.cr.execute(SQL(
+            """
+            SELECT id, distance
+            FROM (
+                SELECT p.id, 2 * %s * asin(sqrt(least(1.0,
+                    power(sin(radians(p.latitude - %s) / 2), 2)
+                    + cos(radians(%s)) * cos(radians(p.latitude)) * power(sin(radians(p.longitude - %s) / 2), 2)
+                ))) AS distance
+                FROM soya_property p
+                WHERE p.id IN %s
+            ) candidates
+            WHERE distance <= %s
+            ORDER BY distance, id
+            LIMIT %s
+            """,
+            EARTH_RADIUS_KM, latitude, latitude, longitude, candidates.subselect(), radius_km, limit,
+        ))
+        return [(self.browse(property_id), distance) for property_id, distance in self.env.cr.fetchall()]
+
+    @api.model
+    def _get_map_clusters(self, south, west, north, east, precision, domain=None):
+        """Nombre de biens par tuile geohash de ``precision`` caractères dans le rectangle.
+
+        :return: liste de dicts (tuile, nombre, position moyenne, bien si la tuile n'en compte qu'un)
+        """
+        query = self._search(self._get_bbox_domain(south, west, north, east) + (domain or []))
+        self.env.cr.execute(SQL(
+            """
+            SELECT left(p.geohash, %s) AS tile, count(*), avg(p.latitude), avg(p.longitude), min(p.id)
+            FROM soya_property p
+            WHERE p.id IN %s
+            GROUP BY tile
+            """,
+            precision, query.subselect(),
+        ))
+        return [{
+            'tile': tile,
+            'count': count,
+            'latitude': latitude,
+            'longitude': longitude,
+            'property_id': property_id if count == 1 else False,
+        } for tile, count, latitude, longitude, property_id in self.env.cr.fetchall()]
+
+    def action_view_nearby_properties(self):
+        """Biens disponibles dans un rayon de 2 km autour de ce bien"""
+        self.ensure_one()
+        if not self.geohash:
+            raise ValidationError("Renseignez des coordonnées GPS lisibles (ex: 12.6392, -8.0029) pour ce bien.")
+        nearby = self._search_within_radius(
+            self.latitude, self.longitude, NEARBY_RADIUS_KM,
+            domain=[('state', '=', 'new'), ('id', '!=', self.id)],
+        )
+        return {
+            'type': 'ir.actions.act_window',
+            'name': f"Biens à moins de {NEARBY_RADIUS_KM:g} km de {self.name}",
+            'domain': [('id', 'in', [property_rec.id for property_rec, _distance in nearby])],
+            'view_mode': 'tree,form',
+            'res_model': 'soya.property',
+            'target': 'current',
+        }
+    
+    # === SURCHARGE DES MÉTHODES STANDARD ===
+    @api.model_create_multi
+    def create(self, vals_list):
         """Surcharge de la création pour générer le nom si vide"""
-        if not vals.get('name') or vals.get('name') == 'Nouveau Bien':
-            vals['name'] = self._generate_property_code()
-        return super().create(vals)
\ No newline at end of file
+        self.env['ir.sequence']._assign_batch_names(
+            vals_list, 'soya.property.sequence', ('Nouveau Bien',), 'Nouveau Bien'
+        )
+        vals_list = [self._prepare_image_vals(vals) for vals in vals_list]
+        records = super().create(vals_list)
+        self._invalidate_catalogue()
+        if any(vals.get('thumbnail_state') == 'pending' for vals in vals_list):
+            self.env['soya.property.thumbnail']._trigger_generation()
+        return records
+
+    def write(self, vals):
+        vals = self._prepare_image_vals(vals)
+        res = super().write(vals)
+        self._invalidate_catalogue()
+        if vals.get('thumbnail_state') == 'pending':
+            self.env['soya.property.thumbnail']._trigger_generation()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._invalidate_catalogue()
+        return res
+
+    @api.model
+    def _prepare_image_vals(self, vals):
+        """Nouvelle photo: empreinte (URL versionnées) et miniatures à générer en arrière-plan"""
+        if 'image' not in vals:
+            return vals
+        image = vals['image']
+        return dict(
+            vals,
+            image_checksum=hashlib.sha1(base64.b64decode(image)).hexdigest() if image else False,
+            thumbnail_state='pending' if image else 'done',
+        )
+
+    # === CATALOGUE PUBLIC (/properties) ===
+    @api.model
+    def _invalidate_catalogue(self):
+        """Vide les fragments du catalogue maintenant et après validation de la transaction"""
+        dbname = self.env.cr.dbname
+        catalogue_cache.clear(dbname)
+        self.env.cr.postcommit.add(lambda: catalogue_cache.clear(dbname))
+
+    @api.model
+    def _get_catalogue_domain(self, filters, exclude=None):
+        """Biens disponibles correspondant aux filtres, hors facette ``exclude``"""
+        domain = [('state', '=', 'new')]
+        for facet, value in filters.items():
+            if facet == exclude:
+                continue
+            if facet == 'search':
+                # Texte, ou identifiants déjà classés par pertinence (une recherche par requête HTTP)
+                domain.append(('id', 'in', value) if isinstance(value, list) else ('search_text', 'ilike', value))
+            elif facet == 'bedrooms' and value >= CATALOGUE_MAX_BEDROOMS:
+                domain.append(('bedrooms', '>=', value))
+            else:
+                domain.append((facet, '=', value))
+        return domain
+
+    @api.model
+    def _get_catalogue_facets(self, filters):
+        """Décompte par valeur de chaque facette, une requête groupée par facette.
+
+        Chaque facette est comptée avec les autres filtres appliqués, pour
+        indiquer combien de biens restent si l'on change uniquement celle-ci.
+
+        :return: dict facette -> liste de (valeur, libellé, nombre)
+        """
+        facets = {}
+        for facet in CATALOGUE_FACETS:
+            groups = self._read_group(self._get_catalogue_domain(filters, exclude=facet), [facet], ['__count'])
+            if facet == 'property_type_id':
+                options = sorted(
+                    ((property_type.id, property_type.name, count) for property_type, count in groups if property_type),
+                    key=lambda option: option[1] or '',
+                )
+            elif facet == 'bedrooms':
+                counts = {}
+                for bedrooms, count in groups:
+                    if bedrooms:
+                        bucket = min(bedrooms, CATALOGUE_MAX_BEDROOMS)
+                        counts[bucket] = counts.get(bucket, 0) + count
+                options = [
+                    (bedrooms, f"{bedrooms}+" if bedrooms == CATALOGUE_MAX_BEDROOMS else str(bedrooms), count)
+                    for bedrooms, count in sorted(counts.items())
+                ]
+            elif facet == 'furnished':
+                counts = dict(groups)
+                options = [
+                    (value, label, counts[value])
+                    for value, label in ((True, "Meublé"), (False, "Non meublé")) if counts.get(value)
+                ]
+            else:
+                counts = dict(groups)
+                options = [
+                    (value, label, counts[value])
+                    for value, label in self._fields[facet]._description_selection(self.env) if counts.get(value)
+                ]
+            facets[facet] = options
+        return facets
+
+    @api.model
+    def _search_catalogue(self, filters, offset=0, limit=None):
+        """Page de biens disponibles correspondant aux filtres, par pertinence si texte recherché"""
+        search = filters.get('search')
+        if isinstance(search, list):
+            matched = set(self.search(self._get_catalogue_domain(filters)).ids)
+            ranked_ids = [property_id for property_id in search if property_id in matched]
+            return self.browse(ranked_ids[offset:offset + limit if limit else None])
+        if search:
+            domain = self._get_catalogue_domain(filters, exclude='search')
+            return self._search_ranked(search, domain, offset=offset, limit=limit)
+        return self.search(self._get_catalogue_domain(filters), offset=offset, limit=limit)
\ No newline at end of file
@@ -1,8 +1,9 @@
 import logging
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
 _logger = logging.getLogger(__name__)
+from collections import defaultdict
 from datetime import date, timedelta
 
 class SoyaPropertyOffer(models.Model):
@@ -49,7 +50,7 @@ class SoyaPropertyOffer(models.Model):
     # === INFORMATIONS COMPLÈMENTAIRES ===
     name = fields.Char(
         string="Référence offre",
-        default=lambda self: self._generate_offer_code(),
+        default='Nouvelle Offre',
         readonly=True
     )
     
@@ -183,6 +184,24 @@ class SoyaPropertyOffer(models.Model):
         string="Contrat généré"
     )
     
+    # Taille des lots du balayage quotidien et nombre d'offres citées par notification
+    EXPIRY_CHUNK_SIZE = 5000
+    EXPIRY_NOTIFY_LIMIT = 20
+    
+    # Une seule offre acceptée par bien, garanti par un index partiel (contrainte d'exclusion)
+    _sql_constraints = [
+        ('one_accepted_offer_per_property',
+         "EXCLUDE (property_id WITH =) WHERE (state = 'accepted')",
+         "Une offre a déjà été acceptée pour ce bien."),
+    ]
+    
+    def init(self):
+        # Balayage quotidien des offres soumises arrivées à échéance
+        tools.create_index(
+            self.env.cr, 'soya_property_offer_state_expiry_date_index',
+            self._table, ['state', 'expiry_date'],
+        )
+    
     # === CHAMPS CALCULÉS - IMPLÉMENTATION ===
     @api.depends('proposed_start_date', 'rental_duration')
     def _compute_proposed_end_date(self):
@@ -271,87 +290,93 @@ class SoyaPropertyOffer(models.Model):
     
     @api.constrains('property_id', 'partner_id', 'offer_type')
     def _check_unique_offer(self):
-        """Éviter les doublons d'offres"""
-        for record in self:
-            if record.state in ['draft', 'submitted']:
-                existing_offers = self.search([
-                    ('property_id', '=', record.property_id.id),
-                    ('partner_id', '=', record.partner_id.id),
-                    ('offer_type', '=', record.offer_type),
-                    ('state', 'in', ['draft', 'submitted']),
-                    ('id', '!=', record.id)
-                ])
-                if existing_offers:
-                    raise ValidationError(
-                        "Une offre du même type existe déjà pour ce bien et ce partenaire"
-                    )
+        """Éviter les doublons d'offres (une requête groupée pour tout le lot)"""
+        offers = self.filtered(lambda o: o.state in ['draft', 'submitted'])
+        if not offers:
+            return
+        groups = self._read_group(
+            [('property_id', 'in', offers.property_id.ids), ('state', 'in', ['draft', 'submitted'])],
+            ['property_id', 'partner_id', 'offer_type'],
+            ['__count'],
+        )
+        counts = {
+            (property_rec.id, partner.id, offer_type): count
+            for property_rec, partner, offer_type, count in groups
+        }
+        for record in offers:
+            if counts.get((record.property_id.id, record.partner_id.id, record.offer_type), 0) > 1:
+                raise ValidationError(
+                    "Une offre du même type existe déjà pour ce bien et ce partenaire"
+                )
     
     # === MÉTHODES D'ACTION ===
+    def _get_sibling_offers(self, states):
+        """Autres offres des biens concernés dans les états ``states``, en une seule requête"""
+        return self.search([
+            ('property_id', 'in', self.property_id.ids),
+            ('state', 'in', states),
+            ('id', 'not in', self.ids)
+        ])
+    
     def action_submit_offer(self):
         """Soumettre l'offre"""
-        for record in self:
-            if record.state != 'draft':
-                raise ValidationError("Seules les offres brouillons peuvent être soumises")
-            
-            # Vérifier qu'il n'y a pas d'autre offre acceptée
-            accepted_offers = self.search([
-                ('property_id', '=', record.property_id.id),
-                ('state', '=', 'accepted')
-            ])
-            if accepted_offers:
-                raise ValidationError(
-                    "Une offre a déjà été acceptée pour ce bien. Vous ne pouvez pas soumettre une nouvelle offre."
-                )
-            
-            record.state = 'submitted'
-            
-            # Mettre à jour le statut du bien
-            if record.property_id.state == 'new':
-                record.property_id.state = 'offer_received'
+        if any(record.state != 'draft' for record in self):
+            raise ValidationError("Seules les offres brouillons peuvent être soumises")
+        
+        # Vérifier qu'il n'y a pas d'autre offre acceptée
+        if self._get_sibling_offers(['accepted']):
+            raise ValidationError(
+                "Une offre a déjà été acceptée pour ce bien. Vous ne pouvez pas soumettre une nouvelle offre."
+            )
+        
+        self.write({'state': 'submitted'})
+        
+        # Mettre à jour le statut des biens
+        self.property_id.filtered(lambda p: p.state == 'new').write({'state': 'offer_received'})
     
     def action_accept_offer(self):
         """Accepter l'offre"""
-        for record in self:
-            if record.state != 'submitted':
-                raise ValidationError("Seules les offres soumises peuvent être acceptées")
-            
-            # Refuser automatiquement les autres offres
-            other_offers = self.search([
-                ('property_id', '=', record.property_id.id),
-                ('state', '=', 'submitted'),
-                ('id', '!=', record.id)
-            ])
-            other_offers.write({'state': 'refused', 'status': 'refused'})
-            
-            # Accepter cette offre
-            record.state = 'accepted'
-            record.status = 'accepted'
-            record.acceptance_date = fields.Datetime.now()
-            record.accepted_by = self.env.user
-            
-            # Mettre à jour le statut du bien
-            record.property_id.state = 'offer_accepted'
-            
-            # Si c'est une offre d'achat, mettre à jour le prix de vente
-            if record.offer_type == 'purchase':
-                record.property_id.selling_price = record.price
+        if any(record.state != 'submitted' for record in self):
+            raise ValidationError("Seules les offres soumises peuvent être acceptées")
+        if len(self.property_id) < len(self):
+            raise ValidationError("Une seule offre peut être acceptée par bien")
+        
+        siblings = self._get_sibling_offers(['submitted', 'accepted'])
+        if any(offer.state == 'accepted' for offer in siblings):
+            raise ValidationError("Une offre a déjà été acceptée pour ce bien")
+        
+        # Refuser automatiquement les autres offres
+        siblings.write({'state': 'refused', 'status': 'refused'})
+        
+        # Accepter ces offres
+        self.write({
+            'state': 'accepted',
+            'status': 'accepted',
+            'acceptance_date': fields.Datetime.now(),
+            'accepted_by': self.env.user.id,
+        })
+        
+        # Mettre à jour le statut des biens
+        self.property_id.write({'state': 'offer_accepted'})
+        
+        # Pour les offres d'achat, mettre à jour le prix de vente
+        for record in self.filtered(lambda o: o.offer_type == 'purchase'):
+            record.property_id.selling_price = record.price
     
     def action_refuse_offer(self):
         """Refuser l'offre"""
-        for record in self:
-            if record.state not in ['submitted', 'draft']:
-                raise ValidationError("Seules les offres soumises ou brouillons peuvent être refusées")
-            
-            record.state = 'refused'
-            record.status = 'refused'
-            
-            # Vérifier s'il reste des offres soumises pour le bien
-            remaining_offers = self.search([
-                ('property_id', '=', record.property_id.id),
-                ('state', '=', 'submitted')
-            ])
-            if not remaining_offers:
-                record.property_id.state = 'new'
+        if any(record.state not in ['submitted', 'draft'] for record in self):
+            raise ValidationError("Seules les offres soumises ou brouillons peuvent être refusées")
+        
+        self.write({'state': 'refused', 'status': 'refused'})
+        
+        # Remettre en « nouveau » les biens qui n'ont plus d'offre soumise
+        pending = self._read_group(
+            [('property_id', 'in', self.property_id.ids), ('state', '=', 'submitted')],
+            ['property_id'],
+        )
+        pending_properties = self.env['soya.property'].browse([property_rec.id for property_rec, in pending])
+        (self.property_id - pending_properties).write({'state': 'new'})
     
     def action_cancel_offer(self):
         """Annuler l'offre"""
@@ -380,26 +405,82 @@ class SoyaPropertyOffer(models.Model):
     # === MÉTHODES TECHNIQUES ===
     def _generate_offer_code(self):
         """Générer un code unique pour l'offre"""
-        return self.env['ir.sequence'].next_by_code('soya.property.offer.sequence') or 'Nouvelle Offre'
+        return self.env['ir.sequence']._next_batch_by_code('soya.property.offer.sequence', 1)[0] or 'Nouvelle Offre'
     
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Surcharge de la création"""
-        if not vals.get('name') or vals.get('name') == 'Nouvelle Offre':
-            vals['name'] = self._generate_offer_code()
-        return super().create(vals)
+        self.env['ir.sequence']._assign_batch_names(
+            vals_list, 'soya.property.offer.sequence', ('Nouvelle Offre',), 'Nouvelle Offre'
+        )
+        offers = super().create(vals_list)
+        self.env['soya.performance.kpi']._invalidate_for_sources(offers)
+        return offers
+
+    def write(self, vals):
+        kpi = self.env['soya.performance.kpi']
+        kpi._invalidate_for_write(self, vals)
+        res = super().write(vals)
+        kpi._invalidate_for_write(self, vals)
+        return res
+
+    def unlink(self):
+        kpis = self.env['soya.performance.kpi']._get_kpis_for_sources(self)
+        res = super().unlink()
+        kpis.modified(['period_start'])
+        return res
     
     # === CRON JOB POUR LES OFFRES EXPIRÉES ===
     @api.model
     def _cron_check_expired_offers(self):
-        """Vérifier et marquer les offres expirées (exécuté quotidiennement)"""
-        expired_offers = self.search([
-            ('state', '=', 'submitted'),
-            ('is_expired', '=', True)
-        ])
-        expired_offers.write({'state': 'expired'})
-        
-        # Logger l'action
-        _logger.info(f"{len(expired_offers)} offres marquées comme expirées")
+        """Vérifier et marquer les offres expirées (exécuté quotidiennement).
+
+        La sélection s'appuie sur ``expiry_date`` stockée et l'index
+        ``(state, expiry_date)`` ; les offres sont basculées par lots sans
+        suivi de modification, puis chaque commercial reçoit une seule
+        notification récapitulative.
+        """
+        today = fields.Date.today()
+        run = self.env['soya.batch.run']._start('offer_expiry', "Expiration des offres")
+        offers_model = self.with_context(tracking_disable=True, mail_notrack=True)
+        domain = [('state', '=', 'submitted'), ('expiry_date', '<', today)]
+        expired_by_salesperson = defaultdict(list)
+        total = chunks = 0
+        try:
+            while True:
+                offers = offers_model.search_fetch(
+                    domain, ['name', 'salesperson_id'], limit=self.EXPIRY_CHUNK_SIZE, order='id'
+                )
+                if not offers:
+                    break
+                for offer in offers:
+                    expired_by_salesperson[offer.salesperson_id.id].append(offer.name)
+                offers.write({'state': 'expired'})
+                total += len(offers)
+                chunks += 1
+                run._progress(total, chunks)
+                run._commit()
+                self.env.invalidate_all()
+        except Exception as e:
+            self.env.cr.rollback()
+            run._fail(e)
+            run._commit()
+            raise
+        self._notify_expired_offers(run, expired_by_salesperson)
+        run._finish(total, chunks, f"{total} offre(s) marquée(s) comme expirée(s)")
+        return total
 
-    
\ No newline at end of file
+    @api.model
+    def _notify_expired_offers(self, run, expired_by_salesperson):
+        """Une notification par commercial, listant ses offres expirées"""
+        users = self.env['res.users'].browse([user_id for user_id in expired_by_salesperson if user_id])
+        for user in users.exists():
+            names = expired_by_salesperson[user.id]
+            listed = ', '.join(names[:self.EXPIRY_NOTIFY_LIMIT])
+            if len(names) > self.EXPIRY_NOTIFY_LIMIT:
+                listed += f" et {len(names) - self.EXPIRY_NOTIFY_LIMIT} autre(s)"
+            run.message_notify(
+                partner_ids=user.partner_id.ids,
+                subject="Offres expirées",
+                body=f"{len(names)} de vos offres ont expiré: {listed}",
+            )
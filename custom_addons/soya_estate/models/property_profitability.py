@@ -1,4 +1,11 @@
 from odoo import models, fields, api
+from collections import defaultdict
+from dateutil.relativedelta import relativedelta
+
+from ..tools.occupancy import occupancy_stats, vacant_stats
+
+# Durée moyenne d'un mois civil, pour convertir les jours occupés en mois
+AVG_MONTH_DAYS = 365.25 / 12
 
 
 class SoyaPropertyProfitability(models.Model):
@@ -20,63 +27,75 @@ class SoyaPropertyProfitability(models.Model):
     total_rental_income = fields.Float(
         string="Revenu Locatif Total",
         compute='_compute_revenues',
+        store=True,
         help="Revenu total des contrats de location"
     )
     
     total_sale_commissions = fields.Float(
         string="Commissions Vente",
         compute='_compute_revenues',
+        store=True,
         help="Commissions générées par la vente"
     )
     
     total_revenue = fields.Float(
         string="Revenu Total",
-        compute='_compute_revenues'
+        compute='_compute_revenues',
+        store=True
     )
     
     avg_monthly_rent = fields.Float(
         string="Loyer Mensuel Moyen",
-        compute='_compute_revenues'
+        compute='_compute_revenues',
+        store=True
     )
     
     maintenance_costs = fields.Float(
         string="Frais d'Entretien",
-        compute='_compute_expenses'
+        compute='_compute_expenses',
+        store=True
     )
     
     tax_expenses = fields.Float(
         string="Taxes et Impôts",
-        compute='_compute_expenses'
+        compute='_compute_expenses',
+        store=True
     )
     
     insurance_costs = fields.Float(
         string="Coûts d'Assurance",
-        compute='_compute_expenses'
+        compute='_compute_expenses',
+        store=True
     )
     
     other_expenses = fields.Float(
         string="Autres Charges",
-        compute='_compute_expenses'
+        compute='_compute_expenses',
+        store=True
     )
     
     total_expenses = fields.Float(
         string="Total Charges",
-        compute='_compute_expenses'
+        compute='_compute_expenses',
+        store=True
     )
     
     gross_profit = fields.Float(
         string="Profit Brut",
-        compute='_compute_profitability'
+        compute='_compute_profitability',
+        store=True
     )
     
     net_profit = fields.Float(
         string="Profit Net",
-        compute='_compute_profitability'
+        compute='_compute_profitability',
+        store=True
     )
     
     profit_margin = fields.Float(
         string="Marge Bénéficiaire (%)",
-        compute='_compute_profitability'
+        compute='_compute_profitability',
+        store=True
     )
     
     roi = fields.Float(
@@ -104,83 +123,163 @@ class SoyaPropertyProfitability(models.Model):
         store=True
     )
     
+    occupied_days = fields.Integer(
+        string="Jours Occupés",
+        compute='_compute_occupancy',
+        store=True
+    )
+    
+    longest_vacancy_days = fields.Integer(
+        string="Plus Longue Vacance (jours)",
+        compute='_compute_occupancy',
+        store=True
+    )
+    
+    # Sans valeur par défaut: une fenêtre vide glisse avec la date du jour (recalculée chaque nuit)
+    date_from = fields.Date(
+        string="Début Période",
+        help="Début de la fenêtre d'analyse de l'occupation (12 mois avant la fin si vide)"
+    )
+    
+    date_to = fields.Date(
+        string="Fin Période",
+        help="Fin de la fenêtre d'analyse de l'occupation (aujourd'hui si vide)"
+    )
+    
     property_value = fields.Float(
         string="Valeur de la Propriété",
         related='property_id.expected_price',
+        store=True,
         readonly=True
     )
     
     property_acquisition_price = fields.Float(
         string="Prix d'Acquisition",
         related='property_id.expected_price',
+        store=True,
         readonly=True
     )
     
     appreciation = fields.Float(
         string="Appréciation Valeur",
-        compute='_compute_appreciation'
+        compute='_compute_appreciation',
+        store=True
     )
     
     appreciation_percentage = fields.Float(
         string="% Appréciation",
-        compute='_compute_appreciation'
+        compute='_compute_appreciation',
+        store=True
     )
 
+    # Champs des modèles sources dont la modification invalide les agrégats stockés
+    _PROFITABILITY_TRIGGERS = {
+        'soya.rental.contract': {'property_id', 'state', 'monthly_rent', 'duration_months', 'start_date', 'end_date'},
+        'soya.sale.contract': {'property_id', 'state', 'sale_price'},
+        'soya.financial.invoice': {'contract_id', 'invoice_type', 'category', 'amount'},
+    }
+
+    @api.model
+    def _get_impacted_properties(self, sources, vals=None):
+        """Biens dont les agrégats dépendent des enregistrements sources (modifiés par vals)"""
+        if vals is not None and not self._PROFITABILITY_TRIGGERS[sources._name].intersection(vals):
+            return self.env['soya.property']
+        return sources.sudo().mapped('property_id')
+
+    @api.model
+    def _invalidate_properties(self, properties):
+        """Marque les analyses des biens donnés comme à recalculer.
+
+        Tous les champs calculés stockés dépendent de property_id: le
+        signaler comme modifié planifie leur recalcul via l'arbre de
+        dépendances, au prochain flush.
+        """
+        if not properties:
+            return
+        profitabilities = self.sudo().search([('property_id', 'in', properties.ids)])
+        profitabilities.modified(['property_id'])
+
+    def init(self):
+        # Fenêtres figées à la création par les anciennes valeurs par défaut: rendues glissantes
+        self.env.cr.execute("""
+            UPDATE soya_property_profitability
+            SET date_from = NULL, date_to = NULL
+            WHERE date_to = create_date::date
+              AND date_from = (create_date - INTERVAL '12 months')::date
+        """)
+
     @api.depends('property_id')
     def _compute_name(self):
         for prof in self:
             prof.name = f"Rentabilité - {prof.property_id.name}" if prof.property_id else "Rentabilité"
     
+    # === AGRÉGATS PAR BIEN (une requête groupée par source) ===
+    def _read_rental_figures(self, property_ids):
+        """Par bien: revenu locatif total, somme et nombre des loyers actifs"""
+        self.env['soya.rental.contract'].flush_model(['base_contract_id', 'monthly_rent', 'duration_months'])
+        self.env['soya.base.contract'].flush_model(['property_id', 'state'])
+        self.env.cr.execute("""
+            SELECT bc.property_id,
+                   COALESCE(SUM(rc.monthly_rent * rc.duration_months), 0)::float,
+                   COALESCE(SUM(rc.monthly_rent) FILTER (WHERE bc.state = 'active'), 0)::float,
+                   COUNT(*) FILTER (WHERE bc.state = 'active')
+            FROM soya_rental_contract rc
+            JOIN soya_base_contract bc ON bc.id = rc.base_contract_id
+            WHERE bc.property_id = ANY(%s)
+              AND bc.state IN ('active', 'done')
+            GROUP BY bc.property_id
+        """, [property_ids])
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    def _read_sale_figures(self, property_ids):
+        """Par bien: somme des prix de vente des contrats actifs ou terminés"""
+        self.env['soya.sale.contract'].flush_model(['property_id', 'state', 'sale_price'])
+        self.env.cr.execute("""
+            SELECT property_id, COALESCE(SUM(sale_price), 0)::float
+            FROM soya_sale_contract
+            WHERE property_id = ANY(%s)
+              AND state IN ('active', 'done')
+            GROUP BY property_id
+        """, [property_ids])
+        return dict(self.env.cr.fetchall())
+
+    def _read_expense_figures(self, property_ids):
+        """Par bien: montants des factures de dépense ventilés par catégorie"""
+        self.env['soya.financial.invoice'].flush_model(['property_id', 'invoice_type', 'category', 'amount'])
+        self.env.cr.execute("""
+            SELECT property_id, COALESCE(category, 'other'), COALESCE(SUM(amount), 0)::float
+            FROM soya_financial_invoice
+            WHERE property_id = ANY(%s)
+              AND invoice_type = 'expense'
+            GROUP BY property_id, COALESCE(category, 'other')
+        """, [property_ids])
+        expenses = defaultdict(dict)
+        for property_id, category, amount in self.env.cr.fetchall():
+            expenses[property_id][category] = amount
+        return expenses
+
     @api.depends('property_id')
     def _compute_revenues(self):
+        property_ids = self.property_id.ids
+        rentals = self._read_rental_figures(property_ids) if property_ids else {}
+        sales = self._read_sale_figures(property_ids) if property_ids else {}
         for prof in self:
-            if not prof.property_id:
-                prof.total_rental_income = 0
-                prof.total_sale_commissions = 0
-                prof.total_revenue = 0
-                prof.avg_monthly_rent = 0
-                continue
-            
-            rental_contracts = self.env['soya.rental.contract'].search([
-                ('property_id', '=', prof.property_id.id),
-                ('state', 'in', ['active', 'done'])
-            ])
-            
-            sale_contracts = self.env['soya.sale.contract'].search([
-                ('property_id', '=', prof.property_id.id),
-                ('state', 'in', ['active', 'done'])
-            ])
-            
-            prof.total_rental_income = sum(c.monthly_rent * c.duration_months for c in rental_contracts)
-            prof.total_sale_commissions = sum(c.sale_price * 0.05 for c in sale_contracts)
+            rental_income, active_rent_sum, active_count = rentals.get(prof.property_id.id, (0, 0, 0))
+            prof.total_rental_income = rental_income
+            prof.total_sale_commissions = sales.get(prof.property_id.id, 0) * 0.05
             prof.total_revenue = prof.total_rental_income + prof.total_sale_commissions
-            
-            active_rentals = rental_contracts.filtered(lambda c: c.state == 'active')
-            if active_rentals:
-                prof.avg_monthly_rent = sum(c.monthly_rent for c in active_rentals) / len(active_rentals)
-            else:
-                prof.avg_monthly_rent = 0
+            prof.avg_monthly_rent = active_rent_sum / active_count if active_count else 0
     
     @api.depends('property_id')
     def _compute_expenses(self):
+        property_ids = self.property_id.ids
+        expenses = self._read_expense_figures(property_ids) if property_ids else {}
         for prof in self:
-            if not prof.property_id:
-                prof.maintenance_costs = 0
-                prof.tax_expenses = 0
-                prof.insurance_costs = 0
-                prof.other_expenses = 0
-                prof.total_expenses = 0
-                continue
-            
-            invoices = self.env['soya.financial.invoice'].search([
-                ('property_id', '=', prof.property_id.id),
-                ('invoice_type', '=', 'expense')
-            ])
-            
-            prof.maintenance_costs = sum(i.amount for i in invoices.filtered(lambda x: x.category == 'maintenance'))
-            prof.tax_expenses = sum(i.amount for i in invoices.filtered(lambda x: x.category == 'taxes'))
-            prof.insurance_costs = sum(i.amount for i in invoices.filtered(lambda x: x.category == 'insurance'))
-            prof.other_expenses = sum(i.amount for i in invoices.filtered(lambda x: x.category not in ['maintenance', 'taxes', 'insurance']))
+            by_category = expenses.get(prof.property_id.id, {})
+            prof.maintenance_costs = by_category.get('maintenance', 0)
+            prof.tax_expenses = by_category.get('taxes', 0)
+            prof.insurance_costs = by_category.get('insurance', 0)
+            prof.other_expenses = by_category.get('other', 0)
             prof.total_expenses = prof.maintenance_costs + prof.tax_expenses + prof.insurance_costs + prof.other_expenses
     
     @api.depends('total_revenue', 'total_expenses', 'property_acquisition_price')
@@ -193,28 +292,67 @@ class SoyaPropertyProfitability(models.Model):
             prof.roi = (prof.net_profit / prof.property_acquisition_price * 100) if prof.property_acquisition_price > 0 else 0
             prof.annualized_roi = prof.roi * 12 if prof.roi else 0
     
-    @api.depends('property_id')
+    def _get_occupancy_window(self):
+        self.ensure_one()
+        date_to = self.date_to or fields.Date.context_today(self)
+        date_from = self.date_from or date_to - relativedelta(months=12)
+        return date_from, date_to
+
+    def _read_rental_spans(self, property_ids, date_from, date_to):
+        """Périodes de location (bien, début, fin) chevauchant la fenêtre, triées par bien et début"""
+        self.env['soya.rental.contract'].flush_model(['base_contract_id', 'duration_months'])
+        self.env['soya.base.contract'].flush_model(['property_id', 'state', 'start_date', 'end_date'])
+        self.env.cr.execute("""
+            SELECT property_id, start_date, end_date
+            FROM (
+                SELECT bc.property_id,
+                       bc.start_date,
+                       COALESCE(bc.end_date,
+                                (bc.start_date + rc.duration_months * INTERVAL '1 month')::date - 1) AS end_date
+                FROM soya_rental_contract rc
+                JOIN soya_base_contract bc ON bc.id = rc.base_contract_id
+                WHERE bc.property_id = ANY(%s)
+                  AND bc.state IN ('active', 'expired', 'terminated')
+                  AND bc.start_date <= %s
+            ) spans
+            WHERE end_date >= %s
+            ORDER BY property_id, start_date
+        """, [property_ids, date_to, date_from])
+        return self.env.cr.fetchall()
+
+    @api.depends('property_id', 'date_from', 'date_to')
     def _compute_occupancy(self):
+        """Occupation réelle: fusion des périodes de location de chaque bien sur la fenêtre"""
+        windows = defaultdict(lambda: self.browse())
         for prof in self:
-            if not prof.property_id:
-                prof.vacancy_rate = 0
-                prof.occupancy_months = 0
-                continue
-            
-            rental_contracts = self.env['soya.rental.contract'].search([
-                ('property_id', '=', prof.property_id.id),
-                ('state', 'in', ['active', 'done'])
-            ])
-            
-            if rental_contracts:
-                occupied_months = len(rental_contracts)
-                prof.occupancy_months = occupied_months
-                prof.vacancy_rate = max(0, 12 - occupied_months) / 12 * 100
-            else:
-                prof.vacancy_rate = 100
-                prof.occupancy_months = 0
+            windows[prof._get_occupancy_window()] |= prof
+
+        for (date_from, date_to), profs in windows.items():
+            property_ids = profs.property_id.ids
+            spans = self._read_rental_spans(property_ids, date_from, date_to) if property_ids else []
+            stats_by_property = occupancy_stats(spans, date_from, date_to)
+            for prof in profs:
+                if not prof.property_id:
+                    prof.vacancy_rate = 0
+                    prof.occupancy_months = 0
+                    prof.occupied_days = 0
+                    prof.longest_vacancy_days = 0
+                    continue
+                stats = stats_by_property.get(prof.property_id.id) or vacant_stats(date_from, date_to)
+                prof.occupied_days = stats.occupied_days
+                prof.vacancy_rate = stats.vacancy_rate
+                prof.longest_vacancy_days = stats.longest_vacancy_days
+                prof.occupancy_months = round(stats.occupied_days / AVG_MONTH_DAYS)
     
-    @api.depends('property_id')
+    @api.model
+    def _cron_refresh_rolling_occupancy(self):
+        """Recalcule l'occupation des analyses à fenêtre glissante (bornes vides) au changement de date"""
+        profitabilities = self.search(['|', ('date_from', '=', False), ('date_to', '=', False)])
+        profitabilities.modified(['date_to'])
+        profitabilities.flush_recordset()
+        return len(profitabilities)
+    
+    @api.depends('property_id.selling_price', 'property_id.expected_price')
     def _compute_appreciation(self):
         for prof in self:
             if prof.property_id:
@@ -0,0 +1,126 @@
+from odoo import models, fields, api
+import base64
+import logging
+import threading
+import time
+
+from ..tools.thumbnails import THUMBNAIL_SIZES, generate_thumbnails
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaPropertyThumbnail(models.Model):
+    _name = 'soya.property.thumbnail'
+    _description = 'Miniature de Bien Immobilier'
+    _order = 'property_id, size, image_format'
+
+    # Biens traités par transaction, et durée maximale d'une exécution du cron (s)
+    BATCH_SIZE = 20
+    TIME_BUDGET = 240
+
+    property_id = fields.Many2one(
+        'soya.property',
+        string='Bien',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    size = fields.Selection(
+        [(size, size.capitalize()) for size in THUMBNAIL_SIZES],
+        string='Taille',
+        required=True
+    )
+    image_format = fields.Selection([
+        ('jpeg', 'JPEG'),
+        ('webp', 'WebP'),
+    ], string='Format', required=True)
+    data = fields.Binary(string='Image', attachment=True, required=True)
+    width = fields.Integer(string='Largeur (px)')
+    height = fields.Integer(string='Hauteur (px)')
+    file_size = fields.Integer(string='Poids (octets)')
+
+    _sql_constraints = [
+        ('variant_unique', 'unique(property_id, size, image_format)', "Une seule miniature par taille et format."),
+    ]
+
+    # === GÉNÉRATION EN ARRIÈRE-PLAN ===
+    @api.model
+    def _trigger_generation(self):
+        cron = self.env.ref('soya_estate.ir_cron_generate_property_thumbnails', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _generate_for(self, properties):
+        """Remplace les miniatures des biens ``properties`` et les marque comme générées.
+
+        L'état n'est mis à jour que si la photo n'a pas changé entre-temps
+        (même ``image_checksum``): une photo remplacée pendant la génération
+        reste en attente pour la prochaine exécution.
+        """
+        vals_list, states = [], []
+        for property_rec in properties.with_context(bin_size=False):
+            state = 'done'
+            if property_rec.image:
+                try:
+                    thumbnails = list(generate_thumbnails(base64.b64decode(property_rec.image)))
+                except Exception as e:
+                    _logger.warning(f"Miniatures impossibles pour le bien {property_rec.id}: {e}")
+                    thumbnails, state = [], 'failed'
+                vals_list.extend({
+                    'property_id': property_rec.id,
+                    'size': thumbnail.size,
+                    'image_format': thumbnail.image_format,
+                    'data': base64.b64encode(thumbnail.data),
+                    'width': thumbnail.width,
+                    'height': thumbnail.height,
+                    'file_size': len(thumbnail.data),
+                } for thumbnail in thumbnails)
+            states.append((property_rec.id, property_rec.image_checksum, state))
+        self.search([('property_id', 'in', properties.ids)]).unlink()
+        self.create(vals_list)
+        # Écriture directe: l'état des miniatures ne modifie pas le contenu publié du catalogue
+        ids, checksums, state_values = zip(*states)
+        self.env.cr.execute("""
+            UPDATE soya_property p
+            SET thumbnail_state = v.state
+            FROM unnest(%s::int[], %s::varchar[], %s::varchar[]) AS v(id, checksum, state)
+            WHERE p.id = v.id AND p.image_checksum IS NOT DISTINCT FROM v.checksum
+        """, [list(ids), [checksum or None for checksum in checksums], list(state_values)])
+        properties.invalidate_recordset(['thumbnail_state'])
+
+    @api.model
+    def _cron_generate_thumbnails(self):
+        """Génère les miniatures des photos en attente, par lots validés un à un"""
+        testing = getattr(threading.current_thread(), 'testing', False)
+        Property = self.env['soya.property']
+        started = time.monotonic()
+        total = 0
+        while True:
+            properties = Property.search([('thumbnail_state', '=', 'pending')], limit=self.BATCH_SIZE, order='id')
+            if not properties:
+                break
+            self._generate_for(properties)
+            total += len(properties)
+            if not testing:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+            if time.monotonic() - started > self.TIME_BUDGET:
+                # Reste à traiter: relancer le cron plutôt que de le bloquer
+                self._trigger_generation()
+                break
+        if total:
+            _logger.info(f"Miniatures générées pour {total} bien(s) en {time.monotonic() - started:.1f}s")
+        return total
+
+    # === SERVICE ===
+    @api.model
+    def _get_variant(self, property_id, size, accept_webp):
+        """Miniature à servir: WebP si le navigateur l'accepte, sinon JPEG"""
+        formats = ['webp', 'jpeg'] if accept_webp else ['jpeg']
+        variants = self.search([
+            ('property_id', '=', property_id),
+            ('size', '=', size),
+            ('image_format', 'in', formats),
+        ])
+        return next((variant for image_format in formats for variant in variants if variant.image_format == image_format), self.browse())
@@ -197,15 +197,15 @@ class SoyaPropertyType(models.Model):
         }
     
     # === MÉTHODES TECHNIQUES ===
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Surcharge de la création pour générer un code si vide"""
-        if not vals.get('code'):
-            # Générer un code basé sur le nom
-            name = vals.get('name', '')
-            code = ''.join([word[0].upper() for word in name.split()]) if name else 'TYP'
-            vals['code'] = code
-        return super().create(vals)
+        for vals in vals_list:
+            if not vals.get('code'):
+                # Générer un code basé sur le nom
+                name = vals.get('name', '')
+                vals['code'] = ''.join([word[0].upper() for word in name.split()]) if name else 'TYP'
+        return super().create(vals_list)
     
     def name_get(self):
         """Personnalisation de l'affichage du nom"""
@@ -267,7 +267,6 @@ class SoyaPropertyType(models.Model):
             }
         ]
         
-        for type_vals in default_types:
-            if not self.search_count([('code', '=', type_vals['code'])]):
-                self.create(type_vals)
+        existing_codes = set(self.search([('code', 'in', [vals['code'] for vals in default_types])]).mapped('code'))
+        self.create([vals for vals in default_types if vals['code'] not in existing_codes])
 
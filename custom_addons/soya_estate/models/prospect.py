@@ -125,3 +125,23 @@ class SoyaProspect(models.Model):
             'domain': [('prospect_id', '=', self.id)],
             'context': {'default_prospect_id': self.id},
         }
+
+    # === INVALIDATION DES KPIS ===
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['soya.performance.kpi']._invalidate_for_sources(records)
+        return records
+
+    def write(self, vals):
+        kpi = self.env['soya.performance.kpi']
+        kpi._invalidate_for_write(self, vals)
+        res = super().write(vals)
+        kpi._invalidate_for_write(self, vals)
+        return res
+
+    def unlink(self):
+        kpis = self.env['soya.performance.kpi']._get_kpis_for_sources(self)
+        res = super().unlink()
+        kpis.modified(['period_start'])
+        return res
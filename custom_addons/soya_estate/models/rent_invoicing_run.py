@@ -0,0 +1,246 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaRentInvoicingRun(models.Model):
+    _name = 'soya.rent.invoicing.run'
+    _description = 'Campagne de Facturation des Loyers'
+    _order = 'month_start desc'
+
+    SHARD_COUNT_PARAM = 'soya_estate.rent_invoicing_shards'
+    DEFAULT_SHARD_COUNT = 4
+
+    name = fields.Char(string="Campagne", compute='_compute_name', store=True)
+    month_start = fields.Date(string="Début du Mois", required=True, readonly=True)
+    month_end = fields.Date(string="Fin du Mois", required=True, readonly=True)
+
+    state = fields.Selection([
+        ('running', 'En Cours'),
+        ('done', 'Terminée'),
+        ('failed', 'En Erreur'),
+    ], string="État", default='running', readonly=True)
+
+    shard_ids = fields.One2many('soya.rent.invoicing.shard', 'run_id', string="Lots", readonly=True)
+
+    contract_count = fields.Integer(string="Contrats à Facturer", compute='_compute_progress')
+    invoice_count = fields.Integer(string="Quittances Générées", compute='_compute_progress')
+    progress = fields.Float(string="Avancement (%)", compute='_compute_progress', digits=(5, 2))
+
+    started_at = fields.Datetime(string="Démarrée le", readonly=True)
+    finished_at = fields.Datetime(string="Terminée le", readonly=True)
+
+    _sql_constraints = [
+        ('month_unique', 'unique(month_start)', "Une seule campagne de facturation par mois."),
+    ]
+
+    @api.depends('month_start')
+    def _compute_name(self):
+        for run in self:
+            run.name = f"Loyers {run.month_start.strftime('%m/%Y')}" if run.month_start else ''
+
+    @api.depends('shard_ids.contract_count', 'shard_ids.invoice_count')
+    def _compute_progress(self):
+        for run in self:
+            run.contract_count = sum(run.shard_ids.mapped('contract_count'))
+            run.invoice_count = sum(run.shard_ids.mapped('invoice_count'))
+            run.progress = (run.invoice_count / run.contract_count * 100) if run.contract_count else 100.0
+
+    # === DÉCOUPAGE ===
+    def _get_shard_count(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(self.SHARD_COUNT_PARAM)
+        return max(int(value or self.DEFAULT_SHARD_COUNT), 1)
+
+    @api.model
+    def _get_or_create_run(self, month_start, month_end):
+        run = self.search([('month_start', '=', month_start)], limit=1)
+        if run:
+            run._reopen_if_pending()
+            return run
+        run = self.create({
+            'month_start': month_start,
+            'month_end': month_end,
+            'started_at': fields.Datetime.now(),
+        })
+        run._create_shards()
+        return run
+
+    def _create_shards(self):
+        """Découpe les contrats à facturer en plages d'identifiants de taille égale.
+
+        La première et la dernière plage sont ouvertes afin de couvrir les
+        contrats activés après le découpage. Les contrats déjà facturés sont
+        exclus: une campagne relancée ne découpe que les contrats restants.
+        """
+        self.ensure_one()
+        contract_ids = self.env['soya.rent.scheduler']._get_contracts_to_invoice(self.month_start, self.month_end)
+        first_sequence = max(self.shard_ids.mapped('sequence'), default=0) + 1
+        shard_count = min(self._get_shard_count(), len(contract_ids)) or 1
+        size, remainder = divmod(len(contract_ids), shard_count)
+        shards_vals = []
+        offset = 0
+        for index in range(shard_count):
+            count = size + (1 if index < remainder else 0)
+            next_offset = offset + count
+            shards_vals.append({
+                'run_id': self.id,
+                'sequence': first_sequence + index,
+                'contract_id_from': contract_ids[offset] if index and count else 0,
+                'contract_id_to': contract_ids[next_offset] - 1 if next_offset < len(contract_ids) else 0,
+                'contract_count': count,
+            })
+            offset = next_offset
+        self.env['soya.rent.invoicing.shard'].create(shards_vals)
+
+    def _reopen_if_pending(self):
+        """Relance les campagnes terminées dont des contrats restent à facturer.
+
+        Un contrat activé (ou rétrodaté) après la fin des lots n'est couvert par
+        aucun lot en attente: de nouveaux lots sont créés pour les contrats restants.
+        """
+        Scheduler = self.env['soya.rent.scheduler']
+        for run in self.filtered(lambda r: r.state == 'done'):
+            if Scheduler._get_contracts_to_invoice(run.month_start, run.month_end, limit=1):
+                run.write({'state': 'running', 'finished_at': False})
+                run._create_shards()
+                _logger.info(f"Campagne {run.name} relancée: contrats restant à facturer")
+
+    def _dispatch_shards(self):
+        """Réveille les crons de facturation pour traiter les lots en attente"""
+        self.ensure_one()
+        if self.state != 'running':
+            return f"Campagne {self.name} déjà terminée"
+        workers = self.env['ir.cron'].sudo().search([
+            ('code', '=', 'model._cron_process_rent_shards()'),
+            ('active', '=', True),
+        ])
+        for worker in workers:
+            worker._trigger()
+        self._check_completion()
+        return f"Campagne {self.name}: {len(self.shard_ids)} lot(s), {len(workers)} cron(s) de facturation"
+
+    def _check_completion(self):
+        for run in self.filtered(lambda r: r.state == 'running'):
+            states = set(run.shard_ids.mapped('state'))
+            if states <= {'done'}:
+                run.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+            elif states <= {'done', 'failed'}:
+                run.write({'state': 'failed', 'finished_at': fields.Datetime.now()})
+
+    def action_retry_failed_shards(self):
+        self.shard_ids.filtered(lambda s: s.state == 'failed').write({'state': 'pending', 'error': False})
+        self.filtered(lambda r: r.state == 'failed').write({'state': 'running', 'finished_at': False})
+        for run in self:
+            run._dispatch_shards()
+        return True
+
+
+class SoyaRentInvoicingShard(models.Model):
+    _name = 'soya.rent.invoicing.shard'
+    _description = 'Lot de Facturation des Loyers'
+    _order = 'run_id, sequence'
+
+    # Un lot « en cours » sans signe de vie (heartbeat) depuis ce délai est considéré abandonné
+    STALE_MINUTES = 30
+
+    run_id = fields.Many2one('soya.rent.invoicing.run', string="Campagne", required=True,
+                             ondelete='cascade', index=True)
+    sequence = fields.Integer(string="N°", readonly=True)
+    contract_id_from = fields.Integer(string="Contrat Début", readonly=True, help="0: plage ouverte")
+    contract_id_to = fields.Integer(string="Contrat Fin", readonly=True, help="0: plage ouverte")
+
+    state = fields.Selection([
+        ('pending', 'En Attente'),
+        ('running', 'En Cours'),
+        ('done', 'Terminé'),
+        ('failed', 'En Erreur'),
+    ], string="État", default='pending', readonly=True, index=True)
+
+    contract_count = fields.Integer(string="Contrats", readonly=True)
+    invoice_count = fields.Integer(string="Quittances Générées", readonly=True)
+    worker = fields.Char(string="Processus", readonly=True)
+    heartbeat = fields.Datetime(
+        string="Dernière Activité",
+        readonly=True,
+        help="Renouvelée à la réservation et à chaque lot de quittances validé"
+    )
+    started_at = fields.Datetime(string="Démarré le", readonly=True)
+    finished_at = fields.Datetime(string="Terminé le", readonly=True)
+    duration = fields.Float(string="Durée (s)", readonly=True)
+    error = fields.Text(string="Erreur", readonly=True)
+
+    # === TRAITEMENT ===
+    @api.model
+    def _claim_shard(self):
+        """Réserve un lot en attente (ou abandonné) sans attendre les lots déjà réservés"""
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT id FROM soya_rent_invoicing_shard
+            WHERE state = 'pending'
+               OR (state = 'running' AND COALESCE(heartbeat, write_date) < %s)
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """, [fields.Datetime.now() - timedelta(minutes=self.STALE_MINUTES)])
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        shard = self.browse(row[0])
+        shard.write({
+            'state': 'running',
+            'worker': f"{threading.current_thread().name}",
+            'started_at': fields.Datetime.now(),
+            'heartbeat': fields.Datetime.now(),
+        })
+        return shard
+
+    def _process(self):
+        self.ensure_one()
+        started = time.monotonic()
+        run = self.run_id
+
+        def on_batch(created):
+            # Validé avec le lot: un processus encore actif n'est jamais considéré abandonné
+            self.write({'invoice_count': self.invoice_count + created, 'heartbeat': fields.Datetime.now()})
+
+        try:
+            self.env['soya.rent.scheduler']._invoice_contract_range(
+                run.month_start, run.month_end,
+                id_from=self.contract_id_from or None,
+                id_to=self.contract_id_to or None,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception(f"Lot {self.sequence} de {run.name} en échec")
+            self.write({'state': 'failed', 'error': str(e), 'finished_at': fields.Datetime.now()})
+            return
+        elapsed = time.monotonic() - started
+        self.write({'state': 'done', 'finished_at': fields.Datetime.now(), 'duration': elapsed})
+        _logger.info(
+            f"Lot {self.sequence} de {run.name}: {self.invoice_count} quittance(s) "
+            f"en {elapsed:.1f}s ({self.invoice_count / elapsed if elapsed > 0 else 0:.0f}/s)"
+        )
+
+    @api.model
+    def _cron_process_rent_shards(self):
+        """Cron de facturation: traite des lots jusqu'à épuisement.
+
+        Plusieurs crons identiques (et autant de threads cron) traitent les
+        lots en parallèle ; chacun ne verrouille que son lot et ses contrats.
+        """
+        testing = getattr(threading.current_thread(), 'testing', False)
+        while True:
+            shard = self._claim_shard()
+            if not shard:
+                break
+            if not testing:
+                self.env.cr.commit()
+            shard._process()
+            shard.run_id._check_completion()
+            if not testing:
+                self.env.cr.commit()
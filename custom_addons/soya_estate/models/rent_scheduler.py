@@ -1,6 +1,9 @@
 from odoo import models, fields, api
 from datetime import datetime, timedelta
+from psycopg2 import IntegrityError, errorcodes
 import logging
+import threading
+import time
 
 _logger = logging.getLogger(__name__)
 
@@ -8,71 +11,174 @@ class SoyaRentScheduler(models.Model):
     _name = 'soya.rent.scheduler'
     _description = 'Gestionnaire Automatique des Loyers'
     
+    # Nombre de quittances créées (et validées en base) par lot
+    RENT_BATCH_SIZE = 500
+
     @api.model
     def _cron_generate_monthly_rent_invoices(self):
         """
         Cron job pour générer automatiquement les quittances de loyer mensuelles
-        S'exécute le 25 de chaque mois pour le mois suivant
+        S'exécute à partir du 25 de chaque mois pour le mois suivant: le mois est
+        découpé en lots de contrats (shards) traités en parallèle par les crons
+        de facturation ; la génération étant idempotente, les exécutions
+        suivantes reprennent un traitement interrompu
         """
         today = fields.Date.today()
         
         # Générer pour le mois suivant
-        if today.day == 25:
+        if today.day >= 25:
             next_month = today.replace(day=28) + timedelta(days=4)  # Va au mois suivant
             month_start = next_month.replace(day=1)
             next_next_month = (month_start + timedelta(days=32)).replace(day=1)
             month_end = next_next_month - timedelta(days=1)
             
-            return self._generate_rent_invoices_for_month(month_start, month_end)
+            run = self.env['soya.rent.invoicing.run']._get_or_create_run(month_start, month_end)
+            return run._dispatch_shards()
         return "Pas d'exécution aujourd'hui"
-    
-    def _generate_rent_invoices_for_month(self, month_start, month_end):
-        """Génère les quittances de loyer pour un mois donné"""
-        # Trouver tous les contrats de location actifs
-        active_contracts = self.env['soya.rental.contract'].search([
-            ('state', '=', 'active'),
-            ('start_date', '<=', month_end),
-            '|', ('end_date', '=', False), ('end_date', '>=', month_start)
-        ])
-        
+
+    def _get_contracts_to_invoice(self, month_start, month_end, id_from=None, id_to=None,
+                                  limit=None, exclude_ids=(), lock=False):
+        """Contrats actifs sur le mois sans quittance pour cette période (une seule requête).
+
+        ``lock`` verrouille les contrats retournés en ignorant ceux déjà
+        verrouillés par un autre processus (SKIP LOCKED).
+        """
+        self.env['soya.rental.contract'].flush_model()
+        self.env['soya.base.contract'].flush_model(['state', 'start_date', 'end_date'])
+        self.env['soya.financial.invoice'].flush_model(['contract_id', 'period_start', 'period_end', 'invoice_type'])
+        query = """
+            SELECT rc.id
+            FROM soya_rental_contract rc
+            JOIN soya_base_contract bc ON bc.id = rc.base_contract_id
+            WHERE bc.state = 'active'
+              AND bc.start_date <= %(month_end)s
+              AND (bc.end_date IS NULL OR bc.end_date >= %(month_start)s)
+              AND (%(id_from)s IS NULL OR rc.id >= %(id_from)s)
+              AND (%(id_to)s IS NULL OR rc.id <= %(id_to)s)
+              AND rc.id != ALL(%(exclude_ids)s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM soya_financial_invoice fi
+                  WHERE fi.contract_id = rc.id
+                    AND fi.period_start = %(month_start)s
+                    AND fi.period_end = %(month_end)s
+                    AND fi.invoice_type = 'rent'
+              )
+            ORDER BY rc.id
+        """
+        if limit:
+            query += " LIMIT %(limit)s"
+        if lock:
+            query += " FOR UPDATE OF rc SKIP LOCKED"
+        self.env.cr.execute(query, {
+            'month_start': month_start,
+            'month_end': month_end,
+            'id_from': id_from,
+            'id_to': id_to,
+            'exclude_ids': list(exclude_ids),
+            'limit': limit,
+        })
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _prepare_rent_invoice_vals(self, contract, month_start, month_end, invoice_date):
+        return {
+            'invoice_type': 'rent',
+            'contract_id': contract.id,
+            'partner_id': contract.tenant_id.id,
+            # Montant = loyer + charges
+            'amount': contract.monthly_rent + contract.charges_amount,
+            'period_start': month_start,
+            'period_end': month_end,
+            'invoice_date': invoice_date,
+            'state': 'sent',
+            'name': f"QUIT-{contract.name}-{month_start.strftime('%Y%m')}"
+        }
+
+    def _create_rent_invoices(self, vals_list):
+        """Crée un lot de quittances ; en cas d'échec, isole les contrats fautifs.
+
+        Les contrats facturés entre-temps par un autre processus (contrainte
+        ``rent_period_unique``) sont simplement ignorés.
+        """
+        Invoice = self.env['soya.financial.invoice'].with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_notrack=True
+        )
+        try:
+            with self.env.cr.savepoint():
+                return len(Invoice.create(vals_list))
+        except Exception as e:
+            _logger.warning(f"Lot de quittances en échec ({e}), reprise unitaire")
+
+        created = 0
+        for vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    Invoice.create(vals)
+                created += 1
+            except IntegrityError as e:
+                if e.pgcode not in (errorcodes.EXCLUSION_VIOLATION, errorcodes.UNIQUE_VIOLATION):
+                    _logger.error(f"Erreur génération quittance {vals['name']}: {str(e)}")
+                    continue
+                # Quittance validée entre-temps par un autre processus: rien à faire
+                _logger.info(f"Quittance {vals['name']} déjà générée, ignorée")
+            except Exception as e:
+                _logger.error(f"Erreur génération quittance {vals['name']}: {str(e)}")
+        return created
+
+    def _invoice_contract_range(self, month_start, month_end, id_from=None, id_to=None, on_batch=None):
+        """Génère les quittances manquantes des contrats [id_from, id_to] par lots validés.
+
+        Chaque lot verrouille ses contrats (SKIP LOCKED) jusqu'à sa validation:
+        plusieurs processus peuvent traiter des plages voisines ou identiques
+        sans doublon. ``on_batch(created)`` est appelé avant chaque validation.
+        """
+        testing = getattr(threading.current_thread(), 'testing', False)
+        invoice_date = fields.Date.today()
+        Contract = self.env['soya.rental.contract']
         invoices_created = 0
-        
-        for contract in active_contracts:
-            # Vérifier si une facture existe déjà pour cette période
-            existing_invoice = self.env['soya.financial.invoice'].search([
-                ('contract_id', '=', contract.id),
-                ('period_start', '=', month_start),
-                ('period_end', '=', month_end),
-                ('invoice_type', '=', 'rent')
-            ], limit=1)
-            
-            if not existing_invoice:
-                try:
-                    # Calculer le montant (loyer + charges)
-                    total_amount = contract.monthly_rent + contract.charges_amount
-                    
-                    # Créer la quittance de loyer
-                    invoice_vals = {
-                        'invoice_type': 'rent',
-                        'contract_id': contract.id,
-                        'partner_id': contract.tenant_id.id,
-                        'amount': total_amount,
-                        'period_start': month_start,
-                        'period_end': month_end,
-                        'invoice_date': fields.Date.today(),
-                        'state': 'sent',
-                        'name': f"QUIT-{contract.name}-{month_start.strftime('%Y%m')}"
-                    }
-                    
-                    self.env['soya.financial.invoice'].create(invoice_vals)
-                    invoices_created += 1
-                    
-                    _logger.info(f"Quittance générée pour {contract.name}")
-                    
-                except Exception as e:
-                    _logger.error(f"Erreur génération quittance {contract.name}: {str(e)}")
-        
-        _logger.info(f"{invoices_created} quittance(s) de loyer générée(s) pour {month_start.strftime('%B %Y')}")
+        failed_ids = set()
+        while True:
+            contract_ids = self._get_contracts_to_invoice(
+                month_start, month_end, id_from, id_to,
+                limit=self.RENT_BATCH_SIZE, exclude_ids=failed_ids, lock=True,
+            )
+            if not contract_ids:
+                break
+            vals_list = [
+                self._prepare_rent_invoice_vals(contract, month_start, month_end, invoice_date)
+                for contract in Contract.browse(contract_ids)
+            ]
+            created = self._create_rent_invoices(vals_list)
+            invoices_created += created
+            if created < len(contract_ids):
+                # Contrats en échec: exclus des lots suivants pour garantir la terminaison
+                failed_ids.update(self._get_contracts_to_invoice(
+                    month_start, month_end, contract_ids[0], contract_ids[-1], exclude_ids=failed_ids,
+                ))
+            if on_batch:
+                on_batch(created)
+            if not testing:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        return invoices_created
+
+    def _generate_rent_invoices_for_month(self, month_start, month_end):
+        """Génère en un seul traitement les quittances de loyer pour un mois donné.
+
+        Les contrats déjà facturés sont exclus en une requête, puis les
+        quittances sont créées par lots validés en base: un traitement
+        interrompu reprend là où il s'est arrêté.
+        """
+        started = time.monotonic()
+        invoices_created = self._invoice_contract_range(
+            month_start, month_end,
+            on_batch=lambda created: _logger.info(f"Quittances {month_start.strftime('%Y%m')}: +{created}"),
+        )
+        elapsed = time.monotonic() - started
+        throughput = invoices_created / elapsed if elapsed > 0 else 0
+        _logger.info(
+            f"{invoices_created} quittance(s) de loyer générée(s) pour {month_start.strftime('%B %Y')} "
+            f"en {elapsed:.1f}s ({throughput:.0f} quittances/s)"
+        )
         return f"{invoices_created} quittance(s) de loyer générée(s)"
     
     def generate_test_invoices(self):
@@ -134,5 +134,29 @@ class SoyaRentalContract(models.Model):
                     contract.property_id.state = 'new'
                     contract.property_id.current_tenant_id = False
 
+    # === INVALIDATION DE LA RENTABILITÉ ===
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Numérotation propre aux locations, avant la création des contrats parents
+        self.env['ir.sequence']._assign_batch_names(
+            vals_list, 'soya.rental.contract', ('Nouveau Contrat',), 'Nouveau Contrat'
+        )
+        records = super().create(vals_list)
+        self.env['soya.property.profitability']._invalidate_properties(records.sudo().mapped('property_id'))
+        return records
+
+    def write(self, vals):
+        profitability = self.env['soya.property.profitability']
+        properties = profitability._get_impacted_properties(self, vals)
+        res = super().write(vals)
+        profitability._invalidate_properties(properties | profitability._get_impacted_properties(self, vals))
+        return res
+
+    def unlink(self):
+        properties = self.sudo().mapped('property_id')
+        res = super().unlink()
+        self.env['soya.property.profitability']._invalidate_properties(properties)
+        return res
+
     def _valid_field_parameter(self, field, param):
         return param == 'tracking' or super()._valid_field_parameter(field, param)
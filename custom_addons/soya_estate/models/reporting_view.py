@@ -0,0 +1,88 @@
+from odoo import models, api, tools
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class SoyaReportingViewMixin(models.AbstractModel):
+    """Modèle de reporting adossé à une vue SQL, matérialisable sur option.
+
+    Les modèles héritiers définissent ``_reporting_query()``. Par défaut la
+    requête est exposée en vue simple ; lorsque le paramètre système
+    ``soya_estate.materialized_reports`` est actif, elle est matérialisée
+    avec un index unique sur ``id`` et rafraîchie par cron (CONCURRENTLY).
+    """
+    _name = 'soya.reporting.view.mixin'
+    _description = 'Vue de Reporting Matérialisable'
+
+    MATERIALIZED_PARAM = 'soya_estate.materialized_reports'
+    # Index supplémentaires (listes de colonnes) créés en mode matérialisé
+    _reporting_indexes = []
+
+    def _reporting_query(self):
+        """Requête SELECT de la vue (doit fournir une colonne id unique)"""
+        raise NotImplementedError()
+
+    def _is_materialized_mode(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(self.MATERIALIZED_PARAM, 'False')
+        return value.lower() not in ('', '0', 'false')
+
+    def _get_view_kind(self):
+        """'v' pour une vue, 'm' pour une vue matérialisée, None si absente"""
+        self.env.cr.execute("""
+            SELECT c.relkind FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = %s AND n.nspname = current_schema()
+        """, [self._table])
+        row = self.env.cr.fetchone()
+        return row[0] if row else None
+
+    def _create_reporting_view(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        if self._is_materialized_mode():
+            self.env.cr.execute(f"CREATE MATERIALIZED VIEW {self._table} AS ({self._reporting_query()})")
+            # Index unique requis par REFRESH MATERIALIZED VIEW CONCURRENTLY
+            self.env.cr.execute(f"CREATE UNIQUE INDEX {self._table}_id_uniq ON {self._table} (id)")
+            for columns in self._reporting_indexes:
+                index_name = f"{self._table}_{columns.replace(',', '').replace(' ', '_')}_index"
+                self.env.cr.execute(f"CREATE INDEX {index_name} ON {self._table} ({columns})")
+        else:
+            self.env.cr.execute(f"CREATE OR REPLACE VIEW {self._table} AS ({self._reporting_query()})")
+
+    def init(self):
+        if self._abstract:
+            return
+        self._create_reporting_view()
+
+    # === RAFRAÎCHISSEMENT ===
+    def _refresh_reporting_view(self):
+        """Rafraîchit la vue matérialisée ; recrée la vue si le mode a changé"""
+        kind = self._get_view_kind()
+        materialized = self._is_materialized_mode()
+        if kind != ('m' if materialized else 'v'):
+            self._create_reporting_view()
+        elif materialized:
+            self.env.cr.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {self._table}")
+        self.invalidate_model()
+
+    @api.model
+    def _get_reporting_models(self):
+        return [
+            self.env[name]
+            for name in self.env.registry.descendants([self._name], '_inherit')
+            if not self.env[name]._abstract
+        ]
+
+    @api.model
+    def _refresh_reporting_views(self, model_names=None):
+        """Point d'appel à la demande, par exemple après un import de paiements en masse"""
+        reports = self._get_reporting_models()
+        if model_names is not None:
+            reports = [report for report in reports if report._name in model_names]
+        for report in reports:
+            report.sudo()._refresh_reporting_view()
+
+    @api.model
+    def _cron_refresh_reporting_views(self):
+        self._refresh_reporting_views()
+        _logger.info("Vues de reporting rafraîchies")
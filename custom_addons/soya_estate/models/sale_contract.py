@@ -5,6 +5,7 @@ class SoyaSaleContract(models.Model):
     _name = 'soya.sale.contract'
     _description = 'Contrat de Vente - SOYA'
     _inherit = 'soya.base.contract'
+    _contract_sequence_code = 'soya.sale.contract'
     
     # === CHAMPS SPÉCIFIQUES VENTE ===
     buyer_id = fields.Many2one(
@@ -81,4 +82,30 @@ class SoyaSaleContract(models.Model):
                 # Remettre le bien disponible
                 if contract.property_id:
                     contract.property_id.state = 'new'
-                    contract.property_id.selling_price = 0.0
\ No newline at end of file
+                    contract.property_id.selling_price = 0.0
+
+    # === INVALIDATION DE LA RENTABILITÉ ET DES KPIS ===
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['soya.property.profitability']._invalidate_properties(records.sudo().mapped('property_id'))
+        self.env['soya.performance.kpi']._invalidate_for_sources(records)
+        return records
+
+    def write(self, vals):
+        profitability = self.env['soya.property.profitability']
+        kpi = self.env['soya.performance.kpi']
+        properties = profitability._get_impacted_properties(self, vals)
+        kpi._invalidate_for_write(self, vals)
+        res = super().write(vals)
+        profitability._invalidate_properties(properties | profitability._get_impacted_properties(self, vals))
+        kpi._invalidate_for_write(self, vals)
+        return res
+
+    def unlink(self):
+        properties = self.sudo().mapped('property_id')
+        kpis = self.env['soya.performance.kpi']._get_kpis_for_sources(self)
+        res = super().unlink()
+        kpis.modified(['period_start'])
+        self.env['soya.property.profitability']._invalidate_properties(properties)
+        return res
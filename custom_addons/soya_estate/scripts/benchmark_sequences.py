@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Banc d'essai de la numérotation par lot (paiements).
+
+Compare l'ancienne numérotation (un ``next_by_code`` et un ``create`` par
+enregistrement) à l'allocation groupée (une réservation et un ``create``
+pour tout le lot). Toutes les écritures sont annulées à la fin.
+
+Usage:
+    docker-compose exec -T web odoo shell -d soya_odoo_db --no-http \
+        < custom_addons/soya_estate/scripts/benchmark_sequences.py
+"""
+import time
+
+COUNT = 2000
+SEQUENCE_CODE = 'soya.payment'
+
+
+def measure(label, function):
+    started = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed:8.3f}s  {COUNT / elapsed:10.0f} /s")
+    return elapsed
+
+
+Sequence = env['ir.sequence']  # noqa: F821 (fourni par odoo shell)
+Payment = env['soya.payment'].with_context(tracking_disable=True, mail_create_nolog=True)  # noqa: F821
+
+partner = env['res.partner'].create({'name': 'Banc d\'essai numérotation'})  # noqa: F821
+today = env['soya.financial.invoice']._fields['invoice_date'].default(env['soya.financial.invoice'])  # noqa: F821
+invoice = env['soya.financial.invoice'].create({  # noqa: F821
+    'invoice_type': 'other',
+    'partner_id': partner.id,
+    'amount': COUNT * 1000.0,
+    'period_start': today.replace(day=1),
+    'period_end': today.replace(day=28),
+})
+payment_vals = {'invoice_id': invoice.id, 'amount': 1.0, 'payment_method': 'mobile_money'}
+
+print(f"--- {COUNT} numéros / paiements")
+allocation_before = measure("Réservation: next_by_code x N", lambda: [
+    Sequence.next_by_code(SEQUENCE_CODE) for _i in range(COUNT)
+])
+allocation_after = measure("Réservation: _next_batch_by_code(N)", lambda: Sequence._next_batch_by_code(SEQUENCE_CODE, COUNT))
+create_before = measure("Création: next_by_code + create unitaire", lambda: [
+    Payment.create(dict(payment_vals, name=Sequence.next_by_code(SEQUENCE_CODE))) for _i in range(COUNT)
+])
+create_after = measure("Création: create([...]) numéroté par lot", lambda: Payment.create([
+    dict(payment_vals) for _i in range(COUNT)
+]))
+print(f"Gain réservation: x{allocation_before / allocation_after:.1f} — gain création: x{create_before / create_after:.1f}")
+
+env.cr.rollback()  # noqa: F821
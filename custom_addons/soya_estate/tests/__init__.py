@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from . import test_bank_statement
+from . import test_mobile_money
+from . import test_occupancy
+from . import test_market_forecast
+from . import test_geo
+from . import test_statement_matching
+from . import test_profitability
+from . import test_performance_kpi
+from . import test_rent_invoicing
+from . import test_penalties
+from . import test_property_offer
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+
+class SoyaEstateCase(TransactionCase):
+    """Données de base des tests en base: type de bien, propriétaire, locataire et un bien"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.property_type = cls.env['soya.property.type'].create({'name': 'Villa', 'code': 'VIL'})
+        cls.owner = cls.env['res.partner'].create({'name': 'Propriétaire Test'})
+        cls.tenant = cls.env['res.partner'].create({'name': 'Locataire Test', 'phone': '+223 76 12 34 56'})
+        cls.property = cls._create_property()
+
+    @classmethod
+    def _create_property(cls, **vals):
+        return cls.env['soya.property'].create({
+            'name': 'Villa Test',
+            'expected_price': 50000000,
+            'property_type_id': cls.property_type.id,
+            'quarter': 'aci2000',
+            'owner_id': cls.owner.id,
+            **vals,
+        })
+
+    @classmethod
+    def _create_rental(cls, property_rec, start_date, **vals):
+        return cls.env['soya.rental.contract'].create({
+            'property_id': property_rec.id,
+            'landlord_id': cls.owner.id,
+            'tenant_id': cls.tenant.id,
+            'monthly_rent': 100000,
+            'duration_months': 12,
+            'start_date': start_date,
+            'state': 'active',
+            **vals,
+        })
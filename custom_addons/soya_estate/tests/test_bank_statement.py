@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+from datetime import date
+
+from odoo.tests.common import BaseCase
+
+from ..tools.bank_statement import (
+    StatementFormatError, StatementLine, b64decode_to_file, iter_camt_lines, iter_csv_lines,
+    iter_statement_lines, parse_amount, sniff_dialect,
+)
+
+
+class TestParseAmount(BaseCase):
+
+    def test_thousands_separator_alone(self):
+        # FCFA: pas de décimales, un séparateur suivi de trois chiffres sépare les milliers
+        self.assertEqual(parse_amount("25.000"), 25000.0)
+        self.assertEqual(parse_amount("25,000"), 25000.0)
+        self.assertEqual(parse_amount("1.500.000"), 1500000.0)
+        self.assertEqual(parse_amount("-25.000"), -25000.0)
+
+    def test_spaces_as_thousands_separator(self):
+        self.assertEqual(parse_amount("1 500 000"), 1500000.0)
+        self.assertEqual(parse_amount("1 500 000"), 1500000.0)
+
+    def test_both_separators(self):
+        self.assertEqual(parse_amount("1.500,50"), 1500.5)
+        self.assertEqual(parse_amount("1,500.50"), 1500.5)
+
+    def test_decimal_separator(self):
+        self.assertEqual(parse_amount("12,5"), 12.5)
+        self.assertEqual(parse_amount("12.50"), 12.5)
+        self.assertEqual(parse_amount("25000"), 25000.0)
+
+    def test_unreadable(self):
+        with self.assertRaises(StatementFormatError):
+            parse_amount("25 F")
+        with self.assertRaises(StatementFormatError):
+            parse_amount("")
+
+
+def _stream(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+class TestStatementReaders(BaseCase):
+
+    def test_csv_lines(self):
+        lines = list(iter_csv_lines(_stream(
+            "Date;Montant;Référence;Libellé\n"
+            "01/03/2024;25.000;PAY/0001;Loyer mars\n"
+            "02/03/2024;1 500 000,00;;Vente\n"
+        )))
+        self.assertEqual(lines, [
+            StatementLine(date(2024, 3, 1), 25000.0, 'PAY/0001', 'Loyer mars'),
+            StatementLine(date(2024, 3, 2), 1500000.0, '', 'Vente'),
+        ])
+
+    def test_csv_bad_rows_are_collected(self):
+        lines = list(iter_csv_lines(_stream(
+            "date,amount,label\n"
+            "2024-03-01,100,ok\n"
+            "hier,100,date illisible\n"
+            "2024-03-03,cent,montant illisible\n"
+            "2024-03-04,200,ok\n"
+        )))
+        self.assertEqual([line.amount for line in lines if not line.error], [100.0, 200.0])
+        errors = [line.error for line in lines if line.error]
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("Ligne 3"))
+
+    def test_csv_without_delimiter(self):
+        with self.assertRaises(StatementFormatError):
+            list(iter_csv_lines(_stream("date\n2024-03-01\n")))
+
+    def test_csv_ambiguous_header(self):
+        # Le Sniffer ne tranche pas sur un en-tête seul: le séparateur le plus fréquent est retenu
+        self.assertEqual(sniff_dialect("date;montant;libelle\r\n").delimiter, ';')
+
+    def test_csv_missing_columns(self):
+        with self.assertRaises(StatementFormatError):
+            list(iter_csv_lines(_stream("libelle;reference\nx;y\n")))
+
+    def test_ofx_single_line(self):
+        lines = list(iter_statement_lines(_stream(
+            "OFXHEADER:100<OFX><BANKTRANLIST>"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240301120000<TRNAMT>25000.00<FITID>F1<NAME>DIARRA<MEMO>FAC/2024/001</STMTTRN>"
+            "<STMTTRN><DTPOSTED>20240302<TRNAMT>abc<FITID>F2</STMTTRN>"
+            "</BANKTRANLIST></OFX>"
+        )))
+        self.assertEqual(lines[0], StatementLine(date(2024, 3, 1), 25000.0, 'F1', 'DIARRA FAC/2024/001'))
+        self.assertTrue(lines[1].error)
+
+    def test_camt_entries(self):
+        lines = list(iter_statement_lines(_stream(
+            '<?xml version="1.0"?>'
+            '<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>'
+            '<Ntry><Amt Ccy="XOF">25000</Amt><CdtDbtInd>CRDT</CdtDbtInd><BookgDt><Dt>2024-03-01</Dt></BookgDt>'
+            '<NtryDtls><TxDtls><Refs><EndToEndId>PAY/0001</EndToEndId></Refs>'
+            '<RmtInf><Ustrd>Loyer</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>'
+            '<Ntry><Amt Ccy="XOF">1000</Amt><CdtDbtInd>DBIT</CdtDbtInd><BookgDt><Dt>2024-03-02</Dt></BookgDt></Ntry>'
+            '</Stmt></BkToCstmrStmt></Document>'
+        ), 'releve.xml'))
+        self.assertEqual(lines, [
+            StatementLine(date(2024, 3, 1), 25000.0, 'PAY/0001', 'Loyer'),
+            StatementLine(date(2024, 3, 2), -1000.0, '', ''),
+        ])
+
+    def test_camt_invalid_xml(self):
+        with self.assertRaises(StatementFormatError):
+            list(iter_camt_lines(_stream('<Document><Ntry>')))
+
+
+class TestBase64Decoding(BaseCase):
+
+    def test_chunks_across_quanta(self):
+        payload = bytes(range(256)) * 10
+        encoded = base64.b64encode(payload).decode()
+        # Blocs non multiples de 4: les caractères restants passent au bloc suivant
+        for chunk_size in (5, 7, 1000, len(encoded)):
+            with b64decode_to_file(encoded, chunk_size) as stream:
+                self.assertEqual(stream.read(), payload)
+
+    def test_line_breaks(self):
+        payload = b'date;montant\n' * 100
+        with b64decode_to_file(base64.encodebytes(payload), 9) as stream:
+            self.assertEqual(stream.read(), payload)
+
+    def test_empty_and_truncated(self):
+        with b64decode_to_file(False) as stream:
+            self.assertEqual(stream.read(), b'')
+        with self.assertRaises(StatementFormatError):
+            b64decode_to_file(base64.b64encode(b'loyer')[:-1])
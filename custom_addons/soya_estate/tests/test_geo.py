@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import BaseCase
+
+from ..tools.geo import bounding_box, geohash_encode, haversine_km, parse_coordinates, zoom_to_precision
+
+
+class TestGeo(BaseCase):
+
+    def test_parse_decimal_coordinates(self):
+        self.assertEqual(parse_coordinates("12.6392, -8.0029"), (12.6392, -8.0029))
+        self.assertEqual(parse_coordinates("12,6392 -8,0029"), (12.6392, -8.0029))
+        self.assertEqual(parse_coordinates("12.6392;-8.0029"), (12.6392, -8.0029))
+
+    def test_parse_dms_coordinates(self):
+        latitude, longitude = parse_coordinates("12°38'21\"N 8°0'10\"O")
+        self.assertAlmostEqual(latitude, 12 + 38 / 60 + 21 / 3600)
+        self.assertAlmostEqual(longitude, -(8 + 10 / 3600))
+
+    def test_parse_invalid_coordinates(self):
+        self.assertIsNone(parse_coordinates(''))
+        self.assertIsNone(parse_coordinates(None))
+        self.assertIsNone(parse_coordinates("Bamako, ACI 2000"))
+        self.assertIsNone(parse_coordinates("95.0, 8.0"))
+        self.assertIsNone(parse_coordinates("12°38'N"))
+
+    def test_geohash(self):
+        # Valeur de référence du geohash
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(len(geohash_encode(12.6392, -8.0029)), 9)
+        self.assertTrue(geohash_encode(12.6392, -8.0029).startswith(geohash_encode(12.6392, -8.0029, 5)))
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine_km(12.6392, -8.0029, 12.6392, -8.0029), 0.0)
+        # Un degré de latitude: environ 111,2 km
+        self.assertAlmostEqual(haversine_km(0, 0, 1, 0), 111.195, places=2)
+
+    def test_bounding_box_contains_radius(self):
+        south, west, north, east = bounding_box(12.6392, -8.0029, 2)
+        for latitude, longitude in ((south, -8.0029), (north, -8.0029), (12.6392, west), (12.6392, east)):
+            self.assertAlmostEqual(haversine_km(12.6392, -8.0029, latitude, longitude), 2, delta=0.01)
+        self.assertEqual(bounding_box(90, 0, 10)[1::2], (-180.0, 180.0))
+
+    def test_zoom_to_precision(self):
+        self.assertEqual(zoom_to_precision(0), 1)
+        self.assertEqual(zoom_to_precision('12'), 6)
+        self.assertEqual(zoom_to_precision(22), 8)
+        with self.assertRaises(ValueError):
+            zoom_to_precision('abc')
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from odoo.tests.common import BaseCase
+
+from ..tools.market_forecast import MAX_CONFIDENCE, forecast_prices, monthly_series
+
+
+class TestMarketForecast(BaseCase):
+
+    def test_monthly_series(self):
+        series = monthly_series([2, 0, 4], [200.0, 0.0, 600.0])
+        self.assertEqual(series[0], 100.0)
+        self.assertTrue(np.isnan(series[1]))
+        self.assertEqual(series[2], 150.0)
+
+    def test_exact_linear_trend(self):
+        forecast = forecast_prices([[100.0, 110.0, 120.0, 130.0]], horizons=(1, 3))
+        np.testing.assert_allclose(forecast.predictions, [[140.0, 160.0]])
+        np.testing.assert_allclose(forecast.lower, forecast.upper)
+        self.assertEqual(forecast.confidence[0], MAX_CONFIDENCE)
+
+    def test_missing_months_are_ignored(self):
+        forecast = forecast_prices([[100.0, np.nan, 120.0, np.nan, 140.0]], horizons=(1,))
+        np.testing.assert_allclose(forecast.predictions, [[150.0]])
+
+    def test_rows_are_independent(self):
+        forecast = forecast_prices([
+            [100.0, 102.0, 98.0, 101.0, 99.0, 100.0],
+            [200.0, 200.0, 200.0, 200.0, 200.0, 200.0],
+        ], horizons=(3,))
+        self.assertTrue(forecast.lower[0, 0] < forecast.predictions[0, 0] < forecast.upper[0, 0])
+        self.assertLess(forecast.confidence[0], MAX_CONFIDENCE)
+        np.testing.assert_allclose(forecast.predictions[1], [200.0])
+
+    def test_insufficient_data(self):
+        forecast = forecast_prices([[np.nan, np.nan, np.nan], [np.nan, 100.0, 110.0]], horizons=(1,))
+        self.assertTrue(np.isnan(forecast.predictions[0, 0]))
+        # Deux mois: tendance calculable, dispersion non estimable
+        np.testing.assert_allclose(forecast.predictions[1], [120.0])
+        self.assertTrue(np.isnan(forecast.confidence[1]))
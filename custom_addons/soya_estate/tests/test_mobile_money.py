@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import io
+
+from odoo.tests.common import BaseCase
+
+from ..models.mobile_money_import import SoyaMobileMoneyImport
+from ..tools.bank_statement import StatementFormatError
+from ..tools.mobile_money import MobileMoneyRow, iter_mobile_money_rows, reference_tokens
+
+
+def _export(*lines):
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+
+class TestMobileMoneyRows(BaseCase):
+
+    def test_fcfa_amounts_with_thousands_separators(self):
+        rows = list(iter_mobile_money_rows(_export(
+            "Transaction ID;Date;Montant;Numero;Motif",
+            "OM1;2024-03-01;25.000;+223 76 12 34 56;FAC/2024/001",
+            "OM2;2024-03-01;25,000;76123456;",
+            "OM3;2024-03-02;1 500 000;76123456;",
+        )))
+        self.assertEqual([row.amount for row in rows], [25000.0, 25000.0, 1500000.0])
+        self.assertEqual(rows[0].phone, '76123456')
+        self.assertFalse(any(row.error for row in rows))
+
+    def test_empty_export(self):
+        for content in (b'', b'\n'):
+            with self.assertRaises(StatementFormatError):
+                list(iter_mobile_money_rows(io.BytesIO(content)))
+
+
+class TestMobileMoneyMatching(BaseCase):
+
+    def test_reference_tokens(self):
+        self.assertEqual(reference_tokens("Loyer INV/2024/001, merci."), ['LOYER', 'INV/2024/001', 'MERCI'])
+        self.assertEqual(reference_tokens("(fac/2024/002)-"), ['FAC/2024/002'])
+        self.assertEqual(reference_tokens(None), [])
+
+    def test_resolve_invoice(self):
+        by_reference = {'FAC/2024/001': 1, 'FAC/2024/002': 2}
+        by_phone = {'76123456': [1, 2]}
+        residuals = {1: 0.0, 2: 50000.0}
+
+        def row(reference='', phone=''):
+            return MobileMoneyRow(2, 'OM1', None, 1000.0, phone, '', reference, None)
+
+        resolve = SoyaMobileMoneyImport._resolve_invoice
+        # Référence suivie d'une ponctuation
+        self.assertEqual(resolve(row("FAC/2024/002,"), by_reference, by_phone, residuals), 2)
+        # Facture citée déjà soldée: plus ancienne dette restante du payeur
+        self.assertEqual(resolve(row("FAC/2024/001", '76123456'), by_reference, by_phone, residuals), 2)
+        # Plus aucune dette: la ligne reste non rapprochée
+        residuals[2] = 0.0
+        self.assertIsNone(resolve(row("FAC/2024/002", '76123456'), by_reference, by_phone, residuals))
+        self.assertIsNone(resolve(row(phone='70000000'), by_reference, by_phone, residuals))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests.common import BaseCase
+
+from ..tools.occupancy import OccupancyStats, occupancy_stats, vacant_stats
+
+WINDOW = (date(2024, 1, 1), date(2024, 1, 31))
+
+
+class TestOccupancyStats(BaseCase):
+
+    def test_overlapping_spans_are_merged(self):
+        stats = occupancy_stats([
+            (1, date(2024, 1, 1), date(2024, 1, 10)),
+            (1, date(2024, 1, 5), date(2024, 1, 15)),
+            (1, date(2024, 1, 21), date(2024, 1, 25)),
+        ], *WINDOW)
+        self.assertEqual(stats[1].occupied_days, 20)
+        self.assertEqual(stats[1].window_days, 31)
+        # Vacances: 16-20 (5 jours) puis 26-31 (6 jours)
+        self.assertEqual(stats[1].longest_vacancy_days, 6)
+        self.assertAlmostEqual(stats[1].vacancy_rate, 11 / 31 * 100)
+
+    def test_spans_clipped_to_window(self):
+        stats = occupancy_stats([
+            (1, date(2023, 12, 1), date(2024, 1, 10)),
+            (2, date(2024, 1, 20), None),
+        ], *WINDOW)
+        self.assertEqual(stats[1].occupied_days, 10)
+        self.assertEqual(stats[1].longest_vacancy_days, 21)
+        # Location en cours: occupée jusqu'à la fin de la fenêtre
+        self.assertEqual(stats[2].occupied_days, 12)
+        self.assertEqual(stats[2].longest_vacancy_days, 19)
+
+    def test_contained_and_outside_spans(self):
+        stats = occupancy_stats([
+            (1, date(2024, 1, 1), date(2024, 1, 31)),
+            (1, date(2024, 1, 10), date(2024, 1, 12)),
+            (2, date(2024, 2, 1), date(2024, 2, 28)),
+        ], *WINDOW)
+        self.assertEqual(stats[1], OccupancyStats(31, 31, 0.0, 0))
+        self.assertEqual(stats[2], OccupancyStats(0, 31, 100.0, 31))
+
+    def test_vacant_stats(self):
+        self.assertEqual(vacant_stats(*WINDOW), OccupancyStats(0, 31, 100.0, 31))
+        self.assertEqual(vacant_stats(date(2024, 2, 1), date(2024, 1, 1)), OccupancyStats(0, 0, 0.0, 0))
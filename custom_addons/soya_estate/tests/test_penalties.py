@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import fields
+from odoo.tools import mute_logger
+
+from .common import SoyaEstateCase
+
+
+class TestPenalties(SoyaEstateCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Rule = cls.env['soya.penalty.rule']
+        Rule.search([]).action_archive()
+        cls.rule_standard = Rule.create({'name': 'Standard', 'min_days': 1, 'rate': 10})
+        cls.rule_long = Rule.create({'name': 'Retard long', 'min_days': 30, 'rate': 20})
+        cls.contract = cls._create_rental(cls.property, date(2024, 1, 1))
+        today = fields.Date.today()
+        # Échéance à 5 jours: 10 et 40 jours de retard
+        cls.late = cls._create_rent_invoice(today - timedelta(days=15))
+        cls.very_late = cls._create_rent_invoice(today - timedelta(days=45))
+        cls.on_time = cls._create_rent_invoice(today)
+
+    @classmethod
+    def _create_rent_invoice(cls, invoice_date):
+        return cls.env['soya.financial.invoice'].create({
+            'invoice_type': 'rent',
+            'contract_id': cls.contract.id,
+            'partner_id': cls.tenant.id,
+            'amount': 100000,
+            'invoice_date': invoice_date,
+            'period_start': invoice_date.replace(day=1),
+            'period_end': invoice_date.replace(day=28),
+            'state': 'sent',
+        })
+
+    def test_rate_for(self):
+        Rule = self.env['soya.penalty.rule']
+        self.assertEqual(Rule._get_rate_for(0), 0)
+        self.assertEqual(Rule._get_rate_for(10), 10)
+        self.assertEqual(Rule._get_rate_for(30), 20)
+        self.assertEqual(self.rule_standard._get_rate_for(40), 10)
+
+    def test_generate_once_per_invoice(self):
+        invoices = self.late | self.very_late | self.on_time
+        self.assertEqual((self.late.overdue_days, self.very_late.overdue_days), (10, 40))
+
+        penalties = invoices._generate_penalties()
+        self.assertEqual(penalties.penalty_origin_id, self.late | self.very_late)
+        by_origin = {penalty.penalty_origin_id: penalty for penalty in penalties}
+        self.assertEqual(by_origin[self.late].amount, 10000)
+        self.assertEqual(by_origin[self.very_late].amount, 20000)
+        self.assertEqual(by_origin[self.late].name, f"PENAL-{self.late.name}")
+        self.assertEqual(set(penalties.mapped('invoice_type')), {'penalty'})
+
+        self.assertFalse(invoices._generate_penalties())
+
+        # Pénalité annulée: la facture peut de nouveau être pénalisée
+        by_origin[self.late].action_cancel_invoice()
+        self.assertEqual(invoices._generate_penalties().penalty_origin_id, self.late)
+
+    def test_stale_overdue_flags(self):
+        # Drapeaux stockés non actualisés depuis l'échéance (cron nocturne pas encore passé)
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE soya_financial_invoice SET is_overdue = false, overdue_days = 0 WHERE id IN %s",
+            [(self.late.id, self.very_late.id)],
+        )
+        self.env['soya.financial.invoice'].invalidate_model(['is_overdue', 'overdue_days'])
+        penalties = (self.late | self.very_late)._generate_penalties()
+        self.assertEqual(
+            {penalty.penalty_origin_id: penalty.amount for penalty in penalties},
+            {self.late: 10000, self.very_late: 20000},
+        )
+
+    def test_cron(self):
+        Invoice = self.env['soya.financial.invoice']
+        self.assertGreaterEqual(Invoice._cron_generate_penalties(), 2)
+        penalties = Invoice.search([('penalty_origin_id', 'in', (self.late | self.very_late | self.on_time).ids)])
+        self.assertEqual(penalties.penalty_origin_id, self.late | self.very_late)
+        self.assertEqual(Invoice._cron_generate_penalties(), 0)
+
+    def test_backfill_origin_from_reference(self):
+        legacy = self.env['soya.financial.invoice'].create({
+            'invoice_type': 'penalty',
+            'contract_id': self.contract.id,
+            'partner_id': self.tenant.id,
+            'amount': 10000,
+            'period_start': self.late.period_start,
+            'period_end': self.late.period_end,
+            'state': 'sent',
+            'name': f"PENAL-{self.late.name}",
+        })
+        self.assertFalse(legacy.penalty_origin_id)
+        self.assertFalse((self.late | self.very_late)._get_penalized_invoice_ids())
+
+        self.assertEqual(self.env['soya.financial.invoice']._backfill_penalty_origins(), 1)
+        self.assertEqual(legacy.penalty_origin_id, self.late)
+        self.assertEqual((self.late | self.very_late)._get_penalized_invoice_ids(), {self.late.id})
+
+    def test_one_active_rule_per_threshold(self):
+        Rule = self.env['soya.penalty.rule']
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.env.cr.savepoint():
+            Rule.create({'name': 'Doublon', 'min_days': 30, 'rate': 25})
+            Rule.flush_model()
+        # Palier archivé: son remplaçant peut être créé
+        self.rule_long.action_archive()
+        replacement = Rule.create({'name': 'Retard long révisé', 'min_days': 30, 'rate': 25})
+        Rule.flush_model()
+        self.assertEqual(Rule._get_rate_for(40), 25)
+        self.assertTrue(replacement.active)
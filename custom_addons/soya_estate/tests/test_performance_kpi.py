@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import new_test_user
+
+from .common import SoyaEstateCase
+
+
+class TestPerformanceKpiInvalidation(SoyaEstateCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.agent = new_test_user(cls.env, login='soya_kpi_agent', groups='soya_estate.group_soya_estate_agent')
+        # Fenêtre encadrant la date de création (UTC) des enregistrements du test
+        today = fields.Date.today()
+        window = {'period_start': today - timedelta(days=1), 'period_end': today + timedelta(days=1)}
+        cls.global_kpi = cls.env['soya.performance.kpi'].create(window)
+        cls.agent_kpi = cls.env['soya.performance.kpi'].create({**window, 'agent_id': cls.agent.id})
+        cls.past_kpi = cls.env['soya.performance.kpi'].create({
+            'period_start': today - timedelta(days=60),
+            'period_end': today - timedelta(days=30),
+        })
+
+    def _create_prospect(self, **vals):
+        return self.env['soya.prospect'].create({'name': 'Prospect Test', **vals})
+
+    def test_prospect_create_write_unlink(self):
+        prospect = self._create_prospect()
+        agent_prospect = self._create_prospect(salesperson_id=self.agent.id)
+        self.assertEqual(self.global_kpi.total_prospects, 2)
+        self.assertEqual(self.agent_kpi.total_prospects, 1)
+        self.assertEqual(self.past_kpi.total_prospects, 0)
+
+        agent_prospect.state = 'qualified'
+        self.assertEqual(self.global_kpi.qualified_prospects, 1)
+        self.assertEqual(self.agent_kpi.conversion_rate, 100)
+
+        # Changement de commercial: les deux fenêtres d'agent sont recalculées
+        agent_prospect.salesperson_id = self.env.user
+        self.assertEqual(self.agent_kpi.total_prospects, 0)
+
+        prospect.salesperson_id = self.agent
+        self.assertEqual(self.agent_kpi.total_prospects, 1)
+        prospect.unlink()
+        self.assertEqual(self.agent_kpi.total_prospects, 0)
+        self.assertEqual(self.global_kpi.total_prospects, 1)
+
+    def test_offer_acceptance(self):
+        partner = self.env['res.partner'].create({'name': 'Acheteur Test'})
+        offer = self.env['soya.property.offer'].create({
+            'property_id': self.property.id,
+            'partner_id': partner.id,
+            'price': 45000000,
+            'salesperson_id': self.agent.id,
+        })
+        self.assertEqual(self.global_kpi.total_offers, 1)
+        self.assertEqual(self.agent_kpi.total_offers, 1)
+
+        offer.action_submit_offer()
+        offer.action_accept_offer()
+        self.assertEqual(self.agent_kpi.offers_accepted, 1)
+        self.assertEqual(self.agent_kpi.acceptance_rate, 100)
+
+        offer.unlink()
+        self.assertEqual(self.global_kpi.total_offers, 0)
+        self.assertEqual(self.agent_kpi.offers_accepted, 0)
+
+    def test_portfolio_follows_record_rules(self):
+        self._create_property(name='Villa Agent', salesperson_id=self.agent.id)
+        self._create_property(name='Villa Agent Louée', salesperson_id=self.agent.id).state = 'rented'
+        # L'agent ne compte que ses propres biens
+        agent_view = self.global_kpi.with_user(self.agent)
+        self.assertEqual(agent_view.properties_available, 1)
+        self.assertEqual(agent_view.properties_rented, 1)
+        self.assertEqual(agent_view.portfolio_occupancy_rate, 50)
+
+        self.env.invalidate_all()
+        self.assertGreaterEqual(self.global_kpi.properties_available, 2)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+
+from .common import SoyaEstateCase
+
+
+class TestProfitabilityInvalidation(SoyaEstateCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profitability = cls.env['soya.property.profitability'].create({'property_id': cls.property.id})
+
+    def test_rental_contract_changes(self):
+        self.assertEqual(self.profitability.total_rental_income, 0)
+        contract = self._create_rental(self.property, date(2024, 1, 1))
+        self.assertEqual(self.profitability.total_rental_income, 1200000)
+        self.assertEqual(self.profitability.avg_monthly_rent, 100000)
+
+        contract.monthly_rent = 150000
+        self.assertEqual(self.profitability.total_rental_income, 1800000)
+
+        contract.state = 'cancelled'
+        self.assertEqual(self.profitability.total_rental_income, 0)
+
+        contract.state = 'active'
+        contract.unlink()
+        self.assertEqual(self.profitability.total_rental_income, 0)
+        self.assertEqual(self.profitability.avg_monthly_rent, 0)
+
+    def test_expense_invoices(self):
+        contract = self._create_rental(self.property, date(2024, 1, 1))
+        invoice = self.env['soya.financial.invoice'].create({
+            'invoice_type': 'expense',
+            'category': 'maintenance',
+            'contract_id': contract.id,
+            'partner_id': self.owner.id,
+            'amount': 30000,
+            'period_start': date(2024, 1, 1),
+            'period_end': date(2024, 1, 31),
+        })
+        self.assertEqual(self.profitability.maintenance_costs, 30000)
+        self.assertEqual(self.profitability.net_profit, 1200000 - 30000)
+
+        invoice.category = 'taxes'
+        self.assertEqual(self.profitability.maintenance_costs, 0)
+        self.assertEqual(self.profitability.tax_expenses, 30000)
+
+    def test_other_property_untouched(self):
+        other = self._create_property(name='Appartement Test')
+        other_profitability = self.env['soya.property.profitability'].create({'property_id': other.id})
+        self._create_rental(self.property, date(2024, 1, 1))
+        self.assertEqual(self.profitability.total_rental_income, 1200000)
+        self.assertEqual(other_profitability.total_rental_income, 0)
+
+
+class TestProfitabilityOccupancy(SoyaEstateCase):
+
+    def test_occupancy_follows_contract_dates(self):
+        profitability = self.env['soya.property.profitability'].create({
+            'property_id': self.property.id,
+            'date_from': date(2024, 1, 1),
+            'date_to': date(2024, 12, 31),
+        })
+        self.assertEqual(profitability.occupied_days, 0)
+        self.assertEqual(profitability.vacancy_rate, 100)
+
+        contract = self._create_rental(self.property, date(2024, 7, 1), end_date=date(2024, 9, 30))
+        self.assertEqual(profitability.occupied_days, 92)
+        # Vacance du 1er janvier au 30 juin (année bissextile)
+        self.assertEqual(profitability.longest_vacancy_days, 182)
+        self.assertEqual(profitability.occupancy_months, 3)
+
+        contract.end_date = date(2024, 12, 31)
+        self.assertEqual(profitability.occupied_days, 184)
+
+        profitability.date_from = date(2024, 7, 1)
+        self.assertEqual(profitability.occupied_days, 184)
+        self.assertEqual(profitability.vacancy_rate, 0)
+        self.assertEqual(profitability.longest_vacancy_days, 0)
+
+    def test_rolling_window(self):
+        profitability = self.env['soya.property.profitability'].create({'property_id': self.property.id})
+        self.assertFalse(profitability.date_from)
+        date_from, date_to = profitability._get_occupancy_window()
+        self.assertEqual(date_to, fields.Date.context_today(profitability))
+        self.assertEqual(date_from, date_to - relativedelta(months=12))
+
+        self._create_rental(self.property, date_from, end_date=date_to)
+        self.env['soya.property.profitability']._cron_refresh_rolling_occupancy()
+        self.assertEqual(profitability.occupied_days, (date_to - date_from).days + 1)
+        self.assertEqual(profitability.vacancy_rate, 0)
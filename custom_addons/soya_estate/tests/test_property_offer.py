@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from psycopg2 import IntegrityError
+
+from odoo.exceptions import ValidationError
+from odoo.tools import mute_logger
+
+from .common import SoyaEstateCase
+
+
+class TestPropertyOffer(SoyaEstateCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.buyers = cls.env['res.partner'].create([{'name': f"Acheteur {index}"} for index in range(3)])
+
+    def _create_offers(self, property_rec=None, prices=(40000000, 45000000, 48000000)):
+        return self.env['soya.property.offer'].create([{
+            'property_id': (property_rec or self.property).id,
+            'partner_id': buyer.id,
+            'price': price,
+        } for buyer, price in zip(self.buyers, prices)])
+
+    def test_submit_accept_refuses_siblings(self):
+        offers = self._create_offers()
+        offers.action_submit_offer()
+        self.assertEqual(set(offers.mapped('state')), {'submitted'})
+        self.assertEqual(self.property.state, 'offer_received')
+
+        offers[1].action_accept_offer()
+        self.assertEqual(offers.mapped('state'), ['refused', 'accepted', 'refused'])
+        self.assertEqual(self.property.state, 'offer_accepted')
+        self.assertEqual(self.property.selling_price, 45000000)
+
+        # Plus aucune soumission possible sur un bien dont une offre est acceptée
+        late = self.env['soya.property.offer'].create({
+            'property_id': self.property.id,
+            'partner_id': self.owner.id,
+            'price': 50000000,
+        })
+        with self.assertRaises(ValidationError):
+            late.action_submit_offer()
+
+    def test_invalid_transitions(self):
+        offers = self._create_offers()
+        with self.assertRaises(ValidationError):
+            offers[0].action_accept_offer()
+        offers.action_submit_offer()
+        with self.assertRaises(ValidationError):
+            offers.action_submit_offer()
+        # Deux offres du même bien ne peuvent être acceptées ensemble
+        with self.assertRaises(ValidationError):
+            offers[:2].action_accept_offer()
+
+    def test_refuse_resets_property(self):
+        offers = self._create_offers()
+        offers.action_submit_offer()
+        offers[0].action_refuse_offer()
+        self.assertEqual(self.property.state, 'offer_received')
+        offers[1:].action_refuse_offer()
+        self.assertEqual(self.property.state, 'new')
+
+    def test_accept_offers_of_several_properties(self):
+        other = self._create_property(name="Duplex Test")
+        offers = self._create_offers() | self._create_offers(other)
+        offers.action_submit_offer()
+        (offers[0] | offers[3]).action_accept_offer()
+        self.assertEqual(offers.mapped('state'), ['accepted', 'refused', 'refused'] * 2)
+
+    def test_duplicate_pending_offer(self):
+        self._create_offers()
+        with self.assertRaises(ValidationError):
+            self.env['soya.property.offer'].create({
+                'property_id': self.property.id,
+                'partner_id': self.buyers[0].id,
+                'price': 41000000,
+            })
+
+    def test_one_accepted_offer_per_property(self):
+        offers = self._create_offers()
+        offers.action_submit_offer()
+        offers[0].action_accept_offer()
+        # La contrainte d'exclusion tient même en contournant les actions
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.env.cr.savepoint():
+            offers[1].write({'state': 'accepted'})
+            offers.flush_recordset()
+        # Les offres refusées restent autorisées en nombre
+        offers.invalidate_recordset(['state'])
+        self.assertEqual(offers[1:].mapped('state'), ['refused', 'refused'])
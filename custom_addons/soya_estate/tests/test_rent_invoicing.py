@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tools import mute_logger
+
+from .common import SoyaEstateCase
+
+MONTH_START = date(2024, 3, 1)
+MONTH_END = date(2024, 3, 31)
+
+
+class RentInvoicingCase(SoyaEstateCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.contracts = cls.env['soya.rental.contract']
+        for index in range(3):
+            property_rec = cls._create_property(name=f"Appartement {index}")
+            cls.contracts |= cls._create_rental(property_rec, date(2024, 1, 1), charges_amount=5000)
+        # Hors période: résilié, ou commençant après le mois facturé
+        cls._create_rental(cls._create_property(name="Résilié"), date(2024, 1, 1), state='terminated')
+        cls._create_rental(cls._create_property(name="Futur"), date(2024, 4, 1))
+
+    def _rent_invoices(self):
+        return self.env['soya.financial.invoice'].search([
+            ('invoice_type', '=', 'rent'),
+            ('period_start', '=', MONTH_START),
+            ('period_end', '=', MONTH_END),
+        ])
+
+
+class TestRentInvoicing(RentInvoicingCase):
+
+    def test_generate_month_is_idempotent(self):
+        Scheduler = self.env['soya.rent.scheduler']
+        self.assertEqual(Scheduler._get_contracts_to_invoice(MONTH_START, MONTH_END), self.contracts.ids)
+
+        Scheduler._generate_rent_invoices_for_month(MONTH_START, MONTH_END)
+        invoices = self._rent_invoices()
+        self.assertEqual(invoices.contract_id, self.contracts)
+        self.assertEqual(set(invoices.mapped('amount')), {105000})
+        self.assertEqual(invoices.filtered(lambda i: i.contract_id == self.contracts[0]).name,
+                         f"QUIT-{self.contracts[0].name}-202403")
+
+        # Nouvelle exécution: aucun contrat restant, aucun doublon
+        self.assertEqual(Scheduler._get_contracts_to_invoice(MONTH_START, MONTH_END), [])
+        Scheduler._generate_rent_invoices_for_month(MONTH_START, MONTH_END)
+        self.assertEqual(len(self._rent_invoices()), 3)
+
+    def test_duplicate_rent_invoice_skipped(self):
+        Scheduler = self.env['soya.rent.scheduler']
+        vals_list = [
+            Scheduler._prepare_rent_invoice_vals(contract, MONTH_START, MONTH_END, MONTH_START)
+            for contract in self.contracts
+        ]
+        self.assertEqual(Scheduler._create_rent_invoices(vals_list[:1]), 1)
+        # Contrat déjà facturé par un autre processus: ignoré, les autres sont créés
+        with mute_logger('odoo.sql_db', 'odoo.addons.soya_estate.models.rent_scheduler'):
+            self.assertEqual(Scheduler._create_rent_invoices(vals_list), 2)
+        self.assertEqual(len(self._rent_invoices()), 3)
+
+    def test_batches(self):
+        Scheduler = self.env['soya.rent.scheduler']
+        self.patch(type(Scheduler), 'RENT_BATCH_SIZE', 2)
+        batches = []
+        created = Scheduler._invoice_contract_range(MONTH_START, MONTH_END, on_batch=batches.append)
+        self.assertEqual(created, 3)
+        self.assertEqual(batches, [2, 1])
+
+
+class TestRentInvoicingShards(RentInvoicingCase):
+
+    def _run_month(self):
+        return self.env['soya.rent.invoicing.run']._get_or_create_run(MONTH_START, MONTH_END)
+
+    def test_shards_cover_all_contracts(self):
+        Run = self.env['soya.rent.invoicing.run']
+        self.env['ir.config_parameter'].sudo().set_param(Run.SHARD_COUNT_PARAM, 2)
+        run = self._run_month()
+        self.assertEqual(run.shard_ids.mapped('sequence'), [1, 2])
+        self.assertEqual(run.shard_ids.mapped('contract_count'), [2, 1])
+        # Plages ouvertes aux extrémités
+        self.assertEqual(run.shard_ids[0].contract_id_from, 0)
+        self.assertEqual(run.shard_ids[-1].contract_id_to, 0)
+
+        self.env['soya.rent.invoicing.shard']._cron_process_rent_shards()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.invoice_count, 3)
+        self.assertEqual(run.progress, 100)
+        self.assertEqual(self._rent_invoices().contract_id, self.contracts)
+
+        # Même mois, rien de nouveau: la campagne terminée est reprise telle quelle
+        self.assertEqual(self._run_month(), run)
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(len(run.shard_ids), 2)
+
+    def test_done_run_reopened_for_late_contracts(self):
+        run = self._run_month()
+        self.env['soya.rent.invoicing.shard']._cron_process_rent_shards()
+        self.assertEqual(run.state, 'done')
+
+        late = self._create_rental(self._create_property(name="Activé tardivement"), date(2024, 3, 15))
+        self.assertEqual(self._run_month(), run)
+        self.assertEqual(run.state, 'running')
+        pending = run.shard_ids.filtered(lambda shard: shard.state == 'pending')
+        self.assertEqual(pending.mapped('contract_count'), [1])
+        self.assertEqual(pending.sequence, max(run.shard_ids.mapped('sequence')))
+
+        self.env['soya.rent.invoicing.shard']._cron_process_rent_shards()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(self._rent_invoices().contract_id, self.contracts | late)
+        self.assertEqual(run.invoice_count, 4)
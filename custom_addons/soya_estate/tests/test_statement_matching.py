@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests.common import BaseCase
+
+from ..tools.bank_statement import StatementLine
+from ..tools.statement_matching import PaymentCandidate, amount_key, match_statement, normalize_reference
+
+
+class TestStatementMatching(BaseCase):
+
+    def test_normalization(self):
+        self.assertEqual(normalize_reference("pay/2024-00012"), 'PAY202400012')
+        self.assertEqual(normalize_reference(None), '')
+        self.assertEqual(amount_key(25000.004), 2500000)
+
+    def test_match_passes(self):
+        payments = [
+            PaymentCandidate(1, 25000.0, 'PAY/2024/00001', date(2024, 3, 1)),
+            PaymentCandidate(2, 40000.0, 'PAY/2024/00002', date(2024, 3, 1)),
+            PaymentCandidate(3, 15000.0, False, date(2024, 3, 5)),
+        ]
+        lines = [
+            StatementLine(date(2024, 3, 2), 25000.0, 'pay-2024-00001', ''),
+            StatementLine(date(2024, 3, 3), 40000.0, 'VIR 889', 'Loyer PAY/2024/00002 mars'),
+            StatementLine(date(2024, 3, 7), 15000.0, '', 'Versement'),
+            StatementLine(date(2024, 3, 7), 15000.0, '', 'Versement en double'),
+        ]
+        self.assertEqual(match_statement(lines, payments), {
+            0: (1, 'exact'),
+            1: (2, 'fuzzy'),
+            2: (3, 'fuzzy'),
+        })
+
+    def test_amount_must_match(self):
+        payments = [PaymentCandidate(1, 25000.0, 'PAY/2024/00001', date(2024, 3, 1))]
+        lines = [StatementLine(date(2024, 3, 1), 20000.0, 'PAY/2024/00001', '')]
+        self.assertEqual(match_statement(lines, payments), {})
+
+    def test_closest_date_wins(self):
+        payments = [
+            PaymentCandidate(1, 5000.0, False, date(2024, 3, 1)),
+            PaymentCandidate(2, 5000.0, False, date(2024, 3, 4)),
+        ]
+        lines = [StatementLine(date(2024, 3, 5), 5000.0, '', '')]
+        self.assertEqual(match_statement(lines, payments), {0: (2, 'fuzzy')})
+        lines = [StatementLine(date(2024, 3, 10), 5000.0, '', '')]
+        self.assertEqual(match_statement(lines, payments, date_window=3), {})
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+from . import market_forecast
+from . import occupancy
+from . import bank_statement
+from . import statement_matching
+from . import mobile_money
+from . import fragment_cache
+from . import search_text
+from . import geo
+from . import thumbnails
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Lecture en flux des relevés bancaires (CSV, OFX, CAMT.053).
+
+Chaque lecteur est un générateur de ``StatementLine``: le relevé n'est
+jamais chargé entièrement en mémoire sous forme d'objets, les lignes
+peuvent être insérées par lots au fil de la lecture. Une ligne illisible
+n'interrompt pas la lecture: elle est produite avec ``error`` renseigné.
+Seul un fichier illisible dans son ensemble lève ``StatementFormatError``.
+"""
+import base64
+import csv
+import io
+import re
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from xml.etree import ElementTree
+
+StatementLine = namedtuple('StatementLine', ['date', 'amount', 'reference', 'label', 'error'], defaults=(None,))
+
+# En-têtes CSV reconnus (en minuscules) pour chaque colonne
+CSV_COLUMNS = {
+    'date': ('date', 'date operation', 'date opération', 'date valeur', 'booking date'),
+    'amount': ('montant', 'amount', 'credit', 'crédit'),
+    'reference': ('reference', 'référence', 'ref', 'numero', 'numéro'),
+    'label': ('libelle', 'libellé', 'label', 'description', 'motif'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d')
+# Entier dont les milliers sont séparés par un point ou une virgule
+THOUSANDS_GROUPS = re.compile(r'^[+-]?\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*$')
+# Caractères base64 décodés par bloc (multiple de 4)
+BASE64_CHUNK_SIZE = 1 << 20
+
+
+class StatementFormatError(ValueError):
+    pass
+
+
+def b64decode_to_file(data, chunk_size=BASE64_CHUNK_SIZE):
+    """Décode ``data`` (base64) par blocs dans un fichier temporaire positionné au début"""
+    target = tempfile.TemporaryFile()
+    pending = b''
+    for start in range(0, len(data or ''), chunk_size):
+        chunk = data[start:start + chunk_size]
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        pending += b''.join(chunk.split())
+        usable = len(pending) - len(pending) % 4
+        try:
+            target.write(base64.decodebytes(pending[:usable]))
+        except ValueError as e:
+            target.close()
+            raise StatementFormatError(f"Fichier mal encodé: {e}")
+        pending = pending[usable:]
+    if pending:
+        target.close()
+        raise StatementFormatError("Fichier mal encodé: base64 tronqué")
+    target.seek(0)
+    return target
+
+
+@contextmanager
+def open_binary_field(record, field_name):
+    """Ouvre en lecture le fichier d'un champ Binary ``attachment=True`` sans le charger en mémoire.
+
+    Le fichier du filestore est lu directement ; une pièce jointe stockée en
+    base est décodée par blocs dans un fichier temporaire.
+    """
+    attachment = record.env['ir.attachment'].sudo().search([
+        ('res_model', '=', record._name),
+        ('res_field', '=', field_name),
+        ('res_id', '=', record.id),
+    ], limit=1)
+    if attachment.store_fname:
+        stream = open(attachment._full_path(attachment.store_fname), 'rb')
+    else:
+        stream = b64decode_to_file(record.with_context(bin_size=False)[field_name])
+    with stream:
+        yield stream
+
+
+def parse_date(value):
+    value = (value or '').strip()[:10]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    # OFX: AAAAMMJJ[HHMMSS...]
+    if len(value) >= 8 and value[:8].isdigit():
+        return datetime.strptime(value[:8], '%Y%m%d').date()
+    raise StatementFormatError(f"Date illisible: {value!r}")
+
+
+def parse_amount(value):
+    """Montant au format français ou anglais (espaces, virgule décimale).
+
+    Un séparateur seul suivi de groupes de trois chiffres (« 25.000 »,
+    « 25,000 », « 1.500.000 ») sépare les milliers: le franc CFA n'a pas
+    de décimales. Avec les deux séparateurs, le dernier est la décimale.
+    """
+    value = re.sub(r'[\s\u00a0\u202f]', '', value or '')
+    if ',' in value and '.' in value:
+        value = value.replace('.', '').replace(',', '.') if value.rfind(',') > value.rfind('.') else value.replace(',', '')
+    elif THOUSANDS_GROUPS.match(value):
+        value = value.replace('.', '').replace(',', '')
+    else:
+        value = value.replace(',', '.')
+    try:
+        return float(value)
+    except ValueError:
+        raise StatementFormatError(f"Montant illisible: {value!r}")
+
+
+CSV_DELIMITERS = ';,\t'
+
+
+def sniff_dialect(header):
+    """Dialecte CSV d'après la ligne d'en-tête.
+
+    ``csv.Sniffer`` échoue sur un en-tête ambigu: le séparateur le plus
+    fréquent de la ligne est alors retenu.
+    """
+    try:
+        return csv.Sniffer().sniff(header, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        delimiter = max(CSV_DELIMITERS, key=header.count)
+        if not header.count(delimiter):
+            raise StatementFormatError("Séparateur de colonnes introuvable (« ; », « , » ou tabulation attendu)")
+        return type('SniffedDialect', (csv.excel,), {'delimiter': delimiter})
+
+
+def iter_csv_rows(text, dialect):
+    """Lignes du CSV ; une erreur de structure du fichier devient ``StatementFormatError``"""
+    reader = csv.reader(text, dialect)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise StatementFormatError(f"CSV illisible ligne {reader.line_num}: {e}")
+        yield reader.line_num, row
+
+
+def iter_csv_lines(stream, encoding='utf-8-sig'):
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    sample = text.readline()
+    if not sample:
+        raise StatementFormatError("Relevé vide")
+    dialect = sniff_dialect(sample)
+    headers = [header.strip().lower() for header in next(csv.reader([sample], dialect))]
+    positions = {}
+    for column, aliases in CSV_COLUMNS.items():
+        for index, header in enumerate(headers):
+            if header in aliases:
+                positions[column] = index
+                break
+    if 'date' not in positions or 'amount' not in positions:
+        raise StatementFormatError("Colonnes date et montant introuvables dans le CSV")
+
+    def cell(row, column):
+        index = positions.get(column)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for line_number, row in iter_csv_rows(text, dialect):
+        if not any(row):
+            continue
+        try:
+            date, amount, error = parse_date(cell(row, 'date')), parse_amount(cell(row, 'amount')), None
+        except StatementFormatError as e:
+            date, amount, error = None, 0.0, f"Ligne {line_number + 1}: {e}"
+        yield StatementLine(date, amount, cell(row, 'reference'), cell(row, 'label'), error)
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def iter_ofx_lines(stream, encoding='latin-1'):
+    """OFX 1.x (SGML) ou 2.x (XML): une transaction par bloc <STMTTRN>"""
+    transaction = None
+    count = 0
+    for raw_line in io.TextIOWrapper(stream, encoding=encoding):
+        for closing, tag, value in OFX_TAG.findall(raw_line):
+            tag = tag.upper()
+            if tag == 'STMTTRN' and not closing:
+                transaction = {}
+            elif tag == 'STMTTRN' and transaction is not None:
+                count += 1
+                try:
+                    date, amount, error = parse_date(transaction.get('DTPOSTED')), parse_amount(transaction.get('TRNAMT')), None
+                except StatementFormatError as e:
+                    date, amount, error = None, 0.0, f"Transaction {count}: {e}"
+                yield StatementLine(
+                    date,
+                    amount,
+                    transaction.get('CHECKNUM') or transaction.get('REFNUM') or transaction.get('FITID', ''),
+                    ' '.join(filter(None, [transaction.get('NAME'), transaction.get('MEMO')])),
+                    error,
+                )
+                transaction = None
+            elif transaction is not None and not closing and value.strip():
+                transaction[tag] = value.strip()
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_camt_lines(stream):
+    """CAMT.053: une écriture par élément <Ntry>, libéré après lecture"""
+    count = 0
+    try:
+        for _event, element in ElementTree.iterparse(stream, events=('end',)):
+            if _local(element.tag) == 'Ntry':
+                count += 1
+                yield _camt_entry(element, count)
+    except ElementTree.ParseError as e:
+        raise StatementFormatError(f"XML illisible: {e}")
+
+
+def _camt_entry(element, count):
+    """Écriture <Ntry> lue puis libérée"""
+    values = {'Ustrd': []}
+    for child in element.iter():
+        name = _local(child.tag)
+        text = (child.text or '').strip()
+        if name == 'Amt' and 'amount' not in values:
+            values['amount'] = text
+        elif name == 'CdtDbtInd' and 'sign' not in values:
+            values['sign'] = -1 if text == 'DBIT' else 1
+        elif name in ('BookgDt', 'ValDt') and name not in values:
+            values[name] = next((node.text for node in child if _local(node.tag) in ('Dt', 'DtTm')), '')
+        elif name in ('EndToEndId', 'AcctSvcrRef') and text and text != 'NOTPROVIDED':
+            values.setdefault(name, text)
+        elif name == 'Ustrd' and text:
+            values['Ustrd'].append(text)
+    element.clear()
+    try:
+        date, error = parse_date(values.get('BookgDt') or values.get('ValDt')), None
+        amount = values.get('sign', 1) * parse_amount(values.get('amount'))
+    except StatementFormatError as e:
+        date, amount, error = None, 0.0, f"Écriture {count}: {e}"
+    return StatementLine(
+        date,
+        amount,
+        values.get('EndToEndId') or values.get('AcctSvcrRef', ''),
+        ' '.join(values['Ustrd']),
+        error,
+    )
+
+
+def iter_statement_lines(stream, filename=''):
+    """Choisit le lecteur d'après l'extension, sinon d'après l'en-tête du fichier"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in ('csv', 'txt', 'ofx', 'qfx', 'xml'):
+        head = stream.read(512)
+        stream.seek(0)
+        if b'OFXHEADER' in head or b'<OFX>' in head:
+            extension = 'ofx'
+        elif b'camt.053' in head or head.lstrip().startswith(b'<?xml'):
+            extension = 'xml'
+        else:
+            extension = 'csv'
+    if extension in ('ofx', 'qfx'):
+        return iter_ofx_lines(stream)
+    if extension == 'xml':
+        return iter_camt_lines(stream)
+    return iter_csv_lines(stream)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Cache mémoire à courte durée de vie pour les fragments HTML rendus.
+
+Le cache est propre à chaque processus: une invalidation explicite ne
+vide que le worker courant, les autres workers voient leurs entrées
+expirer au bout de ``ttl`` secondes au plus. Les clés commencent par le
+nom de la base pour qu'un serveur multi-bases ne mélange pas les sites.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+
+    def __init__(self, ttl=60, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, dbname=None):
+        """Vide le cache, ou seulement les entrées de la base ``dbname``"""
+        with self._lock:
+            if dbname is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == dbname]:
+                del self._entries[key]
+
+
+# Fragments du catalogue public (/properties)
+catalogue_cache = FragmentCache(ttl=60, max_entries=500)
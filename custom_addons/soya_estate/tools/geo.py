@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Coordonnées des biens: lecture du texte GPS saisi, geohash et distances.
+
+Les coordonnées sont saisies librement (« 12.6392, -8.0029 », « 12,6392
+-8,0029 », « 12°38'21"N 8°0'10"W »...) ; elles sont converties une fois
+en latitude/longitude numériques pour être indexées et filtrées en SQL.
+"""
+import math
+import re
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+DECIMAL_PAIR = re.compile(r'^\s*(-?\d{1,3}(?:[.,]\d+)?)\s*[,; ]\s*(-?\d{1,3}(?:[.,]\d+)?)\s*$')
+DMS_COORDINATE = re.compile(
+    r'''(\d{1,3})\s*°\s*(?:(\d{1,2}(?:[.,]\d+)?)\s*['’′]\s*)?(?:(\d{1,2}(?:[.,]\d+)?)\s*(?:"|''|”|″)\s*)?([NSEWO])''',
+    re.IGNORECASE,
+)
+
+
+def _number(value):
+    return float(value.replace(',', '.')) if value else 0.0
+
+
+def parse_coordinates(text):
+    """Couple (latitude, longitude) lu dans ``text``, ou None si illisible ou hors limites"""
+    if not text:
+        return None
+    match = DECIMAL_PAIR.match(text)
+    if match:
+        latitude, longitude = _number(match.group(1)), _number(match.group(2))
+    else:
+        values = {}
+        for degrees, minutes, seconds, hemisphere in DMS_COORDINATE.findall(text):
+            value = _number(degrees) + _number(minutes) / 60 + _number(seconds) / 3600
+            hemisphere = hemisphere.upper()
+            if hemisphere in ('S', 'W', 'O'):
+                value = -value
+            values['latitude' if hemisphere in ('N', 'S') else 'longitude'] = value
+        if len(values) != 2:
+            return None
+        latitude, longitude = values['latitude'], values['longitude']
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash de ``precision`` caractères (9 caractères: cellule d'environ 5 m)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        bounds, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    """Distance orthodromique en kilomètres"""
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(longitude2 - longitude1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Rectangle (sud, ouest, nord, est) contenant le cercle de rayon ``radius_km``"""
+    delta_latitude = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_latitude = math.cos(math.radians(latitude))
+    delta_longitude = 180.0 if cos_latitude < 1e-6 else min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_latitude)), 180.0)
+    return (
+        max(latitude - delta_latitude, -90.0),
+        max(longitude - delta_longitude, -180.0),
+        min(latitude + delta_latitude, 90.0),
+        min(longitude + delta_longitude, 180.0),
+    )
+
+
+def zoom_to_precision(zoom):
+    """Longueur de préfixe geohash des tuiles de regroupement pour un niveau de zoom de carte"""
+    return max(1, min(GEOHASH_PRECISION - 1, (int(zoom) + 1) // 2))
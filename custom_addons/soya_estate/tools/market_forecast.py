@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Prévision vectorisée des prix du marché.
+
+Chaque ligne d'entrée est une série mensuelle de prix moyens (NaN pour les
+mois sans annonce), alignée à droite sur le mois d'analyse. Une tendance
+linéaire est ajustée par moindres carrés sur toutes les lignes en une
+seule passe, avec l'intervalle de prédiction associé.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+Forecast = namedtuple('Forecast', ['predictions', 'lower', 'upper', 'confidence'])
+
+# Quantile de la loi normale pour un intervalle de prédiction à 95%
+Z_95 = 1.96
+MAX_CONFIDENCE = 95.0
+
+
+def monthly_series(counts, sums):
+    """Prix moyens mensuels à partir des effectifs et sommes (NaN si effectif nul)"""
+    counts = np.asarray(counts, dtype=float)
+    sums = np.asarray(sums, dtype=float)
+    series = np.full(counts.shape, np.nan)
+    np.divide(sums, counts, out=series, where=counts > 0)
+    return series
+
+
+def forecast_prices(series, horizons=(3, 6, 12)):
+    """Ajuste prix = a + b * mois pour chaque ligne et projette aux horizons donnés.
+
+    :param series: tableau (k, m) de prix mensuels, NaN pour les mois manquants
+    :param horizons: horizons de prévision en mois après le dernier mois de la série
+    :return: Forecast dont ``predictions``, ``lower`` et ``upper`` sont de forme
+        (k, len(horizons)) et ``confidence`` de forme (k,), en pourcentage.
+        Les lignes sans donnée valent NaN ; la confiance vaut NaN lorsque
+        moins de trois mois sont renseignés (dispersion non estimable).
+    """
+    y = np.atleast_2d(np.asarray(series, dtype=float))
+    mask = ~np.isnan(y)
+    weights = mask.astype(float)
+    values = np.where(mask, y, 0.0)
+    t = np.arange(y.shape[1], dtype=float)
+    horizon_t = (y.shape[1] - 1) + np.asarray(horizons, dtype=float)
+
+    n = weights.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_mean = (weights * t).sum(axis=1) / n
+        y_mean = values.sum(axis=1) / n
+
+        t_dev = (t - t_mean[:, None]) * weights
+        sxx = (t_dev ** 2).sum(axis=1)
+        sxy = (t_dev * (values - y_mean[:, None])).sum(axis=1)
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)
+        intercept = y_mean - slope * t_mean
+
+        residuals = (values - (intercept[:, None] + slope[:, None] * t)) * weights
+        dof = n - 2
+        sigma = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+        sigma = np.where(dof > 0, sigma, np.nan)
+
+        predictions = intercept[:, None] + slope[:, None] * horizon_t
+        leverage = np.where(
+            sxx[:, None] > 0,
+            (horizon_t - t_mean[:, None]) ** 2 / sxx[:, None],
+            0.0,
+        )
+        half_width = Z_95 * sigma[:, None] * np.sqrt(1 + 1 / n[:, None] + leverage)
+
+        # Confiance: 100 - demi-largeur relative de l'intervalle au premier horizon
+        relative_width = half_width[:, 0] / np.abs(predictions[:, 0]) * 100
+        confidence = np.clip(100 - relative_width, 0, MAX_CONFIDENCE)
+
+    return Forecast(predictions, predictions - half_width, predictions + half_width, confidence)
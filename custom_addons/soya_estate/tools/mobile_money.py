@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Lecture en flux des exports des opérateurs de mobile money.
+
+Les exports (Orange Money, Moov Money, Wave...) sont des CSV dont les
+intitulés de colonnes varient: ils sont reconnus par alias. Les lignes
+sont produites par paquets de ``chunk_size`` sans charger le fichier.
+"""
+import csv
+import io
+import re
+from collections import namedtuple
+from itertools import islice
+
+from .bank_statement import iter_csv_rows, parse_amount, parse_date, sniff_dialect, StatementFormatError
+
+MobileMoneyRow = namedtuple('MobileMoneyRow', [
+    'row_number', 'transaction_id', 'date', 'amount', 'phone', 'payer_name', 'reference', 'error',
+])
+
+# En-têtes reconnus (en minuscules) pour chaque colonne
+COLUMNS = {
+    'transaction_id': ('transaction id', 'id transaction', 'transaction', 'id', 'txn id', 'reference transaction'),
+    'date': ('date', 'date transaction', 'date heure', 'datetime'),
+    'amount': ('montant', 'amount', 'montant (fcfa)', 'montant xof'),
+    'phone': ('numero', 'numéro', 'msisdn', 'telephone', 'téléphone', 'phone', 'expediteur', 'expéditeur'),
+    'payer_name': ('nom', 'name', 'nom expediteur', 'nom expéditeur', 'client'),
+    'reference': ('motif', 'reference', 'référence', 'message', 'commentaire'),
+}
+# Indicatif du Mali: les numéros nationaux comptent 8 chiffres
+NATIONAL_DIGITS = 8
+NON_DIGIT = re.compile(r'\D')
+# Références citées dans un motif: « FAC/2024/001, loyer » -> FAC/2024/001
+REFERENCE_TOKEN = re.compile(r'[\w/.\-]+')
+
+
+def normalize_phone(value):
+    """Chiffres significatifs d'un numéro (sans indicatif ni séparateurs)"""
+    digits = NON_DIGIT.sub('', value or '')
+    return digits[-NATIONAL_DIGITS:] if len(digits) >= NATIONAL_DIGITS else digits
+
+
+def reference_tokens(text):
+    """Termes du motif susceptibles d'être une référence de facture (en majuscules, sans ponctuation autour)"""
+    tokens = (token.strip('./-') for token in REFERENCE_TOKEN.findall((text or '').upper()))
+    return [token for token in tokens if token]
+
+
+def iter_mobile_money_rows(stream, encoding='utf-8-sig'):
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    sample = text.readline()
+    if not sample.strip():
+        raise StatementFormatError("Export vide")
+    dialect = sniff_dialect(sample)
+    headers = [header.strip().lower() for header in next(csv.reader([sample], dialect))]
+    positions = {}
+    for column, aliases in COLUMNS.items():
+        for index, header in enumerate(headers):
+            if header in aliases:
+                positions[column] = index
+                break
+    missing = {'transaction_id', 'date', 'amount', 'phone'} - set(positions)
+    if missing:
+        raise StatementFormatError(f"Colonnes introuvables dans l'export: {', '.join(sorted(missing))}")
+
+    def cell(row, column):
+        index = positions.get(column)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for line_number, row in iter_csv_rows(text, dialect):
+        row_number = line_number + 1
+        if not any(row):
+            continue
+        error = None
+        try:
+            date = parse_date(cell(row, 'date'))
+            amount = parse_amount(cell(row, 'amount'))
+        except StatementFormatError as e:
+            date, amount, error = None, 0.0, str(e)
+        yield MobileMoneyRow(
+            row_number,
+            cell(row, 'transaction_id'),
+            date,
+            amount,
+            normalize_phone(cell(row, 'phone')),
+            cell(row, 'payer_name'),
+            cell(row, 'reference'),
+            error,
+        )
+
+
+def iter_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
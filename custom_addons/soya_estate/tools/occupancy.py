@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Frise d'occupation des biens à partir des périodes de location.
+
+Les périodes (bornes incluses) de tous les biens sont parcourues une seule
+fois, triées par bien puis par date de début: les chevauchements sont
+fusionnés à la volée et les vacances mesurées entre deux périodes.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+OccupancyStats = namedtuple('OccupancyStats', ['occupied_days', 'window_days', 'vacancy_rate', 'longest_vacancy_days'])
+
+
+def vacant_stats(date_from, date_to):
+    """Statistiques d'un bien sans aucune location sur la fenêtre"""
+    window_days = max((date_to - date_from).days + 1, 0)
+    return OccupancyStats(0, window_days, 100.0 if window_days else 0.0, window_days)
+
+
+def occupancy_stats(spans, date_from, date_to):
+    """Occupation par bien sur la fenêtre [date_from, date_to].
+
+    :param spans: itérable de (clé, début, fin) trié par clé puis début ;
+        une fin vide signifie une location toujours en cours
+    :return: dict clé -> OccupancyStats, uniquement pour les clés présentes
+    """
+    window_days = max((date_to - date_from).days + 1, 0)
+    result = {}
+    for key, key_spans in groupby(spans, key=itemgetter(0)):
+        occupied = 0
+        longest_gap = 0
+        cursor = date_from  # premier jour non encore couvert
+        for _key, start, end in key_spans:
+            start = max(start, date_from)
+            end = min(end or date_to, date_to)
+            if start > end or end < cursor:
+                continue
+            if start > cursor:
+                longest_gap = max(longest_gap, (start - cursor).days)
+                occupied += (end - start).days + 1
+            else:
+                occupied += (end - cursor).days + 1
+            cursor = end + timedelta(days=1)
+        if cursor <= date_to:
+            longest_gap = max(longest_gap, (date_to - cursor).days + 1)
+        vacancy_rate = (window_days - occupied) / window_days * 100 if window_days else 0.0
+        result[key] = OccupancyStats(occupied, window_days, vacancy_rate, longest_gap)
+    return result
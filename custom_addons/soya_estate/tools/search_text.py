@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Normalisation du texte indexé et des requêtes de recherche des biens.
+
+Document et requête passent par la même normalisation (minuscules, sans
+accents ni ponctuation): « Cité du Niger » et « cite du niger » donnent
+les mêmes termes, sans dépendre de l'extension ``unaccent``.
+"""
+import re
+import unicodedata
+
+NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_search_text(*values):
+    """Termes normalisés des valeurs non vides, séparés par des espaces"""
+    text = ' '.join(str(value) for value in values if value)
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return NON_WORD.sub(' ', text.lower()).strip()
+
+
+def prefix_tsquery(text):
+    """Requête ``to_tsquery`` exigeant chaque terme, le dernier pouvant être un préfixe.
+
+    Les termes normalisés ne contiennent que des lettres et des chiffres:
+    aucun opérateur tsquery ne peut être injecté.
+    """
+    terms = normalize_search_text(text).split()
+    if not terms:
+        return ''
+    return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
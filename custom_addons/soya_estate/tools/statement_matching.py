@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Rapprochement des lignes de relevé avec les paiements.
+
+Les paiements candidats sont indexés dans des tables de hachage (par
+référence normalisée et par couple montant/date) ; chaque ligne est ensuite
+résolue par quelques recherches directes, en trois passes de confiance
+décroissante:
+
+1. ``exact``: même référence et même montant ;
+2. ``fuzzy``: une référence de paiement citée dans le libellé, même montant ;
+3. ``fuzzy``: même montant à quelques jours d'écart (le plus proche).
+
+Un paiement n'est rapproché qu'une seule fois.
+"""
+import re
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+PaymentCandidate = namedtuple('PaymentCandidate', ['id', 'amount', 'reference', 'date'])
+
+NON_ALNUM = re.compile(r'[^0-9A-Z]')
+TOKEN = re.compile(r'[0-9A-Za-z][0-9A-Za-z/_\-]{3,}')
+
+
+def normalize_reference(value):
+    return NON_ALNUM.sub('', (value or '').upper())
+
+
+def amount_key(amount):
+    """Montant en centimes, pour des comparaisons exactes"""
+    return round((amount or 0.0) * 100)
+
+
+def match_statement(lines, payments, date_window=3):
+    """Rapproche les lignes (date, amount, reference, label) des paiements candidats.
+
+    :param lines: séquence de lignes de relevé
+    :param payments: itérable de ``PaymentCandidate``
+    :param date_window: écart maximal en jours pour la passe sur montant et date
+    :return: dict index de ligne -> (id du paiement, type de rapprochement)
+    """
+    by_reference = defaultdict(list)
+    by_amount_date = defaultdict(list)
+    for payment in payments:
+        reference = normalize_reference(payment.reference)
+        if reference:
+            by_reference[reference].append(payment)
+        by_amount_date[(amount_key(payment.amount), payment.date)].append(payment)
+
+    used = set()
+    matches = {}
+
+    def take(candidates, amount):
+        for payment in candidates:
+            if payment.id not in used and amount_key(payment.amount) == amount:
+                used.add(payment.id)
+                return payment
+        return None
+
+    # Passe 1: référence et montant identiques
+    for index, line in enumerate(lines):
+        reference = normalize_reference(line.reference)
+        payment = reference and take(by_reference.get(reference, ()), amount_key(line.amount))
+        if payment:
+            matches[index] = (payment.id, 'exact')
+
+    # Passe 2: référence d'un paiement citée dans le libellé ou la référence bancaire
+    for index, line in enumerate(lines):
+        if index in matches:
+            continue
+        amount = amount_key(line.amount)
+        for token in TOKEN.findall(f"{line.reference or ''} {line.label or ''}"):
+            payment = take(by_reference.get(normalize_reference(token), ()), amount)
+            if payment:
+                matches[index] = (payment.id, 'fuzzy')
+                break
+
+    # Passe 3: même montant, date la plus proche dans la fenêtre
+    offsets = sorted(range(-date_window, date_window + 1), key=abs)
+    for index, line in enumerate(lines):
+        if index in matches or not line.date:
+            continue
+        amount = amount_key(line.amount)
+        for offset in offsets:
+            bucket = by_amount_date.get((amount, line.date + timedelta(days=offset)))
+            payment = bucket and take(bucket, amount)
+            if payment:
+                matches[index] = (payment.id, 'fuzzy')
+                break
+
+    return matches
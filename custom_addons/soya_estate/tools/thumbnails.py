@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Miniatures des photos de biens, en JPEG progressif et en WebP.
+
+L'image source n'est décodée qu'une fois, à la résolution réduite la plus
+proche de la plus grande taille demandée (``draft`` JPEG), puis chaque
+taille est dérivée de la précédente: le coût reste proportionnel aux
+miniatures produites, pas à la photo d'origine.
+"""
+import io
+from collections import namedtuple
+
+from PIL import Image, ImageOps, features
+
+Thumbnail = namedtuple('Thumbnail', ['size', 'image_format', 'data', 'width', 'height'])
+
+# Taille -> plus grand côté en pixels (jamais agrandi au-delà de l'original)
+THUMBNAIL_SIZES = {
+    'large': 1600,
+    'medium': 800,
+    'small': 400,
+}
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+MIMETYPES = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+
+def webp_supported():
+    return features.check('webp')
+
+
+def _encode(image, image_format):
+    output = io.BytesIO()
+    if image_format == 'webp':
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def generate_thumbnails(data):
+    """Miniatures de ``data`` (octets de l'image), de la plus grande à la plus petite.
+
+    :raise PIL.UnidentifiedImageError: si ``data`` n'est pas une image lisible
+    """
+    image = Image.open(io.BytesIO(data))
+    largest = max(THUMBNAIL_SIZES.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    formats = ['jpeg', 'webp'] if webp_supported() else ['jpeg']
+    for size, max_side in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        for image_format in formats:
+            yield Thumbnail(size, image_format, _encode(image, image_format), image.width, image.height)